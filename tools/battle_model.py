@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Simplified DQ-style battle formulas over NumPy columns.
+
+Kept apart from battle_sim.py (Monte Carlo battles) so that every balancing
+tool answers with the same rules:
+
+    damage   half = (ATK - DEF / 2) / 2, rolled uniformly in [half * 7/8, half * 9/8];
+             when half < 1 the hit is weak: uniform 0 .. max(1, ATK / 16)
+    hit      1 - dodge, dodge = 1/64 + (defender AGI - attacker AGI) / 512, clamped to 1/64 .. 1/4
+    party    ATK = STR, DEF = AGI / 2 when no equipment is counted (stat_growth.py levels)
+
+Monster stats come from the same JSON rows as MONSTER_TABLE (record_schema
+MONSTER, masked to the table's field widths), so the numbers match what the
+converted ROM holds. Party stats are given per member (equipped values)
+or derived from stat_growth.py levels without equipment.
+"""
+
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+from encounters_converter import load_encounters
+from json_snapshot import load_json_dir
+from record_schema import ENCOUNTER_SLOTS, MONSTER, safe_int
+from stat_growth import GrowthTable
+
+WEAK_DIVISOR = 16
+DODGE_BASE = 1 / 64
+DODGE_PER_AGI = 1 / 512
+MAX_DODGE = 1 / 4
+MONSTER_IDS = 0x100              # Encounter slots hold byte-sized monster IDs
+NO_MONSTER = -1
+MONSTER_FILES = "monster_*.json"
+PARTY_STATS = ("hp", "strength", "agility")   # stat_growth columns a member needs
+
+
+class PartyMember(NamedTuple):
+    name: str
+    hp: int
+    atk: int
+    def_: int
+    agi: int
+
+
+class MonsterColumns(NamedTuple):
+    """Structure-of-arrays view of the monster table (row i = i-th monster record)."""
+    ids: np.ndarray
+    names: List[str]
+    hp: np.ndarray
+    atk: np.ndarray
+    def_: np.ndarray
+    agi: np.ndarray
+    exp: np.ndarray
+    gold: np.ndarray
+    drop_rate: np.ndarray
+    row_of: np.ndarray                        # MONSTER_IDS entries: monster ID -> row, NO_MONSTER if absent
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class PartyColumns(NamedTuple):
+    names: List[str]
+    hp: np.ndarray
+    atk: np.ndarray
+    def_: np.ndarray
+    agi: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+def monster_columns(monsters: Sequence[Dict[str, Any]]) -> MonsterColumns:
+    """Columns of the MONSTER_TABLE values for JSON monster records."""
+    rows = np.array([MONSTER.row_from_json(m) for m in monsters], dtype=np.int32).reshape(-1, len(MONSTER.names))
+    col = dict(zip(MONSTER.names, rows.T))
+    ids = np.array([safe_int(m.get("id", i)) for i, m in enumerate(monsters)], dtype=np.int32)
+    row_of = np.full(MONSTER_IDS, NO_MONSTER, dtype=np.int32)
+    in_range = (ids >= 0) & (ids < MONSTER_IDS)
+    row_of[ids[in_range][::-1]] = np.flatnonzero(in_range)[::-1]   # First record wins on duplicate IDs
+    return MonsterColumns(ids, [str(m.get("name", "")) for m in monsters], col["hp"], col["atk"], col["def_"],
+                          col["agi"], col["exp"], col["gold"], col["drop_rate_flags"], row_of)
+
+
+def party_columns(members: Iterable[PartyMember]) -> PartyColumns:
+    members = list(members)
+    if not members:
+        raise ValueError("Party is empty")
+    stats = np.array([m[1:] for m in members], dtype=np.int32)
+    return PartyColumns([m.name for m in members], *stats.T)
+
+
+def parse_member(text: str) -> PartyMember:
+    """NAME:HP:ATK:DEF:AGI."""
+    name, *stats = text.split(":")
+    if len(stats) != 4:
+        raise ValueError(f"Expected NAME:HP:ATK:DEF:AGI, got {text!r}")
+    return PartyMember(name, *(int(s, 0) for s in stats))
+
+
+def growth_party(growth: GrowthTable, level: int) -> List[PartyMember]:
+    """Members at `level` from growth's PARTY_STATS columns, without equipment."""
+    found = np.flatnonzero(growth.levels == level)
+    if not len(found):
+        raise ValueError(f"Level {level} is not in the growth table (1-{int(growth.levels.max())})")
+    li = int(found[0])
+    hp = growth.stats["hp"][:, li]
+    atk, def_ = unequipped_stats(growth.stats["strength"][:, li], growth.stats["agility"][:, li])
+    agi = growth.stats["agility"][:, li]
+    return [PartyMember(name, *(int(v[c]) for v in (hp, atk, def_, agi))) for c, name in enumerate(growth.names)]
+
+
+def group_rows(groups: Sequence[Dict[str, Any]], monsters: MonsterColumns) -> Tuple[np.ndarray, int]:
+    """(G, 6) monster rows per encounter group (NO_MONSTER for empty slots) and the count of unknown IDs."""
+    ids = np.full((len(groups), ENCOUNTER_SLOTS), NO_MONSTER, dtype=np.int32)
+    for i, group in enumerate(groups):
+        slots = [safe_int(m, NO_MONSTER) for m in group.get("monster_ids", [])][:ENCOUNTER_SLOTS]
+        ids[i, :len(slots)] = slots
+    valid = (ids >= 0) & (ids < MONSTER_IDS)
+    rows = np.where(valid, monsters.row_of[np.where(valid, ids, 0)], NO_MONSTER)
+    unknown = int(np.count_nonzero((ids != NO_MONSTER) & (rows == NO_MONSTER)))
+    return rows, unknown
+
+
+def unequipped_stats(strength, agility) -> Tuple[np.ndarray, np.ndarray]:
+    """(ATK, DEF) of party members from STR / AGI, ignoring equipment; broadcasts over any shapes."""
+    return np.asarray(strength, dtype=np.int32), np.asarray(agility, dtype=np.int32) // 2
+
+
+def damage_bounds(atk, def_) -> Tuple[np.ndarray, np.ndarray]:
+    """Inclusive (low, high) damage per hit; broadcasts over any shapes."""
+    atk = np.asarray(atk, dtype=np.int32)
+    half = (atk - np.asarray(def_, dtype=np.int32) // 2) // 2
+    weak = half < 1
+    low = np.where(weak, 0, half * 7 // 8)
+    high = np.where(weak, np.maximum(1, atk // WEAK_DIVISOR), half * 9 // 8)
+    return low, high
+
+
+def hit_chance(attacker_agi, defender_agi) -> np.ndarray:
+    """Probability that an attack connects; broadcasts over any shapes."""
+    gap = np.asarray(defender_agi, dtype=np.float64) - np.asarray(attacker_agi, dtype=np.float64)
+    return 1.0 - np.clip(DODGE_BASE + gap * DODGE_PER_AGI, DODGE_BASE, MAX_DODGE)
+
+
+def roll_damage(rng: np.random.Generator, low: np.ndarray, high: np.ndarray) -> np.ndarray:
+    """One uniform integer in [low, high] per element."""
+    return low + (rng.random(np.shape(low)) * (high - low + 1)).astype(np.int32)
+
+
+def load_monsters(monsters_dir: Path) -> MonsterColumns:
+    """Monster columns from the DW4 JSON (records via the snapshot cache)."""
+    if not Path(monsters_dir).exists():
+        raise FileNotFoundError(f"DW4 monsters dir not found: {monsters_dir}")
+    return monster_columns(load_json_dir(monsters_dir, MONSTER_FILES))
+
+
+def load_tables(monsters_dir: Path, encounters_path: Path) -> Tuple[MonsterColumns, List[Dict[str, Any]]]:
+    """Monster columns and encounter groups from the DW4 JSON."""
+    return load_monsters(monsters_dir), load_encounters(encounters_path)
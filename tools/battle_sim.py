@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo battle simulator over MONSTER_TABLE / ENCOUNTER_TABLE.
+
+Each encounter group is fought `--battles` times against one party with the
+rules in battle_model.py. Battles are NumPy batches: a chunk of groups x
+battles is one set of arrays, and each round is a few vector operations per
+party member and monster slot, not a Python loop per battle. Every round:
+
+    - the party acts first with chance party AGI / (party AGI + group AGI)
+      (mean agility of the living members on each side)
+    - each living member attacks the first living monster
+    - each living monster attacks a random member (drawn from those alive
+      when the monsters' turn starts)
+
+A battle ends when one side is wiped out or after --max-rounds (counted as
+a loss). Identical groups are simulated once. Chunks run in a process pool
+and each chunk gets its own seed from one SeedSequence, so results depend
+only on --seed, not on --jobs.
+
+The party is given with --member (equipped values), or taken from the
+characters' level-up data at --level (stat_growth.py, no equipment; --party
+picks members by name). There is no built-in party: without either option,
+or with no character that has growth data, the simulator refuses to run.
+
+Reported per group: win rate, rounds to win (turns to kill the group), and
+EXP / gold per minute, assuming ROUND_SECONDS per round plus BATTLE_SECONDS
+of fixed overhead per battle.
+
+Usage:
+    python tools/battle_sim.py --level 20                         # every group, characters.json at level 20
+    python tools/battle_sim.py --level 20 --party Hero --party Alena --party Ragnar
+    python tools/battle_sim.py --level 20 --battles 10000 --groups 0:200 --csv build/battle_sim.csv
+    python tools/battle_sim.py --member Hero:40:30:20:15 --member Alena:35:40:15:30
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from battle_model import (NO_MONSTER, PARTY_STATS, MonsterColumns, PartyColumns, PartyMember, damage_bounds,
+                          group_rows, growth_party, hit_chance, load_tables, parse_member, party_columns)
+from characters_converter import dw4_chars_path, load_characters
+from encounters_converter import dw4_encounters_path
+from instrumentation import span
+from json_to_pasm import DW4_MONSTERS_DIR
+from output_file import write_output
+from stat_growth import MAX_LEVEL, growth_table
+
+DEFAULT_BATTLES = 500
+MAX_ROUNDS = 100
+ROUND_SECONDS = 4.0
+BATTLE_SECONDS = 6.0             # Encounter transition, messages, rewards
+CHUNK_BATTLES = 1 << 16          # Battles per worker batch (bounds array memory)
+
+
+class GroupResult(NamedTuple):
+    group: int
+    monsters: Tuple[int, ...]                 # Monster IDs
+    win_rate: float
+    rounds_to_win: float                      # Mean rounds of the battles won (nan if none)
+    rounds: float                             # Mean rounds of all battles
+    exp: int                                  # Per battle won
+    gold: int
+
+    @property
+    def minutes(self) -> float:
+        """Mean wall time of one battle."""
+        return (BATTLE_SECONDS + self.rounds * ROUND_SECONDS) / 60
+
+    @property
+    def exp_per_minute(self) -> float:
+        return self.win_rate * self.exp / self.minutes
+
+    @property
+    def gold_per_minute(self) -> float:
+        return self.win_rate * self.gold / self.minutes
+
+
+def simulate_chunk(rows: np.ndarray, monsters: MonsterColumns, party: PartyColumns, battles: int,
+                   seed: np.random.SeedSequence, max_rounds: int = MAX_ROUNDS) -> Tuple[np.ndarray, np.ndarray]:
+    """(wins, rounds) per battle for `battles` fights against each group row, as (K, battles) arrays."""
+    rng = np.random.default_rng(seed)
+    k, slots = rows.shape
+    n = k * battles
+    members = len(party)
+    row = np.repeat(rows, battles, axis=0)                   # (N, slots) monster row per slot
+    present = row != NO_MONSTER
+
+    # Member -> monster tables are (members, monster rows), monster -> member tables (monster rows, members);
+    # a battle looks its numbers up through its slot's monster row
+    pm_low, pm_high = damage_bounds(party.atk[:, None], monsters.def_[None, :])
+    pm_spread = pm_high - pm_low + 1
+    pm_hit = hit_chance(party.agi[:, None], monsters.agi[None, :])
+    mp_low, mp_high = damage_bounds(monsters.atk[:, None], party.def_[None, :])
+    mp_spread = mp_high - mp_low + 1
+    mp_hit = hit_chance(monsters.agi[:, None], party.agi[None, :])
+    state = {
+        "id": np.arange(n),
+        "row": np.where(present, row, 0),
+        "m_hp": np.where(present, monsters.hp[np.where(present, row, 0)], 0).astype(np.int32),
+        "p_hp": np.tile(party.hp, (n, 1)).astype(np.int32),
+    }
+
+    won = np.zeros(n, dtype=bool)
+    rounds = np.zeros(n, dtype=np.int32)
+
+    def attack(hp, acting, target, low, spread, hit):
+        """Battles flagged in `acting` hit column `target` of hp; low / spread / hit are per battle."""
+        b = np.flatnonzero(acting)
+        lands = rng.random(len(b)) < hit[b]
+        b = b[lands]
+        hp[b, target[b]] -= low[b] + (rng.random(len(b)) * spread[b]).astype(np.int32)
+
+    def party_attacks(st, acting):
+        m_hp, p_hp, row = st["m_hp"], st["p_hp"], st["row"]
+        every = np.arange(len(m_hp))
+        for j in range(members):
+            alive_m = m_hp > 0
+            able = acting & (p_hp[:, j] > 0) & alive_m.any(axis=1)
+            if not able.any():
+                continue
+            target = alive_m.argmax(axis=1)                  # First living monster
+            r = row[every, target]
+            attack(m_hp, able, target, pm_low[j, r], pm_spread[j, r], pm_hit[j, r])
+
+    def monster_attacks(st, b):
+        """Every living monster of battles `b` attacks at once, each a random member alive as the phase starts."""
+        if not len(b):
+            return
+        p_hp, r = st["p_hp"][b], st["row"][b]
+        alive_p = p_hp > 0
+        living = alive_p.sum(axis=1)
+        able = (st["m_hp"][b] > 0) & (living > 0)[:, None]
+        pick = (rng.random(r.shape) * living[:, None]).astype(np.intp)
+        target = np.take_along_axis(np.argsort(~alive_p, axis=1, kind="stable"), pick, axis=1)
+        pair = r * members + target                          # Into the flattened (monster row, member) tables
+        lands = able & (rng.random(r.shape) < mp_hit.take(pair))
+        pair, target = pair[lands], target[lands]
+        rolled = mp_low.take(pair) + (rng.random(len(pair)) * mp_spread.take(pair)).astype(np.int32)
+        where = np.flatnonzero(lands) // slots * members + target
+        taken = np.bincount(where, weights=rolled, minlength=len(b) * members)
+        st["p_hp"][b] = p_hp - taken.astype(np.int32).reshape(-1, members)
+
+    for _ in range(max_rounds):
+        ids = state["id"]
+        if not len(ids):
+            break
+        rounds[ids] += 1
+        alive_p = state["p_hp"] > 0
+        alive_m = state["m_hp"] > 0
+        party_agi = (party.agi * alive_p).sum(axis=1) / np.maximum(alive_p.sum(axis=1), 1)
+        group_agi = (monsters.agi[state["row"]] * alive_m).sum(axis=1) / np.maximum(alive_m.sum(axis=1), 1)
+        first = rng.random(len(ids)) * (party_agi + group_agi) < party_agi
+
+        monster_attacks(state, np.flatnonzero(~first))
+        party_attacks(state, np.ones(len(ids), dtype=bool))
+        monster_attacks(state, np.flatnonzero(first))
+
+        cleared = ~(state["m_hp"] > 0).any(axis=1)
+        wiped = ~(state["p_hp"] > 0).any(axis=1)
+        won[ids[cleared & ~wiped]] = True
+        going = ~(cleared | wiped)
+        if not going.all():                                  # Drop finished battles from every array
+            state = {key: value[going] for key, value in state.items()}
+    return won.reshape(k, battles), rounds.reshape(k, battles)
+
+
+def _chunk_worker(args) -> Tuple[np.ndarray, np.ndarray]:
+    rows, monsters, party, battles, seed, max_rounds = args
+    won, rounds = simulate_chunk(rows, monsters, party, battles, seed, max_rounds)
+    wins = won.sum(axis=1)
+    return wins, np.stack([(rounds * won).sum(axis=1), rounds.sum(axis=1)], axis=1)
+
+
+def simulate_groups(rows: np.ndarray, monsters: MonsterColumns, party: PartyColumns,
+                    battles: int = DEFAULT_BATTLES, jobs: int = 1, seed: int = 0,
+                    max_rounds: int = MAX_ROUNDS) -> Tuple[np.ndarray, np.ndarray]:
+    """Wins and (win rounds, all rounds) totals per group row, simulating each distinct row once."""
+    unique, inverse = np.unique(rows, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    per_chunk = max(1, CHUNK_BATTLES // battles)
+    chunks = [unique[i:i + per_chunk] for i in range(0, len(unique), per_chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    work = [(chunk, monsters, party, battles, s, max_rounds) for chunk, s in zip(chunks, seeds)]
+
+    with span("battle.simulate", records=len(unique) * battles):
+        if jobs > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(chunks))) as pool:
+                results = list(pool.map(_chunk_worker, work))
+        else:
+            results = [_chunk_worker(w) for w in work]
+    wins = np.concatenate([r[0] for r in results]) if results else np.zeros(0, dtype=np.int64)
+    totals = np.concatenate([r[1] for r in results]) if results else np.zeros((0, 2), dtype=np.int64)
+    return wins[inverse], totals[inverse]
+
+
+def group_results(indices: Sequence[int], rows: np.ndarray, monsters: MonsterColumns, wins: np.ndarray,
+                  totals: np.ndarray, battles: int) -> List[GroupResult]:
+    present = rows != NO_MONSTER
+    safe = np.where(present, rows, 0)
+    exp = (monsters.exp[safe] * present).sum(axis=1)
+    gold = (monsters.gold[safe] * present).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        to_win = totals[:, 0] / wins
+    results = []
+    for i, g in enumerate(indices):
+        ids = tuple(int(monsters.ids[r]) for r in rows[i] if r != NO_MONSTER)
+        results.append(GroupResult(int(g), ids, wins[i] / battles, float(to_win[i]), totals[i, 1] / battles,
+                                   int(exp[i]), int(gold[i])))
+    return results
+
+
+def format_table(results: Sequence[GroupResult]) -> List[str]:
+    lines = [f"{'Group':>6} {'Win':>7} {'Rounds':>7} {'EXP/min':>9} {'Gold/min':>9}  Monsters"]
+    for r in results:
+        lines.append(f"{r.group:>6} {r.win_rate:>7.1%} {r.rounds_to_win:>7.2f} {r.exp_per_minute:>9.1f} "
+                     f"{r.gold_per_minute:>9.1f}  {' '.join(f'{m:02X}' for m in r.monsters)}")
+    return lines
+
+
+def results_csv(results: Sequence[GroupResult]) -> str:
+    lines = ["group,monsters,win_rate,rounds_to_win,rounds,exp,gold,exp_per_minute,gold_per_minute"]
+    for r in results:
+        lines.append(f"{r.group},{' '.join(f'{m:02X}' for m in r.monsters)},{r.win_rate:.4f},"
+                     f"{r.rounds_to_win:.3f},{r.rounds:.3f},{r.exp},{r.gold},"
+                     f"{r.exp_per_minute:.2f},{r.gold_per_minute:.2f}")
+    return "\n".join(lines) + "\n"
+
+
+def parse_span(text: str) -> slice:
+    start, _, stop = text.partition(":")
+    return slice(int(start, 0) if start else None, int(stop, 0) if stop else None)
+
+
+def level_party(characters: Path, level: int, names: Sequence[str]) -> List[PartyMember]:
+    """Party at `level` from the characters' level-up data; refuses when there is none."""
+    if not 1 <= level <= MAX_LEVEL:
+        raise ValueError(f"--level must be 1-{MAX_LEVEL}, got {level}")
+    growth = growth_table(load_characters(characters), level, PARTY_STATS)
+    if not len(growth):
+        raise ValueError(f"No character in {characters} has levels/growth data; give the party with --member")
+    if growth.skipped:
+        print(f"Warning: {len(growth.skipped)} characters have no levels/growth data and are left out: "
+              f"{', '.join(growth.skipped)}")
+    members = growth_party(growth, level)
+    if names:
+        by_name = {m.name.lower(): m for m in members}
+        unknown = [n for n in names if n.lower() not in by_name]
+        if unknown:
+            raise ValueError(f"No growth data for party member(s) {', '.join(unknown)} "
+                             f"(have: {', '.join(growth.names)})")
+        members = [by_name[n.lower()] for n in names]
+    return members
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Monte Carlo battles for every encounter group")
+    parser.add_argument("--battles", type=int, default=DEFAULT_BATTLES, help="Battles per group")
+    parser.add_argument("--groups", type=parse_span, default=slice(None), metavar="START:STOP",
+                        help="Only groups START..STOP-1")
+    parser.add_argument("--member", action="append", type=parse_member, default=[], metavar="NAME:HP:ATK:DEF:AGI",
+                        help="Party member with equipped stats (repeatable)")
+    parser.add_argument("--level", type=int, help="Take the party from the characters' level-up data at this level")
+    parser.add_argument("--party", action="append", default=[], metavar="NAME",
+                        help="With --level: only these characters (repeatable; default: all with growth data)")
+    parser.add_argument("--characters", type=Path, default=dw4_chars_path)
+    parser.add_argument("--max-rounds", type=int, default=MAX_ROUNDS)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--top", type=int, default=10, help="Groups listed per summary table")
+    parser.add_argument("--csv", type=Path, help="Write every group's results here")
+    parser.add_argument("--monsters", type=Path, default=DW4_MONSTERS_DIR)
+    parser.add_argument("--encounters", type=Path, default=dw4_encounters_path)
+    args = parser.parse_args(argv)
+    if args.member and args.level is not None:
+        parser.error("give the party either with --member or with --level, not both")
+    if not args.member and args.level is None:
+        parser.error("no party: give --member NAME:HP:ATK:DEF:AGI or --level N (stats from characters.json)")
+    if args.party and args.level is None:
+        parser.error("--party needs --level")
+
+    try:
+        start = time.perf_counter()
+        members = args.member or level_party(args.characters, args.level, args.party)
+        monsters, groups = load_tables(args.monsters, args.encounters)
+        party = party_columns(members)
+        indices = range(len(groups))[args.groups]
+        rows, unknown = group_rows([groups[i] for i in indices], monsters)
+        if unknown:
+            print(f"Warning: {unknown} encounter slots name monsters missing from the monster table (ignored)")
+
+        wins, totals = simulate_groups(rows, monsters, party, args.battles, args.jobs, args.seed, args.max_rounds)
+        results = group_results(indices, rows, monsters, wins, totals, args.battles)
+        elapsed = time.perf_counter() - start
+
+        distinct = len(np.unique(rows, axis=0)) if len(rows) else 0
+        print(f"{len(results)} groups ({distinct} distinct) x {args.battles} battles, party of {len(party)} "
+              f"({', '.join(party.names)}) in {elapsed:.2f}s")
+        if results:
+            overall = sum(r.win_rate for r in results) / len(results)
+            print(f"Mean win rate {overall:.1%}")
+            print(f"\nHardest groups:")
+            print("\n".join(format_table(sorted(results, key=lambda r: (r.win_rate, r.group))[:args.top])))
+            print(f"\nBest EXP per minute:")
+            print("\n".join(format_table(sorted(results, key=lambda r: -r.exp_per_minute)[:args.top])))
+        if args.csv:
+            write_output(args.csv, results_csv(results))
+            print(f"\nWrote {args.csv}")
+        return 0
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
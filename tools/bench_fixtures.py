@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Synthetic inputs for the converter benchmarks.
+
+synthetic_rom() builds an MMC1-shaped iNES image (512 KB PRG, like DW4)
+filled with seeded noise, with a monster table planted at the real DW4
+location (Bank 6 $A2A2) and an item-like table at a second known offset,
+so extraction and the table scanner have something real to find.
+
+write_json_fixtures() writes the DW4 JSON tree the converters read
+(monsters/, items/, items.json, shops.json, spells/, encounters.json,
+characters.json) at a multiple of the current data set sizes. Output is
+deterministic for a given scale and seed.
+
+Usage:
+    python tools/bench_fixtures.py --output build/bench --scale 10
+"""
+
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+from nes_rom import (CHR_BANK_SIZE, DW4_MONSTER_BANK, DW4_MONSTER_CPU_ADDR, INES_HEADER_SIZE, PRG_BANK_SIZE,
+                     NesRom)
+from record_schema import DW4_MONSTER, ENCOUNTER_SLOTS
+from table_scanner import ITEM_SCAN
+
+# Sizes of the current DW4 JSON data set (scale 1)
+BASE_SIZES = {
+    "monsters": 50,
+    "items": 128,
+    "shops": 180,
+    "encounters": 7005,
+    "spells": 50,
+    "characters": 16,
+}
+SCALES = (1, 10, 100)
+
+ROM_PRG_BANKS = 32                  # 512 KB, the DW4 PRG size
+ROM_MONSTERS = 195
+ROM_ITEMS = 128
+ROM_ITEM_BANK = 7
+ROM_ITEM_CPU_ADDR = 0x8000
+MAPPER_MMC1 = 1
+
+SHOP_TYPES = {"0": "Weapon", "1": "Armor", "2": "Item", "3": "Inn"}
+MAX_ITEM_ID = 0xFE                  # $ff terminates interned shop lists
+
+
+class FixtureRom(NamedTuple):
+    data: bytes
+    tables: Dict[str, Tuple[int, int]]     # Planted table -> (file offset, record count)
+
+
+class FixtureTree(NamedTuple):
+    root: Path
+    monsters_dir: Path
+    items_dir: Path
+    items_file: Path
+    shops_file: Path
+    spells_file: Path
+    encounters_file: Path
+    characters_file: Path
+    counts: Dict[str, int]
+
+
+# ----------------------------------------------------------------------
+# ROM
+# ----------------------------------------------------------------------
+
+def ines_header(prg_banks: int, chr_banks: int = 0, mapper: int = MAPPER_MMC1) -> bytes:
+    """16-byte iNES header (horizontal mirroring, no trainer)."""
+    if not 0 < prg_banks < 256 or not 0 <= chr_banks < 256:
+        raise ValueError(f"iNES bank counts out of range: {prg_banks} PRG, {chr_banks} CHR")
+    return b"NES\x1a" + bytes([prg_banks, chr_banks, (mapper & 0x0F) << 4, mapper & 0xF0]) + bytes(8)
+
+
+def monster_row(rng: random.Random) -> Tuple:
+    """Plausible DW4_MONSTER row (HP 1-999 like the real table)."""
+    return (
+        rng.randrange(10000), rng.randrange(10000), rng.randrange(1, 1000),
+        rng.randrange(256), rng.randrange(256), rng.randrange(256),
+        rng.randbytes(6), rng.randbytes(4),
+        *(rng.randrange(256) for _ in range(8)),
+    )
+
+
+def synthetic_rom(monsters: int = ROM_MONSTERS, items: int = ROM_ITEMS, prg_banks: int = ROM_PRG_BANKS,
+                  chr_banks: int = 0, seed: int = 0) -> FixtureRom:
+    """Noise-filled iNES image with monster and item tables at known offsets."""
+    rng = random.Random(seed)
+    data = bytearray(ines_header(prg_banks, chr_banks))
+    data += rng.randbytes(prg_banks * PRG_BANK_SIZE + chr_banks * CHR_BANK_SIZE)
+    rom = NesRom(data)
+
+    monster_offset = rom.file_offset(DW4_MONSTER_BANK, DW4_MONSTER_CPU_ADDR)
+    table = DW4_MONSTER.pack_all([monster_row(rng) for _ in range(monsters)], monsters)
+    end = monster_offset + len(table)
+    if end + DW4_MONSTER.size > INES_HEADER_SIZE + (DW4_MONSTER_BANK + 1) * PRG_BANK_SIZE:
+        raise ValueError(f"{monsters} monsters do not fit in bank {DW4_MONSTER_BANK}")
+    data[monster_offset:end] = table
+    data[end:end + DW4_MONSTER.size] = bytes(DW4_MONSTER.size)   # HP 0 ends the table
+
+    item_schema = ITEM_SCAN.record
+    item_offset = rom.file_offset(ROM_ITEM_BANK, ROM_ITEM_CPU_ADDR)
+    for i in range(items):
+        item_schema.pack_into(data, item_offset + i * item_schema.size, rng.randrange(65001), rng.randrange(16),
+                              rng.randrange(256), rng.randrange(256), rng.randrange(256))
+
+    return FixtureRom(bytes(data), {"monster": (monster_offset, monsters), "item": (item_offset, items)})
+
+
+# ----------------------------------------------------------------------
+# JSON
+# ----------------------------------------------------------------------
+
+SYLLABLES = ("sli", "me", "dra", "ky", "bab", "ble", "gol", "em", "hea", "ler", "ma", "gi", "ko", "rak", "zo", "ma")
+
+
+def _name(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randrange(2, 4))).title()
+
+
+def monster_records(count: int, rng: random.Random) -> List[Dict]:
+    return [{
+        "id": i, "name": _name(rng),
+        "hp": rng.randrange(1, 1000), "exp": rng.randrange(10000), "gold": rng.randrange(10000),
+        "attack": rng.randrange(256), "defense": rng.randrange(256), "agility": rng.randrange(256),
+        "drop_item_id": rng.randrange(MAX_ITEM_ID), "drop_rate": rng.randrange(8),
+    } for i in range(count)]
+
+
+def item_records(count: int, rng: random.Random) -> List[Dict]:
+    return [{
+        "id": f"0x{i:02x}", "name": _name(rng), "price": rng.randrange(65001),
+        "type": rng.randrange(16), "flags": rng.randrange(256),
+    } for i in range(count)]
+
+
+def shop_records(count: int, rng: random.Random) -> List[Dict]:
+    """Shops in runs where each shop drops the first item of the previous one (like DW4)."""
+    shops = []
+    while len(shops) < count:
+        stock = sorted(rng.sample(range(MAX_ITEM_ID), rng.randrange(4, 17)))
+        shop_type = rng.randrange(len(SHOP_TYPES))
+        for start in range(min(rng.randrange(1, 5), count - len(shops))):
+            shops.append({"id": len(shops), "shop_type": shop_type, "item_ids": stock[start:]})
+    return shops
+
+
+def spell_records(count: int, rng: random.Random) -> List[Dict]:
+    return [{
+        "id": f"0x{i:02x}", "name": _name(rng), "mp_cost": rng.randrange(100), "effect_type": rng.randrange(16),
+        "power": rng.randrange(256), "target_type": rng.randrange(8), "element": rng.randrange(16),
+        "accuracy": rng.randrange(256),
+    } for i in range(count)]
+
+
+def encounter_records(count: int, monsters: int, rng: random.Random) -> List[Dict]:
+    """Groups drawn from a sliding window over one monster stream, so neighbours overlap."""
+    pool = [rng.randrange(1, min(monsters, 0xFF) + 1) for _ in range(count + ENCOUNTER_SLOTS)]
+    groups = []
+    pos = 0
+    for _ in range(count):
+        size = rng.randrange(1, ENCOUNTER_SLOTS + 1)
+        groups.append({"monster_ids": pool[pos:pos + size]})
+        pos = (pos + rng.randrange(1, 3)) % count
+    return groups
+
+
+def character_records(count: int, rng: random.Random) -> Dict[str, List[Dict]]:
+    chars = [{
+        "id": i, "name": _name(rng), "playable_chapter": rng.randrange(6), "class": "Hero",
+    } for i in range(count)]
+    split = min(8, count)
+    return {"party_members": chars[:split], "extra_companions": chars[split:]}
+
+
+def _dump(path: Path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def write_json_fixtures(root: Path, scale: int = 1, seed: int = 0) -> FixtureTree:
+    """Write the DW4 JSON tree at scale x the current sizes under root."""
+    rng = random.Random(seed * 1000 + scale)
+    counts = {name: size * scale for name, size in BASE_SIZES.items()}
+    tree = FixtureTree(
+        root=root,
+        monsters_dir=root / "monsters",
+        items_dir=root / "items",
+        items_file=root / "items.json",
+        shops_file=root / "shops.json",
+        spells_file=root / "spells" / "spells.json",
+        encounters_file=root / "encounters.json",
+        characters_file=root / "characters.json",
+        counts=counts,
+    )
+
+    # File names sort in ID order, as the loaders rely on
+    monsters = monster_records(counts["monsters"], rng)
+    width = max(3, len(str(len(monsters))))
+    for m in monsters:
+        _dump(tree.monsters_dir / f"monster_{m['id']:0{width}d}.json", m)
+
+    items = item_records(counts["items"], rng)
+    width = max(3, len(str(len(items))))
+    for i, itm in enumerate(items):
+        _dump(tree.items_dir / f"item_{i:0{width}d}.json", itm)
+    _dump(tree.items_file, items)
+
+    _dump(tree.shops_file, {"shops": shop_records(counts["shops"], rng), "shop_types": SHOP_TYPES})
+    _dump(tree.spells_file, {"spells": spell_records(counts["spells"], rng)})
+    _dump(tree.encounters_file,
+          {"encounter_groups": encounter_records(counts["encounters"], counts["monsters"], rng)})
+    _dump(tree.characters_file, character_records(counts["characters"], rng))
+    return tree
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate benchmark fixtures (synthetic ROM + DW4 JSON tree)")
+    parser.add_argument("--output", type=Path, required=True, help="Directory for the fixtures")
+    parser.add_argument("--scale", type=int, default=1, help="Multiple of the current data set sizes")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rom = synthetic_rom(seed=args.seed)
+    rom_path = args.output / "synthetic.nes"
+    rom_path.parent.mkdir(parents=True, exist_ok=True)
+    rom_path.write_bytes(rom.data)
+    print(f"ROM: {rom_path} ({len(rom.data)} bytes)")
+    for name, (offset, count) in rom.tables.items():
+        print(f"  {name:<8} {count:>4} records at ${offset:06X}")
+
+    tree = write_json_fixtures(args.output / f"json_x{args.scale}", args.scale, args.seed)
+    print(f"JSON: {tree.root}")
+    for name, count in tree.counts.items():
+        print(f"  {name:<11} {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the ROM tools and the JSON -> .pasm converters.
+
+Generates a synthetic ROM and DW4 JSON fixture trees (bench_fixtures.py) at
+1x / 10x / 100x the current data sizes, points the converters at them and
+times every phase per tool:
+
+    extract   ROM -> MonsterTable, DQ3r repack
+    scan      table_scanner over the whole ROM, one run per schema
+    load      JSON files -> records (plain, snapshot cache, single file)
+    convert   records -> packed binary rows / packed encounters / interned shops
+    emit      write_*_pasm to text and to .incbin blobs
+    pipeline  dq4r_pipeline end to end (forced, all stages)
+
+Each benchmark keeps the best of --repeat timed runs and, in one extra run
+under tracemalloc, the peak traced memory. Results are compared with the
+stored baseline; a benchmark is flagged when it is slower or uses more
+memory than the baseline by more than the tolerance. The exit status is 1
+when anything regressed, so the harness can gate a CI job.
+
+Usage:
+    python tools/benchmark.py
+    python tools/benchmark.py --scales 1 10 100 --repeat 5
+    python tools/benchmark.py --only emit --scales 100
+    python tools/benchmark.py --save-baseline
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+
+import characters_converter
+import encounters_converter
+import items_shops_converter
+import items_shops_simple
+import json_to_pasm
+import spells_converter
+from bench_fixtures import SCALES, FixtureTree, synthetic_rom, write_json_fixtures
+from build_cache import BuildCache, REPO_ROOT
+from dq4r_pipeline import build_stages, run_pipeline
+from dw4_extractor import DQ3RMonster
+from dw4_monster_table import MonsterTable
+from encounter_packer import pack_encounters
+from json_snapshot import load_json_dir
+from nes_rom import NesRom
+from pasm_writer import write_pasm
+from record_schema import ITEM_WITH_ID, MONSTER, SPELL
+from shop_inventory import intern_inventories
+from table_scanner import SCHEMAS, scan_rom
+
+BASELINE_FILE = Path(__file__).parent / "benchmark_baseline.json"
+RESULTS_FILE = REPO_ROOT / "build" / "benchmark_results.json"
+RESULTS_VERSION = 1
+
+DEFAULT_SCALES = (1, 10)
+TIME_TOLERANCE = 0.20        # Flag runs more than 20% slower than the baseline
+MEMORY_TOLERANCE = 0.10      # ... or with a peak more than 10% higher
+MIN_SECONDS = 0.002          # Time differences below this are noise
+
+# Module-level input paths the converters read, redirected to the fixtures while benchmarking
+FIXTURE_PATHS = [
+    (json_to_pasm, "DW4_MONSTERS_DIR", "monsters_dir"),
+    (json_to_pasm, "DW4_ITEMS_DIR", "items_dir"),
+    (items_shops_simple, "DW4_ITEMS_FILE", "items_file"),
+    (items_shops_simple, "DW4_SHOPS_FILE", "shops_file"),
+    (items_shops_converter, "DW4_ITEMS_FILE", "items_file"),
+    (items_shops_converter, "DW4_SHOPS_FILE", "shops_file"),
+    (spells_converter, "dw4_spells_path", "spells_file"),
+    (encounters_converter, "dw4_encounters_path", "encounters_file"),
+    (characters_converter, "dw4_chars_path", "characters_file"),
+]
+
+
+class Benchmark(NamedTuple):
+    name: str                     # phase.tool[.variant]
+    run: Callable[[], int]        # Returns the number of records processed
+
+
+class BenchResult(NamedTuple):
+    name: str
+    scale: str                    # "x10", or "rom" for the fixed-size ROM benchmarks
+    records: int
+    seconds: float                # Best of the timed runs
+    peak_bytes: int               # tracemalloc peak of one extra run
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}@{self.scale}"
+
+    @property
+    def throughput(self) -> float:
+        return self.records / self.seconds if self.seconds else 0.0
+
+
+@contextlib.contextmanager
+def fixture_paths(tree: FixtureTree) -> Iterator[None]:
+    """Point the converters' input path constants at a fixture tree."""
+    saved = [(module, attr, getattr(module, attr)) for module, attr, _ in FIXTURE_PATHS]
+    try:
+        for module, attr, field in FIXTURE_PATHS:
+            setattr(module, attr, getattr(tree, field))
+        yield
+    finally:
+        for module, attr, value in saved:
+            setattr(module, attr, value)
+
+
+def _load_json(path: Path):
+    with open(path) as f:
+        return json.load(f)
+
+
+# ----------------------------------------------------------------------
+# Benchmark sets
+# ----------------------------------------------------------------------
+
+def rom_benchmarks(rom_path: Path) -> List[Benchmark]:
+    """Extraction and scanning over the synthetic ROM (fixed size)."""
+    with NesRom.open(rom_path) as rom:
+        table = MonsterTable.from_rom(rom)
+        if not len(table):
+            raise RuntimeError(f"{rom_path}: no monster table at the planted offset")
+
+    def extract_monsters():
+        with NesRom.open(rom_path) as rom:
+            return len(MonsterTable.from_rom(rom))
+
+    def extract_dq3r():
+        return len(DQ3RMonster.from_dw4_table(table)) // DQ3RMonster.SIZE
+
+    def scanner(schema):
+        def scan():
+            with NesRom.open(rom_path) as rom:
+                scan_rom(rom, schema)
+                return len(rom.prg) // schema.record.size
+        return scan
+
+    return [
+        Benchmark("extract.monsters", extract_monsters),
+        Benchmark("extract.dq3r_repack", extract_dq3r),
+        *(Benchmark(f"scan.{name}", scanner(schema)) for name, schema in SCHEMAS.items()),
+    ]
+
+
+def json_benchmarks(tree: FixtureTree, work_dir: Path) -> List[Benchmark]:
+    """Loading, conversion and emission over one fixture tree."""
+    snapshot_dir = work_dir / "snapshots"
+    out_dir = work_dir / "out"
+    load_json_dir(tree.monsters_dir, "monster_*.json", snapshot_dir)   # Prime the snapshot
+
+    monsters = load_json_dir(tree.monsters_dir, "monster_*.json", None)
+    items = load_json_dir(tree.items_dir, "item_*.json", None)
+    shops_data = _load_json(tree.shops_file)
+    spells = spells_converter.spells_from_json(_load_json(tree.spells_file))
+    groups = encounters_converter.encounters_from_json(_load_json(tree.encounters_file))
+    chars = characters_converter.characters_from_json(_load_json(tree.characters_file))
+    simple_items = items_shops_simple.items_from_json(_load_json(tree.items_file))
+    inventories = [shop.get("item_ids", [])[:items_shops_converter.MAX_SHOP_ITEMS] for shop in shops_data["shops"]]
+
+    def emit(name, func, *args, incbin=False):
+        def run():
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                return write_pasm(out_dir / f"{name}.pasm", func, *args, incbin=incbin)
+        return run
+
+    def pack(schema, records):
+        def run():
+            return len(schema.pack_all([schema.row_from_json(r) for r in records], len(records))) // schema.size
+        return run
+
+    return [
+        Benchmark("load.monsters", lambda: len(load_json_dir(tree.monsters_dir, "monster_*.json", None))),
+        Benchmark("load.monsters_snapshot", lambda: len(load_json_dir(tree.monsters_dir, "monster_*.json",
+                                                                      snapshot_dir))),
+        Benchmark("load.items", lambda: len(load_json_dir(tree.items_dir, "item_*.json", None))),
+        Benchmark("load.encounters", lambda: len(_load_json(tree.encounters_file)["encounter_groups"])),
+        Benchmark("convert.monsters", pack(MONSTER, monsters)),
+        Benchmark("convert.items", pack(ITEM_WITH_ID, items)),
+        Benchmark("convert.spells", pack(SPELL, spells)),
+        Benchmark("convert.encounters_packed", lambda: pack_encounters([g.get("monster_ids", []) for g in groups]).count),
+        Benchmark("convert.shops_interned", lambda: len(intern_inventories(inventories).offsets)),
+        Benchmark("emit.monsters", emit("monsters", json_to_pasm.write_monsters_pasm, monsters)),
+        Benchmark("emit.items", emit("items", items_shops_simple.write_items_pasm, simple_items)),
+        Benchmark("emit.shops", emit("shops", items_shops_converter.write_shops_pasm, shops_data)),
+        Benchmark("emit.shops_interned", emit("shops_i", items_shops_converter.write_interned_shops_pasm, shops_data)),
+        Benchmark("emit.spells", emit("spells", spells_converter.write_spells_pasm, spells)),
+        Benchmark("emit.encounters", emit("encounters", encounters_converter.write_encounters_pasm, groups)),
+        Benchmark("emit.encounters_incbin", emit("encounters_b", encounters_converter.write_encounters_pasm, groups,
+                                                 incbin=True)),
+        Benchmark("emit.encounters_packed", emit("encounters_p", encounters_converter.write_packed_encounters_pasm,
+                                                 groups)),
+        Benchmark("emit.characters", emit("characters", characters_converter.write_characters_pasm, chars)),
+        Benchmark("pipeline.all", lambda: _run_pipeline(out_dir / "pipeline", work_dir / "cache.json")),
+    ]
+
+
+def _run_pipeline(output_dir: Path, manifest: Path) -> int:
+    cache = BuildCache(manifest, force=True)
+    results = run_pipeline(build_stages(), output_dir, cache=cache)
+    failed = [r for r in results if r.status != "built"]
+    if failed:
+        raise RuntimeError(f"pipeline stage {failed[0].name} {failed[0].status}: {failed[0].detail}")
+    return sum(r.records for r in results)
+
+
+# ----------------------------------------------------------------------
+# Measurement
+# ----------------------------------------------------------------------
+
+def measure(bench: Benchmark, scale: str, repeat: int) -> BenchResult:
+    """Best-of-repeat wall time plus the tracemalloc peak of one extra run."""
+    records = 0
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        gc.collect()
+        start = time.perf_counter()
+        records = bench.run()
+        best = min(best, time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        bench.run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return BenchResult(bench.name, scale, records, best, peak)
+
+
+def select(benches: List[Benchmark], only: Optional[List[str]]) -> List[Benchmark]:
+    if not only:
+        return benches
+    return [b for b in benches if any(pattern in b.name for pattern in only)]
+
+
+def run_benchmarks(scales=DEFAULT_SCALES, repeat: int = 3, only: Optional[List[str]] = None,
+                   work_dir: Optional[Path] = None, seed: int = 0) -> List[BenchResult]:
+    """Generate fixtures under work_dir (a temp dir by default) and run every selected benchmark."""
+    own_dir = work_dir is None
+    work_dir = Path(tempfile.mkdtemp(prefix="dq4r-bench-")) if own_dir else Path(work_dir)
+    results: List[BenchResult] = []
+    try:
+        rom_path = work_dir / "synthetic.nes"
+        rom_path.parent.mkdir(parents=True, exist_ok=True)
+        rom_path.write_bytes(synthetic_rom(seed=seed).data)
+        for bench in select(rom_benchmarks(rom_path), only):
+            results.append(measure(bench, "rom", repeat))
+            print_result(results[-1])
+
+        for scale in scales:
+            scale_dir = work_dir / f"x{scale}"
+            tree = write_json_fixtures(scale_dir / "json", scale, seed)
+            with fixture_paths(tree):
+                benches = select(json_benchmarks(tree, scale_dir), only)
+                for bench in benches:
+                    results.append(measure(bench, f"x{scale}", repeat))
+                    print_result(results[-1])
+    finally:
+        if own_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+# ----------------------------------------------------------------------
+# Baseline
+# ----------------------------------------------------------------------
+
+def save_results(path: Path, results: List[BenchResult]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    doc = {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": {
+            r.key: {"records": r.records, "seconds": round(r.seconds, 6), "peak_bytes": r.peak_bytes}
+            for r in results
+        },
+    }
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", newline="\n") as f:
+        json.dump(doc, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def load_baseline(path: Path) -> Dict[str, dict]:
+    try:
+        with open(path) as f:
+            doc = json.load(f)
+    except FileNotFoundError:
+        return {}
+    if doc.get("version") != RESULTS_VERSION:
+        print(f"Warning: ignoring baseline {path} (version {doc.get('version')})")
+        return {}
+    return doc.get("results", {})
+
+
+def compare(result: BenchResult, base: Optional[dict], time_tolerance: float = TIME_TOLERANCE,
+            memory_tolerance: float = MEMORY_TOLERANCE) -> List[str]:
+    """Regression notes for one result ([] if within tolerance or no baseline)."""
+    if not base:
+        return []
+    notes = []
+    if base.get("records") != result.records:
+        # A different workload is not comparable
+        return [f"records {base.get('records')} -> {result.records}"]
+    seconds = base.get("seconds", 0.0)
+    if result.seconds > seconds * (1 + time_tolerance) and result.seconds - seconds > MIN_SECONDS:
+        notes.append(f"time +{100.0 * (result.seconds / seconds - 1):.0f}%" if seconds else "time")
+    peak = base.get("peak_bytes", 0)
+    if peak and result.peak_bytes > peak * (1 + memory_tolerance):
+        notes.append(f"memory +{100.0 * (result.peak_bytes / peak - 1):.0f}%")
+    return notes
+
+
+# ----------------------------------------------------------------------
+# Report
+# ----------------------------------------------------------------------
+
+def _size(n: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.1f}GB"
+
+
+def print_header():
+    print(f"\n{'Benchmark':<30} {'Scale':<6} {'Records':>8} {'Time':>10} {'Rec/s':>11} {'Peak':>9}")
+    print("-" * 79)
+
+
+def print_result(r: BenchResult):
+    print(f"{r.name:<30} {r.scale:<6} {r.records:>8} {r.seconds * 1000:>8.2f}ms {r.throughput:>11,.0f} "
+          f"{_size(r.peak_bytes):>9}")
+
+
+def print_comparison(results: List[BenchResult], baseline: Dict[str, dict], time_tolerance: float,
+                     memory_tolerance: float) -> int:
+    """Print regressions against the baseline; returns how many benchmarks regressed."""
+    regressions = 0
+    missing = 0
+    print("-" * 79)
+    for r in results:
+        base = baseline.get(r.key)
+        if base is None:
+            missing += 1
+            continue
+        notes = compare(r, base, time_tolerance, memory_tolerance)
+        if notes:
+            regressions += 1
+            print(f"REGRESSION {r.key}: {', '.join(notes)} "
+                  f"({base['seconds'] * 1000:.2f}ms -> {r.seconds * 1000:.2f}ms, "
+                  f"{_size(base['peak_bytes'])} -> {_size(r.peak_bytes)})")
+    compared = len(results) - missing
+    print(f"{compared} compared with the baseline, {regressions} regressed"
+          + (f", {missing} without a baseline entry" if missing else ""))
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the ROM tools and JSON -> .pasm converters")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(DEFAULT_SCALES),
+                        help=f"Fixture sizes as multiples of the current data (e.g. {' '.join(map(str, SCALES))})")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark (best is kept)")
+    parser.add_argument("--only", nargs="+", metavar="PATTERN", help="Run benchmarks whose name contains PATTERN")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE, help="Baseline results to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--results", type=Path, default=RESULTS_FILE, help="Where to write this run's results")
+    parser.add_argument("--tolerance", type=float, default=TIME_TOLERANCE, help="Allowed slowdown (0.2 = 20%%)")
+    parser.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE,
+                        help="Allowed peak memory growth (0.1 = 10%%)")
+    parser.add_argument("--work-dir", type=Path, help="Keep fixtures and outputs here instead of a temp dir")
+    parser.add_argument("--seed", type=int, default=0, help="Fixture generator seed")
+    args = parser.parse_args(argv)
+
+    print("=" * 79)
+    print("DQ4r Tool Benchmarks")
+    print("=" * 79)
+
+    try:
+        print_header()
+        results = run_benchmarks(args.scales, args.repeat, args.only, args.work_dir, args.seed)
+        save_results(args.results, results)
+        print(f"\nResults: {args.results}")
+
+        if args.save_baseline:
+            save_results(args.baseline, results)
+            print(f"Baseline saved: {args.baseline}")
+            return 0
+
+        baseline = load_baseline(args.baseline)
+        if not baseline:
+            print(f"No baseline at {args.baseline} (store one with --save-baseline)")
+            return 0
+        return 1 if print_comparison(results, baseline, args.tolerance, args.memory_tolerance) else 0
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Content-hash cache manifest for the JSON -> .pasm converters.
+
+For every converter stage the manifest records the SHA-256 of each input
+file, a hash of the converter source code, and the SHA-256 of each output.
+A stage is fresh (and can be skipped) when all three still match. File
+hashes are reused from the manifest while a file's size and mtime are
+unchanged, so checking a no-op build does not even read the inputs.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+PathLike = Union[str, Path]
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+CACHE_MANIFEST = REPO_ROOT / "build" / "converter_cache.json"
+MANIFEST_VERSION = 1
+
+# Shared modules every converter depends on (writers, the JSON snapshot format, tracing hooks)
+COMMON_CODE = [
+    Path(__file__).resolve(),
+    Path(__file__).resolve().parent / "record_schema.py",
+    Path(__file__).resolve().parent / "pasm_writer.py",
+    Path(__file__).resolve().parent / "output_file.py",
+    Path(__file__).resolve().parent / "instrumentation.py",
+    Path(__file__).resolve().parent / "json_snapshot.py",
+]
+
+
+def hash_file(path: PathLike) -> Optional[str]:
+    """SHA-256 of a file's bytes, or None if it does not exist."""
+    h = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    except FileNotFoundError:
+        return None
+    return h.hexdigest()
+
+
+class BuildCache:
+    """Per-stage input/code/output hashes persisted as JSON."""
+
+    def __init__(self, manifest_path: PathLike = CACHE_MANIFEST, force: bool = False):
+        self.manifest_path = Path(manifest_path)
+        self.force = force
+        self._lock = threading.Lock()
+        self._stages: Dict[str, dict] = {}
+        self._stat_cache: Dict[str, dict] = {}
+        try:
+            with open(self.manifest_path) as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self._stages = data.get("stages", {})
+                self._stat_cache = data.get("files", {})
+        except (FileNotFoundError, ValueError):
+            pass
+
+    # ------------------------------------------------------------------
+    # Hashing
+    # ------------------------------------------------------------------
+
+    def file_digest(self, path: PathLike) -> Optional[str]:
+        """Hash of a file, reusing the recorded hash while size/mtime are unchanged."""
+        key = str(Path(path).resolve())
+        try:
+            st = os.stat(key)
+        except FileNotFoundError:
+            return None
+        cached = self._stat_cache.get(key)
+        if cached and cached["size"] == st.st_size and cached["mtime_ns"] == st.st_mtime_ns:
+            return cached["sha256"]
+        digest = hash_file(key)
+        with self._lock:
+            self._stat_cache[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+        return digest
+
+    def digests(self, paths: Iterable[PathLike]) -> Dict[str, Optional[str]]:
+        return {str(Path(p).resolve()): self.file_digest(p) for p in paths}
+
+    def code_version(self, code_files: Iterable[PathLike]) -> str:
+        """Combined hash of the converter source files (plus shared modules)."""
+        h = hashlib.sha256()
+        files = sorted({str(Path(p).resolve()) for p in list(code_files) + COMMON_CODE})
+        for path in files:
+            h.update(path.encode())
+            h.update((self.file_digest(path) or "missing").encode())
+        return h.hexdigest()
+
+    # ------------------------------------------------------------------
+    # Stages
+    # ------------------------------------------------------------------
+
+    def is_fresh(self, stage: str, inputs: Iterable[PathLike], outputs: Iterable[PathLike],
+                 code_files: Iterable[PathLike], options: Optional[dict] = None) -> bool:
+        """True if inputs, converter code, options and outputs all match the last recorded run."""
+        if self.force:
+            return False
+        entry = self._stages.get(stage)
+        if entry is None or entry.get("options") != (options or {}):
+            return False
+        if entry["code"] != self.code_version(code_files):
+            return False
+        if entry["inputs"] != self.digests(inputs):
+            return False
+        outputs = self.digests(outputs)
+        if None in outputs.values():
+            return False
+        return entry["outputs"] == outputs
+
+    def record(self, stage: str, inputs: Iterable[PathLike], outputs: Iterable[PathLike],
+               code_files: Iterable[PathLike], options: Optional[dict] = None):
+        """Store the hashes of a finished stage and save the manifest."""
+        entry = {
+            "options": options or {},
+            "code": self.code_version(code_files),
+            "inputs": self.digests(inputs),
+            "outputs": self.digests(outputs),
+        }
+        with self._lock:
+            self._stages[stage] = entry
+        self.save()
+
+    def invalidate(self, stage: str):
+        with self._lock:
+            self._stages.pop(stage, None)
+        self.save()
+
+    def save(self):
+        """Write the manifest atomically."""
+        with self._lock:
+            data = {"version": MANIFEST_VERSION, "stages": self._stages, "files": self._stat_cache}
+            self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.manifest_path.with_suffix(".tmp")
+            with open(tmp, "w") as f:
+                json.dump(data, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.manifest_path)
+
+
+def glob_inputs(directory: PathLike, pattern: str) -> List[Path]:
+    """Sorted input files of a directory stage (adding/removing a file changes the key)."""
+    directory = Path(directory)
+    return sorted(directory.glob(pattern)) if directory.exists() else []
@@ -1,64 +1,219 @@
 #!/usr/bin/env python3
-"""Convert DW4 characters JSON to .pasm format."""
+"""
+Convert DW4 characters JSON to .pasm format.
+
+Besides CHARACTER_TABLE the file holds the level-up tables, so the engine
+never evaluates a growth curve: stat_growth.py turns each character's
+"levels" / "growth" data into values for levels 1..MAX_LEVEL, and every stat
+becomes one table (structure of arrays) with one row per character that has
+such data. Nothing is filled in for the others: GROWTH_INDEX gives each
+CHARACTER_TABLE entry its row, or GROWTH_NONE, and with no growth data at all
+the tables are left out. A character with data that misses a stat stops the
+build. Per stat:
+
+	GROWTH_BYTES    value at each level, .byte
+	GROWTH_WORDS    value at each level, .word
+	GROWTH_DELTAS   <STAT>_BASE .word level 1 value per character, then
+	                .byte gain on reaching levels 2..MAX_LEVEL
+
+The smallest encoding that fits is picked per stat (GROWTH_<STAT>_MODE).
+EXP thresholds are split into EXP_TABLE_LO (.word) / EXP_TABLE_HI (.byte)
+rows of EXP_SEARCH_SIZE entries, padded with $FFFFFF, so the level for an
+EXP total is a fixed-length binary search: the number of entries <= EXP.
+That needs the engine to saturate EXP at EXP_CAP ($FFFFFE), one below the
+padding; every real threshold already fits below it.
+"""
 
 import json
+import sys
 from pathlib import Path
+from typing import Any, Dict, List, NamedTuple
 
-def safe_int(val, default=0):
-	"""Safely convert value to int."""
-	if val is None:
-		return default
-	if isinstance(val, int):
-		return val
-	if isinstance(val, str):
-		if val.startswith('0x'):
-			try:
-				return int(val, 16)
-			except ValueError:
-				return default
-		try:
-			return int(val)
-		except ValueError:
-			return default
-	return default
+import numpy as np
+
+import stat_growth
+from record_schema import CHARACTER, safe_int
+from build_cache import BuildCache
+from pasm_writer import PasmWriter, output_files, write_pasm
+from instrumentation import traced
+from stat_growth import MAX_EXP, STATS, GrowthTable, growth_table
 
 # Paths
 dw4_chars_path = Path("C:/Users/me/source/repos/dragon-warrior-4-info/assets/json/characters.json")
 output_pasm = Path("src/data/characters_dw4.pasm")
 
-# Load characters JSON
-with open(dw4_chars_path) as f:
-	data = json.load(f)
-
-party_members = data.get("party_members", [])
-extra_companions = data.get("extra_companions", [])
-
-all_chars = party_members + extra_companions
-print(f"Converting DW4 characters JSON to .pasm...")
-print(f"Loaded {len(party_members)} party members + {len(extra_companions)} companions = {len(all_chars)} total")
-
-# Generate .pasm
-pasm_lines = [
-	"; Characters: {} total (party + companions) from DW4".format(len(all_chars)),
-	"CHARACTER_COUNT = ${:02x}".format(len(all_chars)),
-	"",
-	"CHARACTER_TABLE:",
-]
-
-for char in all_chars:
-	char_id = safe_int(char.get("id"), 0)
-	name = char.get("name", f"char_{char_id:02x}")
-	chapter = safe_int(char.get("playable_chapter", char.get("chapter", 0)), 0)
-	char_class = char.get("class", "Unknown")
-	
-	label = f"char_{char_id:02x}"
-	pasm_lines.append(f"{label}: .byte ${char_id:02x}, ${chapter:02x} ; {name}")
-
-pasm_lines.append("")
-
-# Write .pasm file
-output_pasm.parent.mkdir(parents=True, exist_ok=True)
-with open(output_pasm, 'w') as f:
-	f.write('\n'.join(pasm_lines))
-
-print(f"Wrote {output_pasm}")
+# Level-up table encodings
+GROWTH_BYTES = 0
+GROWTH_WORDS = 1
+GROWTH_DELTAS = 2
+GROWTH_NAMES = {"hp": "HP", "mp": "MP", "strength": "STR", "agility": "AGI",
+				"resilience": "RES", "wisdom": "WIS", "luck": "LUCK"}
+EXP_SEARCH_SIZE = 128		# Power of two >= MAX_LEVEL: every lookup is a 7-step binary search
+EXP_PAD = MAX_EXP			# Padding entry of the EXP rows
+EXP_CAP = MAX_EXP - 1		# Engine EXP saturates here, so a padding entry is never <= EXP
+GROWTH_NONE = 0xFF			# GROWTH_INDEX entry of a character without growth rows
+
+
+class StatTable(NamedTuple):
+	name: str					# Label suffix, e.g. HP -> GROWTH_HP
+	mode: int
+	base: np.ndarray			# (C,) level 1 values (GROWTH_DELTAS only)
+	rows: np.ndarray			# (C, entries) emitted values per character
+
+	@property
+	def size(self) -> int:
+		"""Bytes in the ROM."""
+		word = 2 if self.mode == GROWTH_WORDS else 1
+		return self.rows.size * word + (self.base.size * 2 if self.mode == GROWTH_DELTAS else 0)
+
+
+@traced("characters.normalize")
+def characters_from_json(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+	"""Party members followed by extra companions."""
+	return data.get("party_members", []) + data.get("extra_companions", [])
+
+
+@traced("characters.load")
+def load_characters(path: Path = dw4_chars_path) -> List[Dict[str, Any]]:
+	with open(path) as f:
+		return characters_from_json(json.load(f))
+
+
+def pack_stat(name: str, values: np.ndarray) -> StatTable:
+	"""Smallest encoding of a (characters, levels) stat table: bytes, level-1 words + byte gains, or words."""
+	values = np.asarray(values, dtype=np.int64)
+	if values.min() < 0 or values.max() > 0xFFFF:
+		raise ValueError(f"{name} values must be 0-$FFFF, got {values.min()}..{values.max()}")
+	empty = np.zeros(0, dtype=np.int64)
+	if values.max() <= 0xFF:
+		return StatTable(name, GROWTH_BYTES, empty, values)
+	gains = np.diff(values, axis=1)
+	if gains.size and 0 <= gains.min() and gains.max() <= 0xFF:
+		return StatTable(name, GROWTH_DELTAS, values[:, 0], gains)
+	return StatTable(name, GROWTH_WORDS, empty, values)
+
+
+def growth_tables(growth: GrowthTable) -> List[StatTable]:
+	return [pack_stat(GROWTH_NAMES[stat], growth.stats[stat]) for stat in STATS]
+
+
+def exp_search_rows(growth: GrowthTable) -> np.ndarray:
+	"""(C, EXP_SEARCH_SIZE) thresholds: entry i = EXP to reach level i + 1, then EXP_PAD."""
+	rows = np.full((len(growth), EXP_SEARCH_SIZE), EXP_PAD, dtype=np.int64)
+	rows[:, :len(growth.levels)] = growth.stats["exp"]
+	return rows
+
+
+def growth_index(growth: GrowthTable, count: int) -> np.ndarray:
+	"""(count,) growth row of each CHARACTER_TABLE entry, GROWTH_NONE where it has none."""
+	if len(growth) >= GROWTH_NONE:
+		raise ValueError(f"{len(growth)} characters with growth data; GROWTH_INDEX holds at most {GROWTH_NONE - 1}")
+	index = np.full(count, GROWTH_NONE, dtype=np.int32)
+	index[growth.source] = np.arange(len(growth))
+	return index
+
+
+def write_growth_pasm(w: PasmWriter, growth: GrowthTable, count: int):
+	"""Level-up stat tables and EXP thresholds, one row per character with growth data."""
+	levels = len(growth.levels)
+	w.comment(f"Level-up tables: {len(growth)} of {count} characters, {levels} levels each, one table per stat")
+	w.const("GROWTH_ROWS", f"${len(growth):02x}")
+	w.const("GROWTH_LEVELS", f"${levels:02x}")
+	w.const("GROWTH_NONE", f"${GROWTH_NONE:02x}")
+	w.const("GROWTH_BYTES", f"${GROWTH_BYTES:02x}")
+	w.const("GROWTH_WORDS", f"${GROWTH_WORDS:02x}")
+	w.const("GROWTH_DELTAS", f"${GROWTH_DELTAS:02x}")
+	w.blank()
+	w.comment("Growth row per CHARACTER_TABLE entry, GROWTH_NONE without growth data")
+	w.label("GROWTH_INDEX")
+	w.data("B", (int(v) for v in growth_index(growth, count)))
+	for table in growth_tables(growth):
+		label = f"GROWTH_{table.name}"
+		code = "H" if table.mode == GROWTH_WORDS else "B"
+		w.blank()
+		w.const(f"{label}_MODE", f"${table.mode:02x}")
+		w.const(f"{label}_STRIDE", f"${table.rows.shape[1] * (2 if code == 'H' else 1):02x}")
+		if table.mode == GROWTH_DELTAS:
+			w.label(f"{label}_BASE")
+			w.data("H", (int(v) for v in table.base))
+		w.label(label)
+		for char_id, name, row in zip(growth.ids, growth.names, table.rows):
+			w.label(f"{label.lower()}_{char_id:02x}", comment=name)
+			w.data(code, (int(v) for v in row))
+
+	rows = exp_search_rows(growth)
+	w.blank()
+	w.comment(f"EXP to reach level i + 1 at entry i; {EXP_SEARCH_SIZE} entries per character, "
+			  f"padded with ${EXP_PAD:06x}")
+	w.comment("EXP must saturate at EXP_CAP, below the padding, or a lookup can run past GROWTH_LEVELS")
+	w.const("EXP_SEARCH_SIZE", f"${EXP_SEARCH_SIZE:02x}")
+	w.const("EXP_CAP", f"${EXP_CAP:06x}")
+	w.label("EXP_TABLE_LO")
+	for char_id, name, row in zip(growth.ids, growth.names, rows):
+		w.label(f"exp_lo_{char_id:02x}", comment=name)
+		w.data("H", (int(v) & 0xFFFF for v in row))
+	w.label("EXP_TABLE_HI")
+	for char_id, name, row in zip(growth.ids, growth.names, rows):
+		w.label(f"exp_hi_{char_id:02x}", comment=name)
+		w.data("B", (int(v) >> 16 for v in row))
+
+
+@traced("characters.emit")
+def write_characters_pasm(w: PasmWriter, all_chars: List[Dict[str, Any]]) -> int:
+	w.comment("Characters: {} total (party + companions) from DW4".format(len(all_chars)))
+	w.const("CHARACTER_COUNT", "${:02x}".format(len(all_chars)))
+	w.blank()
+	w.label("CHARACTER_TABLE")
+
+	for char in all_chars:
+		char_id = safe_int(char.get("id"), 0)
+		name = char.get("name", f"char_{char_id:02x}")
+		chapter = safe_int(char.get("playable_chapter", char.get("chapter", 0)), 0)
+
+		w.row(f"char_{char_id:02x}", CHARACTER, (char_id, chapter), name)
+
+	growth = growth_table(all_chars)
+	if len(growth):
+		w.blank()
+		write_growth_pasm(w, growth, len(all_chars))
+	w.line()
+	return len(all_chars)
+
+
+def main(cache: BuildCache = None):
+	cache = cache or BuildCache(force="--force" in sys.argv[1:])
+	incbin = "--incbin" in sys.argv[1:]
+	outputs = output_files(output_pasm, incbin)
+	options = {"incbin": True} if incbin else None
+	code = [__file__, stat_growth.__file__]
+	if cache.is_fresh("characters", [dw4_chars_path], outputs, code, options):
+		print(f"{output_pasm} is up to date")
+		return
+
+	# Load characters JSON
+	with open(dw4_chars_path) as f:
+		data = json.load(f)
+
+	party_members = data.get("party_members", [])
+	extra_companions = data.get("extra_companions", [])
+	all_chars = characters_from_json(data)
+	print(f"Converting DW4 characters JSON to .pasm...")
+	print(f"Loaded {len(party_members)} party members + {len(extra_companions)} companions = {len(all_chars)} total")
+	growth = growth_table(all_chars)
+	if growth.skipped:
+		print(f"Warning: {len(growth.skipped)} of {len(all_chars)} characters have no levels/growth data "
+			  f"and get no level-up tables: {', '.join(growth.skipped)}")
+	if len(growth):
+		for table in growth_tables(growth):
+			print(f"  GROWTH_{table.name}: {('bytes', 'words', 'deltas')[table.mode]}, {table.size} bytes")
+
+	# Write .pasm file
+	write_pasm(output_pasm, write_characters_pasm, all_chars, incbin=incbin)
+
+	print(f"Wrote {output_pasm}")
+
+	cache.record("characters", [dw4_chars_path], outputs, code, options)
+
+
+if __name__ == "__main__":
+	main()
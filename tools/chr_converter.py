@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Bulk NES 2bpp -> SNES 4bpp tile converter.
+
+The CHR-ROM region is read straight from the memory-mapped ROM (NesRom) and
+decoded as one (N, 8, 8) array: an NES tile is 16 bytes, eight rows of
+bitplane 0 followed by eight rows of bitplane 1, so unpackbits over the
+whole region yields every pixel at once. Carts with CHR-RAM (no CHR banks in
+the header) keep their tiles in PRG-ROM; pass those spans with --prg-range.
+
+Palette groups move a run of tiles to one of the four 4-color slots of a
+SNES 16-color palette (color c -> slot * 4 + c, color 0 stays transparent),
+so several NES sub-palettes can share one CGRAM row.
+
+Identical tiles are stored once across all banks. Tiles are numbered in
+first-use order and each bank's blob holds the tiles first seen in that
+bank, so the blobs laid end to end form the whole tile pool. The index
+(.word per source tile) maps bank tile -> pool tile number.
+
+Usage:
+    python tools/chr_converter.py                                 # DW4 ROM, every CHR bank
+    python tools/chr_converter.py game.nes --group 0:256:1 --group 256:64:2
+    python tools/chr_converter.py --prg-range 0x20010:0x1000       # tiles stored in PRG-ROM
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from instrumentation import traced
+from nes_rom import CHR_BANK_SIZE, DW4_ROM_PATH, NesRom
+from output_file import write_output
+from pasm_writer import PasmWriter, write_pasm
+from snes_tiles import TILE_SIZE, dedupe_tiles, pack_planar, tile_bytes
+
+NES_TILE_BYTES = 16
+PALETTE_SLOTS = 4                # 4-color NES sub-palettes per 16-color SNES palette
+TILES_PER_BANK = CHR_BANK_SIZE // NES_TILE_BYTES
+DEFAULT_OUTPUT = Path("src/data/chr_dw4.pasm")
+INDEX_NAME = "index.bin"
+
+
+class TileSource(NamedTuple):
+    name: str                                 # Label prefix, e.g. CHR_BANK_03
+    offset: int                               # File offset in the ROM
+    tiles: int
+
+
+class PaletteGroup(NamedTuple):
+    first: int                                # Tile number across all sources
+    count: int
+    slot: int
+
+
+class ConvertedBank(NamedTuple):
+    source: TileSource
+    first: int                                # Pool number of the first tile stored in this blob
+    new_tiles: int
+    blob: bytes
+
+
+class ChrSet(NamedTuple):
+    banks: List[ConvertedBank]
+    index: np.ndarray                         # Pool tile number per source tile
+    tile_count: int                           # Unique tiles in the pool
+
+    @property
+    def source_tiles(self) -> int:
+        return len(self.index)
+
+
+def nes_tiles(data) -> np.ndarray:
+    """(N, 8, 8) color indices (0-3) for a buffer of NES 2bpp tiles."""
+    raw = np.frombuffer(data, dtype=np.uint8)
+    if len(raw) % NES_TILE_BYTES:
+        raise ValueError(f"{len(raw)} bytes is not a whole number of NES tiles")
+    bits = np.unpackbits(raw.reshape(-1, 2, TILE_SIZE, 1), axis=-1)  # (N, plane, row, pixel)
+    return (bits[:, 0] | bits[:, 1] << 1).astype(np.uint8)
+
+
+def chr_sources(rom: NesRom) -> List[TileSource]:
+    return [TileSource(f"CHR_BANK_{bank:02X}", rom.chr_offset + bank * CHR_BANK_SIZE, TILES_PER_BANK)
+            for bank in range(rom.chr_banks)]
+
+
+def prg_source(rom: NesRom, offset: int, size: int) -> TileSource:
+    if size <= 0 or size % NES_TILE_BYTES:
+        raise ValueError(f"PRG range size ${size:X} is not a positive multiple of {NES_TILE_BYTES}")
+    if not (rom.prg_offset <= offset and offset + size <= rom.prg_offset + rom.prg_size):
+        raise ValueError(f"PRG range 0x{offset:06X}+${size:X} is outside PRG-ROM")
+    return TileSource(f"PRG_{offset:06X}", offset, size // NES_TILE_BYTES)
+
+
+def load_tiles(rom: NesRom, sources: Sequence[TileSource]) -> np.ndarray:
+    """Every source's tiles, concatenated in source order."""
+    parts = []
+    for source in sources:
+        view = rom.data[source.offset:source.offset + source.tiles * NES_TILE_BYTES]
+        try:
+            parts.append(nes_tiles(view))
+        finally:
+            view.release()
+    return np.concatenate(parts) if parts else np.zeros((0, TILE_SIZE, TILE_SIZE), dtype=np.uint8)
+
+
+def apply_palette_groups(tiles: np.ndarray, groups: Sequence[PaletteGroup]) -> np.ndarray:
+    """Shift each group's opaque colors into its palette slot (later groups win on overlap)."""
+    slots = np.zeros(len(tiles), dtype=np.uint8)
+    for group in groups:
+        if not 0 <= group.slot < PALETTE_SLOTS:
+            raise ValueError(f"Palette slot {group.slot} out of range (0-{PALETTE_SLOTS - 1})")
+        if group.first + group.count > len(tiles):
+            raise ValueError(f"Palette group {group.first}+{group.count} runs past the last tile ({len(tiles)})")
+        slots[group.first:group.first + group.count] = group.slot
+    return np.where(tiles != 0, tiles + (slots * 4)[:, None, None], 0).astype(np.uint8)
+
+
+@traced("chr.convert", records=lambda result: result.source_tiles)
+def convert_chr(rom: NesRom, sources: Sequence[TileSource], groups: Sequence[PaletteGroup] = ()) -> ChrSet:
+    """Deduplicated SNES 4bpp tile pool, per-bank blobs and the source -> pool index."""
+    tiles = apply_palette_groups(load_tiles(rom, sources), groups)
+    tileset = dedupe_tiles(tiles, flips=False)
+    pool = pack_planar(tileset.tiles, 4)
+    size = tile_bytes(4)
+
+    # A source's new tiles are the pool numbers above everything earlier sources reached
+    banks = []
+    start = stored = 0
+    for source in sources:
+        index = tileset.index[start:start + source.tiles]
+        end = max(stored, int(index.max()) + 1) if len(index) else stored
+        banks.append(ConvertedBank(source, stored, end - stored, pool[stored * size:end * size]))
+        stored = end
+        start += source.tiles
+    return ChrSet(banks, tileset.index.astype("<u2"), len(tileset.tiles))
+
+
+def write_chr_pasm(w: PasmWriter, chr_set: ChrSet, include: str) -> int:
+    """Per-bank labels and .incbin lines plus the tile index."""
+    w.banner(
+        "NES CHR -> SNES 4bpp Tiles",
+        "Auto-generated by tools/chr_converter.py (do not edit)",
+        f"{chr_set.source_tiles} source tiles, {chr_set.tile_count} unique; "
+        f"blobs in order form the tile pool (32 bytes per tile)",
+        "CHR_INDEX: .word pool tile number per source tile (<BANK>_INDEX = first entry of a bank)",
+    )
+    w.blank()
+    w.const("CHR_TILE_COUNT", f"${chr_set.tile_count:04x}")
+    w.const("CHR_SOURCE_TILES", f"${chr_set.source_tiles:04x}")
+    start = 0
+    for bank in chr_set.banks:
+        name = bank.source.name
+        w.blank()
+        w.comment(f"File offset 0x{bank.source.offset:06X}: {bank.source.tiles} tiles, {bank.new_tiles} new")
+        w.const(f"{name}_FIRST", f"${bank.first:04x}")
+        w.const(f"{name}_NEW_TILES", f"${bank.new_tiles:04x}")
+        w.const(f"{name}_INDEX", f"${start * 2:04x}")
+        w.label(name)
+        if bank.new_tiles:
+            w.line(f'\t.incbin "{include}/{name.lower()}.chr"')
+        w.label(f"{name}_END")
+        start += bank.source.tiles
+    w.blank()
+    w.label("CHR_INDEX")
+    w.line(f'\t.incbin "{include}/{INDEX_NAME}"')
+    w.label("CHR_INDEX_END")
+    w.blank()
+    return chr_set.tile_count
+
+
+def blob_paths(output: Path, chr_set: ChrSet) -> List[Path]:
+    blobs = output.with_suffix("")
+    return [blobs / f"{b.source.name.lower()}.chr" for b in chr_set.banks if b.new_tiles] + [blobs / INDEX_NAME]
+
+
+def write_chr(output: Path, chr_set: ChrSet) -> List[Path]:
+    """Blobs, index and include file; returns every path written."""
+    blobs = output.with_suffix("")
+    for bank in chr_set.banks:
+        if bank.new_tiles:
+            write_output(blobs / f"{bank.source.name.lower()}.chr", bank.blob)
+    write_output(blobs / INDEX_NAME, chr_set.index.tobytes())
+    write_pasm(output, write_chr_pasm, chr_set, f"{output.parent.name}/{output.stem}")
+    return [output] + blob_paths(output, chr_set)
+
+
+def parse_range(text: str) -> Tuple[int, int]:
+    offset, _, size = text.partition(":")
+    return int(offset, 0), int(size, 0)
+
+
+def parse_group(text: str) -> PaletteGroup:
+    first, count, slot = (int(part, 0) for part in text.split(":"))
+    return PaletteGroup(first, count, slot)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Convert NES CHR tiles to deduplicated SNES 4bpp banks")
+    parser.add_argument("rom", nargs="?", type=Path, default=DW4_ROM_PATH)
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT,
+                        help="Include file (blobs go in a directory of the same name)")
+    parser.add_argument("--prg-range", action="append", type=parse_range, default=[], metavar="OFFSET:SIZE",
+                        help="Also convert tiles stored in PRG-ROM (file offset and size, repeatable)")
+    parser.add_argument("--group", action="append", type=parse_group, default=[], metavar="FIRST:COUNT:SLOT",
+                        help="Put tiles FIRST..FIRST+COUNT-1 in palette slot SLOT (0-3)")
+    args = parser.parse_args(argv)
+
+    try:
+        start = time.perf_counter()
+        with NesRom.open(args.rom) as rom:
+            sources = chr_sources(rom) + [prg_source(rom, offset, size) for offset, size in args.prg_range]
+            if not sources:
+                raise ValueError(f"{args.rom.name} has no CHR-ROM (CHR-RAM cart); "
+                                 f"pass --prg-range for tile data stored in PRG-ROM")
+            chr_set = convert_chr(rom, sources, args.group)
+        write_chr(args.output, chr_set)
+
+        for bank in chr_set.banks:
+            print(f"  {bank.source.name}: {bank.source.tiles} tiles, {bank.new_tiles} new")
+        print(f"Wrote {args.output}: {chr_set.source_tiles} tiles -> {chr_set.tile_count} unique "
+              f"({chr_set.tile_count * tile_bytes(4)} bytes) in {time.perf_counter() - start:.2f}s")
+        return 0
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
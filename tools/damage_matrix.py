@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Party x level x monster damage and hit-chance matrices.
+
+Answers "what does member M at level L do to monster X" for every
+combination at once: the per-level stats (stat_growth.py) and the monster
+columns are broadcast through the battle_model.py formulas, so the whole
+table is a few array operations. Every array is (characters, levels,
+monsters):
+
+    dealt_low / dealt_high / dealt_avg    damage per hit the member deals
+    hit                                   chance the member's attack connects
+    attacks_to_kill                       monster HP / expected damage per attack, rounded up (NEVER if 0)
+    taken_low / taken_high / taken_hit    the same for the monster attacking the member
+
+Only characters whose "levels" / "growth" data defines strength and agility
+are evaluated; with no such character the tool refuses to write a matrix
+rather than fill it with made-up stats.
+
+The result is written as one .npz (int16 / float32 arrays plus IDs, names
+and levels) for plotting and regression checks; --compare reports every
+array that differs from a reference file. The file is only recomputed when
+the character / monster JSON, the options or the model code change (hashes
+kept by BuildCache under the "damage_matrix" stage).
+
+Usage:
+    python tools/damage_matrix.py                                 # build/damage_matrix.npz
+    python tools/damage_matrix.py --level 20 --monster 0x12 --monster 0x2C
+    python tools/damage_matrix.py --compare reference/damage_matrix.npz
+"""
+
+import argparse
+import io
+import sys
+import zipfile
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+import battle_model
+import stat_growth
+from battle_model import MONSTER_FILES, MonsterColumns, damage_bounds, hit_chance, load_monsters, unequipped_stats
+from build_cache import BuildCache, glob_inputs
+from characters_converter import dw4_chars_path, load_characters
+from instrumentation import traced
+from json_to_pasm import DW4_MONSTERS_DIR
+from output_file import write_output
+from stat_growth import MAX_LEVEL, GrowthTable, growth_table
+
+DEFAULT_OUTPUT = Path("build/damage_matrix.npz")
+NEVER = 0xFFFF                   # attacks_to_kill when the expected damage is 0
+MATRIX_STATS = ("strength", "agility")   # Every character in the matrix must define these
+
+
+class DamageMatrix(NamedTuple):
+    member_ids: np.ndarray                    # (C,)
+    member_names: np.ndarray                  # (C,) str
+    levels: np.ndarray                        # (L,)
+    monster_ids: np.ndarray                   # (M,)
+    monster_names: np.ndarray                 # (M,) str
+    dealt_low: np.ndarray                     # (C, L, M) int16
+    dealt_high: np.ndarray
+    dealt_avg: np.ndarray                     # float32
+    hit: np.ndarray                           # float32
+    attacks_to_kill: np.ndarray               # uint16
+    taken_low: np.ndarray                     # int16
+    taken_high: np.ndarray
+    taken_hit: np.ndarray                     # float32
+
+    @property
+    def shape(self):
+        return self.dealt_low.shape
+
+
+@traced("damage.matrix", records=lambda result: result.dealt_low.size)
+def damage_matrix(growth: GrowthTable, monsters: MonsterColumns) -> DamageMatrix:
+    """Every matrix for growth's characters x levels against every monster."""
+    atk, def_ = unequipped_stats(growth.stats["strength"], growth.stats["agility"])
+    agi = growth.stats["agility"]
+    atk, def_, agi = atk[:, :, None], def_[:, :, None], agi[:, :, None]    # (C, L, 1) against (M,)
+
+    low, high = damage_bounds(atk, monsters.def_)
+    hit = hit_chance(agi, monsters.agi)
+    avg = (low + high) / 2
+    with np.errstate(divide="ignore"):
+        attacks = np.ceil(monsters.hp / (hit * avg))
+    attacks = np.where(np.isfinite(attacks), np.minimum(attacks, NEVER), NEVER)
+    taken_low, taken_high = damage_bounds(monsters.atk, def_)
+
+    return DamageMatrix(
+        growth.ids.astype(np.int32), np.array(growth.names, dtype=str), growth.levels.astype(np.int16),
+        monsters.ids.astype(np.int32), np.array(monsters.names, dtype=str),
+        low.astype(np.int16), high.astype(np.int16), avg.astype(np.float32), hit.astype(np.float32),
+        attacks.astype(np.uint16), taken_low.astype(np.int16), taken_high.astype(np.int16),
+        hit_chance(monsters.agi, agi).astype(np.float32),
+    )
+
+
+def npz_bytes(arrays: Dict[str, np.ndarray]) -> bytes:
+    """Compressed .npz with fixed member timestamps, so equal matrices give equal files."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, array in arrays.items():
+            info = zipfile.ZipInfo(f"{name}.npy")
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with archive.open(info, "w") as f:
+                np.lib.format.write_array(f, np.ascontiguousarray(array), allow_pickle=False)
+    return buffer.getvalue()
+
+
+def save_matrix(path: Path, matrix: DamageMatrix):
+    write_output(path, npz_bytes(matrix._asdict()))
+
+
+def load_matrix(path: Path) -> DamageMatrix:
+    with np.load(path, allow_pickle=False) as data:
+        return DamageMatrix(**{name: data[name] for name in DamageMatrix._fields})
+
+
+def compare_matrices(new: DamageMatrix, old: DamageMatrix) -> List[str]:
+    """One line per array that differs (shape or values); empty when identical."""
+    lines = []
+    for name in DamageMatrix._fields:
+        a, b = getattr(new, name), getattr(old, name)
+        if a.shape != b.shape:
+            lines.append(f"{name}: shape {b.shape} -> {a.shape}")
+            continue
+        changed = a != b
+        if changed.any():
+            detail = ""
+            if a.dtype.kind in "iuf":
+                detail = f", max change {np.abs(a.astype(np.float64) - b.astype(np.float64)).max():g}"
+            lines.append(f"{name}: {int(changed.sum())} of {a.size} values differ{detail}")
+    return lines
+
+
+def format_cells(matrix: DamageMatrix, level: int, monster_ids: Sequence[int]) -> List[str]:
+    """Each member at `level` against each listed monster."""
+    if not (matrix.levels == level).any():
+        raise ValueError(f"Level {level} is not in the matrix (1-{int(matrix.levels.max())})")
+    li = int(np.flatnonzero(matrix.levels == level)[0])
+    lines = [f"Level {level}:"]
+    for monster_id in monster_ids:
+        found = np.flatnonzero(matrix.monster_ids == monster_id)
+        if not len(found):
+            raise ValueError(f"Monster ${monster_id:02X} is not in the monster table")
+        m = int(found[0])
+        lines.append(f"  ${monster_id:02X} {matrix.monster_names[m]}")
+        for c, name in enumerate(matrix.member_names):
+            cell = (c, li, m)
+            kills = int(matrix.attacks_to_kill[cell])
+            lines.append(f"    {name:<10} deals {matrix.dealt_low[cell]:>3}-{matrix.dealt_high[cell]:<3} "
+                         f"(avg {matrix.dealt_avg[cell]:6.1f}, hit {matrix.hit[cell]:4.0%}, "
+                         f"{'never' if kills == NEVER else f'{kills} attacks'} to kill)  "
+                         f"takes {matrix.taken_low[cell]:>3}-{matrix.taken_high[cell]:<3} "
+                         f"(hit {matrix.taken_hit[cell]:4.0%})")
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Party x level x monster damage / hit-chance matrices")
+    parser.add_argument("--characters", type=Path, default=dw4_chars_path)
+    parser.add_argument("--monsters", type=Path, default=DW4_MONSTERS_DIR)
+    parser.add_argument("--max-level", type=int, default=MAX_LEVEL)
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--force", action="store_true", help="Recompute even if the inputs are unchanged")
+    parser.add_argument("--compare", type=Path, help="Reference .npz; list every array that differs")
+    parser.add_argument("--level", type=int, help="Print the matrix cells for this level")
+    parser.add_argument("--monster", action="append", type=lambda s: int(s, 0), default=[],
+                        help="Monster ID for --level (repeatable)")
+    args = parser.parse_args(argv)
+
+    try:
+        cache = BuildCache(force=args.force)
+        inputs = [args.characters] + glob_inputs(args.monsters, MONSTER_FILES)
+        code = [__file__, battle_model.__file__, stat_growth.__file__]
+        options = {"max_level": args.max_level}
+        if cache.is_fresh("damage_matrix", inputs, [args.output], code, options):
+            matrix = load_matrix(args.output)
+            print(f"{args.output} is up to date")
+        else:
+            growth = growth_table(load_characters(args.characters), args.max_level, MATRIX_STATS)
+            if not len(growth):
+                raise ValueError(f"No character in {args.characters} has levels/growth data; "
+                                 f"nothing to evaluate")
+            if growth.skipped:
+                print(f"Warning: {len(growth.skipped)} characters have no levels/growth data and are left out: "
+                      f"{', '.join(growth.skipped)}")
+            matrix = damage_matrix(growth, load_monsters(args.monsters))
+            save_matrix(args.output, matrix)
+            cache.record("damage_matrix", inputs, [args.output], code, options)
+            members, levels, monsters = matrix.shape
+            print(f"Wrote {args.output}: {members} characters x {levels} levels x {monsters} monsters")
+
+        if args.level is not None:
+            print("\n".join(format_cells(matrix, args.level, args.monster)))
+        if args.compare:
+            changes = compare_matrices(matrix, load_matrix(args.compare))
+            print("\n".join(changes) if changes else f"Matches {args.compare}")
+            return 1 if changes else 0
+        return 0
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+Single-process runner for all DW4 JSON -> .pasm converters.
+
+Imports the converters as functions instead of running each script in its
+own interpreter, parses every shared JSON source exactly once, runs the
+independent stages concurrently on a thread pool and reports the wall time
+of each stage. Stages whose inputs, code and outputs are unchanged are
+skipped through the build cache.
+
+Usage:
+    python tools/dq4r_pipeline.py
+    python tools/dq4r_pipeline.py --jobs 1 --only spells encounters
+    python tools/dq4r_pipeline.py --items-format full --force
+    python tools/dq4r_pipeline.py --incbin
+    python tools/dq4r_pipeline.py --force --trace build/trace.json --trace-format chrome
+    python tools/dq4r_pipeline.py --watch
+    python tools/dq4r_pipeline.py --changed-list build/changed_data.txt
+    python tools/dq4r_pipeline.py --compress 9
+    python tools/dq4r_pipeline.py --text
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import characters_converter
+import encounter_packer
+import encounters_converter
+import instrumentation
+import items_shops_converter
+import items_shops_simple
+import json_to_pasm
+import lz_compress
+import shop_inventory
+import spells_converter
+import stat_growth
+import text_table
+from build_cache import BuildCache, REPO_ROOT, glob_inputs
+from instrumentation import count, span
+from lz_compress import CompressedTable
+from output_file import OutputResult, write_output
+from pasm_writer import CaptureWriter, PasmWriter, open_pasm, output_files
+from pipeline_watch import DEBOUNCE, POLL_INTERVAL, watch
+
+DEFAULT_OUTPUT_DIR = REPO_ROOT / "src" / "data"
+COMPRESSED_OUTPUT = "compressed_dw4.pasm"
+
+# items_dw4.pasm / shops_dw4.pasm layouts: "simple" is what src/main.pasm includes today
+ITEMS_FORMATS = {
+    "simple": items_shops_simple,
+    "full": items_shops_converter,
+}
+
+
+class Sources:
+    """JSON sources shared between stages, each parsed at most once."""
+
+    def __init__(self):
+        self._docs: Dict[Any, Any] = {}
+        self._locks: Dict[Any, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def load(self, key, loader: Callable[[], Any]) -> Any:
+        """Return loader() for key, calling it only once even under concurrency."""
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._docs:
+                with span("sources.load", source=str(key)) as s:
+                    self._docs[key] = loader()
+                    s.records = len(self._docs[key]) if isinstance(self._docs[key], (list, dict)) else 0
+                self.loads += 1
+                count("sources.parsed")
+            else:
+                count("sources.shared")
+            return self._docs[key]
+
+    def json(self, path: Path) -> Any:
+        def read():
+            with open(path) as f:
+                return json.load(f)
+        return self.load(Path(path), read)
+
+
+class Stage(NamedTuple):
+    name: str
+    module: ModuleType                    # Converter providing the write_*_pasm function
+    output: str                           # File name under the output directory
+    inputs: Callable[[], List[Path]]      # Input files (evaluated when the stage runs; --watch graph)
+    build: Callable[[Sources, PasmWriter], int]  # Streams the table, returns the record count
+    options: Optional[dict] = None        # Stage settings that change the output (cache key)
+    helpers: Tuple[ModuleType, ...] = ()  # Modules besides `module` the output depends on (cache key)
+
+
+class StageResult(NamedTuple):
+    name: str
+    status: str                           # built / fresh / skipped / failed
+    records: int
+    seconds: float
+    detail: str = ""
+    outputs: Tuple[OutputResult, ...] = ()  # Files written by a built stage, with changed/unchanged status
+
+
+def build_stages(items_format: str = "simple", packed_encounters: bool = False,
+                 interned_shops: bool = False, text: bool = False) -> List[Stage]:
+    items_mod = ITEMS_FORMATS[items_format]
+    shops_mod = items_shops_converter if interned_shops else items_mod
+
+    def monsters(sources: Sources, w: PasmWriter):
+        monsters = sources.load("monsters", json_to_pasm.load_dw4_monsters)
+        return json_to_pasm.write_monsters_pasm(w, monsters)
+
+    def items(sources: Sources, w: PasmWriter):
+        items = items_mod.items_from_json(sources.json(items_mod.DW4_ITEMS_FILE))
+        return items_mod.write_items_pasm(w, items)
+
+    def shops(sources: Sources, w: PasmWriter):
+        shops_data = sources.json(shops_mod.DW4_SHOPS_FILE)
+        if interned_shops:
+            return shops_mod.write_interned_shops_pasm(w, shops_data)
+        return shops_mod.write_shops_pasm(w, shops_data)
+
+    def spells(sources: Sources, w: PasmWriter):
+        spells = spells_converter.spells_from_json(sources.json(spells_converter.dw4_spells_path))
+        return spells_converter.write_spells_pasm(w, spells)
+
+    def encounters(sources: Sources, w: PasmWriter):
+        groups = encounters_converter.encounters_from_json(sources.json(encounters_converter.dw4_encounters_path))
+        if packed_encounters:
+            return encounters_converter.write_packed_encounters_pasm(w, groups)
+        return encounters_converter.write_encounters_pasm(w, groups)
+
+    def characters(sources: Sources, w: PasmWriter):
+        chars = characters_converter.characters_from_json(sources.json(characters_converter.dw4_chars_path))
+        return characters_converter.write_characters_pasm(w, chars)
+
+    def text_names(sources: Sources, w: PasmWriter):
+        groups = [
+            ("MONSTER", sources.load("monsters", json_to_pasm.load_dw4_monsters)),
+            ("ITEM", items_mod.items_from_json(sources.json(items_mod.DW4_ITEMS_FILE))),
+            ("SPELL", spells_converter.spells_from_json(sources.json(spells_converter.dw4_spells_path))),
+            ("CHARACTER", characters_converter.characters_from_json(sources.json(characters_converter.dw4_chars_path))),
+        ]
+        table = text_table.build_text_table([(group, text_table.names(records)) for group, records in groups])
+        return text_table.write_text_pasm(w, table)
+
+    def text_inputs() -> List[Path]:
+        return (glob_inputs(json_to_pasm.DW4_MONSTERS_DIR, "monster_*.json")
+                + [items_mod.DW4_ITEMS_FILE, spells_converter.dw4_spells_path, characters_converter.dw4_chars_path])
+
+    stages = [
+        Stage("monsters", json_to_pasm, "monsters_dw4.pasm",
+              lambda: glob_inputs(json_to_pasm.DW4_MONSTERS_DIR, "monster_*.json"), monsters),
+        Stage("items", items_mod, "items_dw4.pasm", lambda: [items_mod.DW4_ITEMS_FILE], items),
+        # Shop inventories are item-table indices, so an items.json edit rebuilds shops too
+        Stage("shops", shops_mod, "shops_dw4.pasm",
+              lambda: [shops_mod.DW4_SHOPS_FILE, items_mod.DW4_ITEMS_FILE], shops,
+              {"interned": True} if interned_shops else None,
+              (shop_inventory,) if interned_shops else ()),
+        Stage("spells", spells_converter, "spells_dw4.pasm",
+              lambda: [spells_converter.dw4_spells_path], spells),
+        Stage("encounters", encounters_converter, "encounters_dw4.pasm",
+              lambda: [encounters_converter.dw4_encounters_path], encounters,
+              {"packed": True} if packed_encounters else None,
+              (encounter_packer,) if packed_encounters else ()),
+        Stage("characters", characters_converter, "characters_dw4.pasm",
+              lambda: [characters_converter.dw4_chars_path], characters, helpers=(stat_growth,)),
+    ]
+    if text:
+        # The name lists come from the other converters' loaders, so their code is part of the key
+        stages.append(Stage("text", text_table, "text_dw4.pasm", text_inputs, text_names,
+                            helpers=(json_to_pasm, items_mod, spells_converter, characters_converter)))
+    return stages
+
+
+def run_stage(stage: Stage, sources: Sources, cache: BuildCache, output_dir: Path,
+              compact: bool = False, incbin: bool = False) -> StageResult:
+    with span(f"pipeline.{stage.name}", "stage") as s:
+        result = _run_stage(stage, sources, cache, output_dir, compact, incbin)
+        s.records = result.records
+        count(f"stage.{result.status}")
+        return result
+
+
+def _run_stage(stage: Stage, sources: Sources, cache: BuildCache, output_dir: Path,
+               compact: bool, incbin: bool) -> StageResult:
+    start = time.perf_counter()
+    output = output_dir / stage.output
+    outputs = output_files(output, incbin)
+    key = f"pipeline.{stage.name}"
+    code = [stage.module.__file__, __file__] + [helper.__file__ for helper in stage.helpers]
+    options = {name: True for name, on in (("compact", compact), ("incbin", incbin)) if on}
+    options.update(stage.options or {})
+
+    try:
+        inputs = stage.inputs()
+        missing = [str(p) for p in inputs if not Path(p).exists()]
+        if not inputs or missing:
+            return StageResult(stage.name, "skipped", 0, time.perf_counter() - start,
+                               f"missing input: {missing[0] if missing else 'no files'}")
+
+        with span(f"{stage.name}.cache"):
+            fresh = cache.is_fresh(key, inputs, outputs, code, options)
+        if fresh:
+            return StageResult(stage.name, "fresh", 0, time.perf_counter() - start)
+
+        with open_pasm(output, compact, incbin) as w:
+            records = stage.build(sources, w)
+        with span(f"{stage.name}.cache"):
+            cache.record(key, inputs, outputs, code, options)
+        count("outputs.changed", sum(r.changed for r in w.outputs))
+        detail = "" if any(r.changed for r in w.outputs) else "output unchanged"
+        return StageResult(stage.name, "built", records, time.perf_counter() - start, detail, tuple(w.outputs))
+    except Exception as e:
+        return StageResult(stage.name, "failed", 0, time.perf_counter() - start, f"{type(e).__name__}: {e}")
+
+
+def run_pipeline(stages: List[Stage], output_dir: Path = DEFAULT_OUTPUT_DIR, jobs: Optional[int] = None,
+                 cache: Optional[BuildCache] = None, compact: bool = False,
+                 incbin: bool = False) -> List[StageResult]:
+    """Run stages concurrently; results come back in stage order."""
+    cache = cache or BuildCache()
+    sources = Sources()
+    jobs = jobs or min(len(stages), os.cpu_count() or 1)
+
+    if jobs <= 1:
+        return [run_stage(stage, sources, cache, output_dir, compact, incbin) for stage in stages]
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(run_stage, stage, sources, cache, output_dir, compact, incbin) for stage in stages]
+        return [f.result() for f in futures]
+
+
+def compressed_path(stage: Stage, output_dir: Path) -> Path:
+    return (output_dir / stage.output).with_suffix(lz_compress.LZ_SUFFIX)
+
+
+def write_compressed_pasm(w: PasmWriter, tables: List[Tuple[Stage, CompressedTable]], level: int,
+                          include_dir: str = "data") -> int:
+    """Stub with a size constant, label and .incbin per compressed table."""
+    w.banner(
+        f"DW4 Tables - DQ4R-LZ compressed (level {level})",
+        "Auto-generated by dq4r_pipeline.py --compress",
+        "Decompress into WRAM with lz_decompress (src/engine/lz_decompress.pasm)",
+    )
+    for stage, table in tables:
+        label = f"{stage.name.upper()}_LZ"
+        w.blank()
+        w.comment(f"{stage.output}: {table.raw_size} -> {table.packed_size} bytes ({table.ratio:.1%})")
+        w.const(f"{label}_SIZE", f"${table.raw_size:04X}")
+        w.label(label)
+        w.line(f'\t.incbin "{include_dir}/{compressed_path(stage, Path()).name}"')
+    w.blank()
+    return len(tables)
+
+
+def compress_tables(stages: List[Stage], sources: Sources, output_dir: Path,
+                    level: int) -> Tuple[List[CompressedTable], List[OutputResult]]:
+    """Capture each stage's packed table bytes and write them LZ-compressed plus the stub."""
+    tables: List[CompressedTable] = []
+    packed_tables: List[Tuple[Stage, CompressedTable]] = []
+    outputs: List[OutputResult] = []
+    for stage in stages:
+        capture = CaptureWriter()
+        stage.build(sources, capture)
+        with span(f"{stage.name}.compress") as s:
+            packed, table = lz_compress.compress_table(stage.name, capture.blob, level)
+            s.records = table.raw_size
+        tables.append(table)
+        if packed is not None:
+            outputs.append(write_output(compressed_path(stage, output_dir), packed))
+            packed_tables.append((stage, table))
+        else:
+            compressed_path(stage, output_dir).unlink(missing_ok=True)    # Table stays in its raw .pasm
+    with PasmWriter.open(output_dir / COMPRESSED_OUTPUT) as w:
+        write_compressed_pasm(w, packed_tables, level)
+    return tables, outputs + w.outputs
+
+
+def run_compression(stages: List[Stage], output_dir: Path, level: int,
+                    cache: BuildCache) -> Tuple[StageResult, List[CompressedTable]]:
+    """Compression stage over every table whose inputs exist (cached like the other stages)."""
+    with span("pipeline.compress", "stage") as s:
+        start = time.perf_counter()
+        ready = [stage for stage in stages if stage.inputs() and all(Path(p).exists() for p in stage.inputs())]
+        if not ready:
+            return StageResult("compress", "skipped", 0, time.perf_counter() - start, "no tables"), []
+        key = "pipeline.compress"
+        inputs = sorted({Path(p) for stage in ready for p in stage.inputs()})
+        # Tables left uncompressed have no .lz, so only the ones on disk are part of the key
+        outputs = [output_dir / COMPRESSED_OUTPUT] + [p for p in (compressed_path(stage, output_dir)
+                                                                  for stage in ready) if p.exists()]
+        code = [lz_compress.__file__, __file__] + [m.__file__ for stage in ready
+                                                    for m in (stage.module,) + stage.helpers]
+        options = {"level": level, "tables": {st.name: [st.module.__name__, st.options or {}] for st in ready}}
+        try:
+            if cache.is_fresh(key, inputs, outputs, code, options):
+                return StageResult("compress", "fresh", 0, time.perf_counter() - start), []
+            tables, written = compress_tables(ready, Sources(), output_dir, level)
+            outputs = [output_dir / COMPRESSED_OUTPUT] + [compressed_path(stage, output_dir)
+                                                          for stage, table in zip(ready, tables)
+                                                          if not (table.error or table.raw)]
+            cache.record(key, inputs, outputs, code, options)
+        except Exception as e:
+            return StageResult("compress", "failed", 0, time.perf_counter() - start,
+                               f"{type(e).__name__}: {e}"), []
+        s.records = len(tables)
+        errors = sum(1 for t in tables if t.error)
+        raw = sum(1 for t in tables if t.raw)
+        detail = ", ".join(text for n, text in ((errors, f"{errors} table(s) not compressed"),
+                                                (raw, f"{raw} kept raw (no gain)")) if n)
+        return StageResult("compress", "built", len(tables), time.perf_counter() - start, detail,
+                           tuple(written)), tables
+
+
+def print_report(results: List[StageResult], wall: float):
+    print(f"\n{'Stage':<12} {'Status':<8} {'Records':>8} {'Time':>10}")
+    print("-" * 42)
+    for r in results:
+        line = f"{r.name:<12} {r.status:<8} {r.records:>8} {r.seconds * 1000:>8.1f}ms"
+        if r.detail:
+            line += f"  ({r.detail})"
+        print(line)
+    print("-" * 42)
+    total = sum(r.seconds for r in results)
+    print(f"Wall time: {wall * 1000:.1f}ms (stage total {total * 1000:.1f}ms)")
+    changed = changed_outputs(results)
+    if changed:
+        print(f"Changed outputs: {', '.join(p.name for p in changed)}")
+    else:
+        print("No outputs changed (reassembly not needed)")
+
+
+def changed_outputs(results: List[StageResult]) -> List[Path]:
+    """Files whose bytes were created or changed by this run."""
+    return [o.path for r in results for o in r.outputs if o.changed]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run all DW4 JSON -> .pasm converters")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT_DIR, help="Output directory for .pasm files")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker threads (1 = serial)")
+    parser.add_argument("--items-format", choices=sorted(ITEMS_FORMATS), default="simple",
+                        help="Layout of items_dw4.pasm / shops_dw4.pasm")
+    parser.add_argument("--packed-encounters", action="store_true",
+                        help="Overlap-merge encounter groups behind an offset index")
+    parser.add_argument("--interned-shops", action="store_true",
+                        help="Shared shop inventory lists plus per-shop item bitsets")
+    parser.add_argument("--text", action="store_true",
+                        help="Also build the dictionary-compressed name table (text_dw4.pasm)")
+    parser.add_argument("--only", nargs="+", metavar="STAGE", help="Run only these stages")
+    parser.add_argument("--compact", action="store_true", help="Comment-free output, one directive per row")
+    parser.add_argument("--incbin", action="store_true", help="Write each table as a .bin blob plus a .pasm stub")
+    parser.add_argument("--force", action="store_true", help="Ignore the build cache")
+    parser.add_argument("--compress", type=int, nargs="?", const=lz_compress.DEFAULT_LEVEL, metavar="LEVEL",
+                        choices=sorted(lz_compress.LEVELS),
+                        help=f"Also write DQ4R-LZ compressed tables (level 0-9, default {lz_compress.DEFAULT_LEVEL})")
+    parser.add_argument("--changed-list", type=Path, metavar="FILE",
+                        help="Write the paths of created/changed outputs here, one per line (empty = nothing moved)")
+    parser.add_argument("--watch", action="store_true",
+                        help="After the first run, poll the JSON inputs and rebuild only the stages they feed")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL, metavar="SEC",
+                        help="Seconds between input polls in --watch mode")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE, metavar="SEC",
+                        help="Quiet time after the last change before --watch rebuilds")
+    parser.add_argument("--trace", type=Path, metavar="FILE", help="Write a span/counter trace of the run")
+    parser.add_argument("--trace-format", choices=instrumentation.TRACE_FORMATS, default="json",
+                        help="Trace layout (chrome = trace-event JSON for chrome://tracing / Perfetto)")
+    parser.add_argument("--trace-no-memory", action="store_true",
+                        help="Skip tracemalloc peaks in the trace (less overhead, stages may run concurrently)")
+    args = parser.parse_args(argv)
+    trace_memory = args.trace is not None and not args.trace_no_memory
+    if trace_memory:
+        # tracemalloc has one process-wide peak, so per-stage peaks need one stage at a time
+        if args.jobs is not None and args.jobs > 1:
+            parser.error("--trace measures memory peaks one stage at a time; use --jobs 1 or --trace-no-memory")
+        args.jobs = 1
+
+    stages = build_stages(args.items_format, args.packed_encounters, args.interned_shops, args.text)
+    if args.only:
+        unknown = set(args.only) - {s.name for s in stages}
+        if unknown:
+            parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+        stages = [s for s in stages if s.name in args.only]
+
+    print("=" * 70)
+    print("DQ4r Data Pipeline")
+    print("=" * 70)
+
+    def build(batch: List[Stage], cache: BuildCache) -> List[StageResult]:
+        start = time.perf_counter()
+        with span("pipeline", "run"):
+            results = run_pipeline(batch, args.output, args.jobs, cache, args.compact, args.incbin)
+            tables = []
+            if args.compress is not None:
+                result, tables = run_compression(stages, args.output, args.compress, cache)
+                results.append(result)
+        print_report(results, time.perf_counter() - start)
+        if tables:
+            print()
+            print("\n".join(lz_compress.format_report(tables)))
+        return results
+
+    tracer = instrumentation.enable(memory=trace_memory) if args.trace else None
+    results = build(stages, BuildCache(force=args.force))
+    if args.changed_list:
+        write_output(args.changed_list, "".join(f"{p}\n" for p in changed_outputs(results)))
+
+    if args.watch:
+        cache = BuildCache()
+
+        def rebuild(batch: List[Stage]):
+            nonlocal results
+            results = build(batch, cache)
+
+        watch(stages, rebuild, args.poll_interval, args.debounce)
+
+    if tracer is not None:
+        instrumentation.disable()
+        tracer.write(args.trace, args.trace_format)
+        print(f"\n{tracer.format_summary()}")
+        print(f"Trace: {args.trace} ({len(tracer.spans)} spans, {args.trace_format})")
+
+    return 1 if any(r.status == "failed" for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,108 +4,56 @@ DW4 to DQ4r Data Extractor
 Extract monsters, items, shops from DW4 NES ROM and convert to DQ4r SNES format.
 """
 
-import struct
 from pathlib import Path
 from typing import List, Dict, Any
 
-# DW4 NES offsets (bank-relative, after iNES header)
-DW4_ROM_PATH = Path("C:\\Users\\me\\source\\repos\\dragon-warrior-4-info\\roms\\Dragon Warrior IV (1992-10)(Enix)(US).nes")
+from nes_rom import NesRom, DW4_ROM_PATH, DW4_MONSTER_BANK, DW4_MONSTER_CPU_ADDR
+from dw4_monster_table import DW4Monster, MonsterTable
+from record_schema import DQ3R_MONSTER
+from instrumentation import traced
+
 DQ3R_ROM_PATH = Path("C:\\Users\\me\\source\\repos\\GameInfo\\~roms\\SNES\\GoodSNES\\Dragon Quest III - Soshite Densetsu he... (J) [!].sfc")
 
-# DW4 NES data offsets (from documentation)
-# Bank 6, CPU $A2A2 = File offset 0x1A2B2 (includes 16-byte header)
-DW4_MONSTER_OFFSET = 0x1A2B2  # File offset (includes iNES header)
+# DW4 NES data locations (from documentation)
+# Monsters: Bank 6, CPU $A2A2 (27-byte records, see dw4_monster_table.py)
 DW4_MONSTER_COUNT = 195  # Approximate
-DW4_MONSTER_SIZE = 27  # Bytes per monster
 
-# DW4 Item structure offsets
-DW4_ITEM_OFFSET = 0x18010  # Example: may need verification
+# DW4 Item structure location
+DW4_ITEM_BANK = 6  # Example: may need verification
+DW4_ITEM_CPU_ADDR = 0x8000
 DW4_ITEM_COUNT = 150
 DW4_ITEM_SIZE = 16
 
-class DW4Monster:
-    """DW4 NES monster record (27 bytes)."""
-    SIZE = 27
-    
-    def __init__(self, data: bytes, offset: int = 0):
-        """Parse monster from 27-byte record."""
-        if len(data) < offset + self.SIZE:
-            raise ValueError(f"Not enough data for monster record at offset {offset}")
-        
-        d = data[offset:offset + self.SIZE]
-        self.experience = struct.unpack_from('<H', d, 0)[0]
-        self.gold = struct.unpack_from('<H', d, 2)[0]
-        self.hp = struct.unpack_from('<H', d, 4)[0]
-        self.attack = d[6]
-        self.defense = d[7]
-        self.agility = d[8]
-        self.skill_data = d[9:15]  # 6 bytes
-        self.behavior_data = d[15:19]  # 4 bytes
-        self.item_drop_id = d[19]
-        self.unknown20 = d[20]
-        self.unknown21 = d[21]
-        self.metal_flags = d[22]
-        self.drop_rate_flags = d[23]
-        self.status_vulnerability = d[24]
-        self.unknown25 = d[25]
-        self.unknown26 = d[26]
-    
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert to JSON-serializable dict."""
-        return {
-            "experience": self.experience,
-            "gold": self.gold,
-            "hp": self.hp,
-            "attack": self.attack,
-            "defense": self.defense,
-            "agility": self.agility,
-            "skill_data": list(self.skill_data),
-            "behavior_data": list(self.behavior_data),
-            "item_drop_id": self.item_drop_id,
-            "drop_rate_flags": self.drop_rate_flags,
-        }
-
 class DQ3RMonster:
     """DQ3r SNES monster record format (TBD from disassembly)."""
-    # Placeholder: may differ from DW4
-    SIZE = 32
+    # Placeholder: may differ from DW4 (layout in record_schema.DQ3R_MONSTER)
+    SIZE = DQ3R_MONSTER.size
+    # Simple direct mapping for now: skill data plus the first 2 behavior bytes
+    DW4_COLUMNS = ("hp", "exp", "gold", "atk", "def_", "agi", "drop_id", "skill_data", "behavior_data")
+    
+    @staticmethod
+    def _row(values) -> tuple:
+        *head, behavior = values
+        return (*head, behavior[:2])
     
     @staticmethod
     def from_dw4(dw4: DW4Monster) -> bytes:
         """Convert DW4 monster to DQ3r SNES format."""
-        # Simple direct mapping for now
-        data = bytearray(DQ3RMonster.SIZE)
-        struct.pack_into('<H', data, 0, dw4.hp)
-        struct.pack_into('<H', data, 2, dw4.experience)
-        struct.pack_into('<H', data, 4, dw4.gold)
-        data[6] = dw4.attack
-        data[7] = dw4.defense
-        data[8] = dw4.agility
-        data[9] = dw4.item_drop_id
-        # Copy behavior/skill data
-        data[10:16] = dw4.skill_data + dw4.behavior_data[:2]
-        return bytes(data)
+        values = [getattr(dw4, name) for name in DQ3RMonster.DW4_COLUMNS]
+        return DQ3R_MONSTER.struct.pack(*DQ3RMonster._row(values))
+    
+    @staticmethod
+    def from_dw4_table(table: MonsterTable) -> bytearray:
+        """Convert a whole DW4 monster table in one packed buffer."""
+        rows = map(DQ3RMonster._row, table.select(DQ3RMonster.DW4_COLUMNS))
+        return DQ3R_MONSTER.pack_all(rows, len(table))
 
-def extract_dw4_monsters() -> List[DW4Monster]:
+@traced("monsters.extract")
+def extract_dw4_monsters() -> MonsterTable:
     """Extract all monsters from DW4 NES ROM."""
-    if not DW4_ROM_PATH.exists():
-        raise FileNotFoundError(f"DW4 ROM not found: {DW4_ROM_PATH}")
-    
-    monsters = []
-    with open(DW4_ROM_PATH, "rb") as f:
-        rom = f.read()
-    
-    for i in range(DW4_MONSTER_COUNT):
-        offset = DW4_MONSTER_OFFSET + (i * DW4_MONSTER_SIZE)
-        if offset + DW4_MONSTER_SIZE > len(rom):
-            break
-        
-        try:
-            monster = DW4Monster(rom, offset)
-            monsters.append(monster)
-        except Exception as e:
-            print(f"Warning: Failed to parse monster {i}: {e}")
-            continue
+    with NesRom.open(DW4_ROM_PATH) as rom:
+        monsters = MonsterTable.from_buffer(rom.data, rom.file_offset(DW4_MONSTER_BANK, DW4_MONSTER_CPU_ADDR),
+                                            DW4_MONSTER_COUNT)
     
     print(f"Extracted {len(monsters)} monsters from DW4 NES")
     return monsters
@@ -118,10 +66,7 @@ def extract_dw4_items() -> List[Dict[str, Any]]:
         print(f"Warning: DW4 ROM not found for item extraction")
         return items
     
-    with open(DW4_ROM_PATH, "rb") as f:
-        rom = f.read()
-    
-    # TODO: Find actual item table offset and format
+    # TODO: Find actual item table location and format, then read it via NesRom.read()
     print(f"Item extraction: placeholder (found {len(items)} items)")
     return items
 
@@ -142,8 +87,8 @@ def main():
         if monsters:
             m = monsters[0]
             print(f"\nFirst monster example:")
-            print(f"  HP: {m.hp}, ATK: {m.attack}, DEF: {m.defense}, AGI: {m.agility}")
-            print(f"  EXP: {m.experience}, Gold: {m.gold}")
+            print(f"  HP: {m.hp}, ATK: {m.atk}, DEF: {m.def_}, AGI: {m.agi}")
+            print(f"  EXP: {m.exp}, Gold: {m.gold}")
     
     except Exception as e:
         print(f"Error: {e}")
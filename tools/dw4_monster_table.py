@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Columnar decoder for the DW4 NES monster table (27-byte records).
+The whole table is decoded in one struct.iter_unpack pass over the
+record_schema.DW4_MONSTER layout; per-row DW4Monster views are only
+built when indexed or iterated.
+"""
+
+from array import array
+from itertools import compress, count
+from operator import not_
+from typing import Dict, Iterator, List, Optional, Sequence, Any
+
+from nes_rom import NesRom, DW4_MONSTER_BANK, DW4_MONSTER_CPU_ADDR
+from record_schema import DW4_MONSTER
+
+MONSTER_SIZE = DW4_MONSTER.size
+MONSTER_LIMIT = 200  # Safety limit
+MONSTER_HP_RANGE = (1, 999)  # First HP outside this range ends the table
+
+MONSTER_COLUMNS = DW4_MONSTER.names
+MONSTER_RECORD = DW4_MONSTER.struct
+
+
+def first_out_of_range(values: Sequence[int], lo: int, hi: int) -> int:
+    """Index of the first value outside lo..hi (len(values) if none)."""
+    in_range = map(range(lo, hi + 1).__contains__, values)
+    return next(compress(count(), map(not_, in_range)), len(values))
+
+
+class DW4Monster:
+    """Row view of one DW4 monster record."""
+    __slots__ = ("idx",) + MONSTER_COLUMNS
+
+    def __init__(self, idx: int, values: Sequence[Any]):
+        self.idx = idx
+        for name, value in zip(MONSTER_COLUMNS, values):
+            setattr(self, name, value)
+
+    @classmethod
+    def from_bytes(cls, data, offset: int = 0, idx: int = 0) -> "DW4Monster":
+        """Parse a single 27-byte record."""
+        if len(data) < offset + MONSTER_SIZE:
+            raise ValueError(f"Not enough data for monster record at offset {offset}")
+        return cls(idx, MONSTER_RECORD.unpack_from(data, offset))
+
+    def is_valid(self) -> bool:
+        """Check if monster data looks reasonable."""
+        lo, hi = MONSTER_HP_RANGE
+        return lo <= self.hp <= hi
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to JSON-serializable dict."""
+        return {
+            "experience": self.exp,
+            "gold": self.gold,
+            "hp": self.hp,
+            "attack": self.atk,
+            "defense": self.def_,
+            "agility": self.agi,
+            "skill_data": list(self.skill_data),
+            "behavior_data": list(self.behavior_data),
+            "item_drop_id": self.drop_id,
+            "drop_rate_flags": self.drop_rate_flags,
+        }
+
+
+class MonsterTable:
+    """DW4 monster table stored as columns (array per numeric field)."""
+
+    def __init__(self, columns: Dict[str, Sequence[Any]], first_idx: int = 0):
+        self.columns = columns
+        self.first_idx = first_idx
+        self._len = len(columns["hp"])
+
+    @classmethod
+    def from_buffer(cls, data, offset: int = 0, limit: Optional[int] = None) -> "MonsterTable":
+        """Decode up to `limit` records starting at `offset` in one pass."""
+        available = (len(data) - offset) // MONSTER_SIZE
+        n = available if limit is None else max(0, min(limit, available))
+        with memoryview(data)[offset:offset + n * MONSTER_SIZE] as view:
+            decoded = DW4_MONSTER.columns(view)
+
+        columns: Dict[str, Sequence[Any]] = {}
+        for field in DW4_MONSTER.value_fields:
+            values = decoded[field.name]
+            columns[field.name] = array(field.code, values) if field.is_int else values
+        return cls(columns)
+
+    @classmethod
+    def from_rom(cls, rom: NesRom, bank: int = DW4_MONSTER_BANK, cpu_addr: int = DW4_MONSTER_CPU_ADDR,
+                 limit: int = MONSTER_LIMIT) -> "MonsterTable":
+        """Decode the table at (bank, CPU address), cut at the first implausible HP."""
+        table = cls.from_buffer(rom.data, rom.file_offset(bank, cpu_addr), limit)
+        return table[:table.valid_length()]
+
+    def valid_length(self, hp_range=MONSTER_HP_RANGE) -> int:
+        """Number of leading records whose HP is within hp_range."""
+        return first_out_of_range(self.columns["hp"], *hp_range)
+
+    def __getattr__(self, name: str):
+        columns = self.__dict__.get("columns")
+        if columns is not None and name in columns:
+            return columns[name]
+        raise AttributeError(name)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._len)
+            if step != 1:
+                raise ValueError("MonsterTable slices must be contiguous")
+            return MonsterTable({name: col[start:stop] for name, col in self.columns.items()},
+                                self.first_idx + start)
+        if key < 0:
+            key += self._len
+        if not 0 <= key < self._len:
+            raise IndexError(f"Monster index {key} out of range")
+        return DW4Monster(self.first_idx + key, [self.columns[name][key] for name in MONSTER_COLUMNS])
+
+    def __iter__(self) -> Iterator[DW4Monster]:
+        for idx, values in enumerate(zip(*(self.columns[name] for name in MONSTER_COLUMNS)), self.first_idx):
+            yield DW4Monster(idx, values)
+
+    def rows(self) -> List[DW4Monster]:
+        return list(self)
+
+    def select(self, names: Sequence[str]) -> Iterator[tuple]:
+        """Row tuples of the given columns, without building row views."""
+        return zip(*(self.columns[name] for name in names))
@@ -4,123 +4,59 @@ DW4 NES to DQ4r SNES Monster Converter (using DW4Lib offsets from C# docs)
 Converts Dragon Warrior IV NES monster data to DQ3r SNES format for Poppy rebuild.
 """
 
-import struct
+import sys
 from pathlib import Path
-from typing import List, Tuple
 
-# From DW4Lib.DataStructures.Monster C# source:
-# Bank 6 ($06), CPU address $A2A2
-# PRG-ROM layout: [iNES header (16 bytes)] + [Bank 0...Bank 31]
-# Each bank is 16KB ($4000)
-# CPU addresses $8000-$FFFF map to current bank
-# So Bank 6 file offset = 16 + (6 * 0x4000) = 0x18010
-# CPU $A2A2 within bank = $A2A2 - $8000 = $2A2A
-# File offset = 0x18010 + 0x2A2A = 0x1A2B2
-
-ROM_PATH = Path("C:\\Users\\me\\source\\repos\\dragon-warrior-4-info\\roms\\Dragon Warrior IV (1992-10)(Enix)(US).nes")
-MONSTER_OFFSET = 0x1A2B2
-MONSTER_SIZE = 27
-MONSTER_LIMIT = 200  # Safety limit
+from nes_rom import NesRom, DW4_ROM_PATH as ROM_PATH, DW4_MONSTER_BANK, DW4_MONSTER_CPU_ADDR
+from dw4_monster_table import MonsterTable, MONSTER_LIMIT
+from record_schema import MONSTER
+from pasm_writer import open_pasm
 
-def read_word_le(data: bytes, offset: int) -> int:
-    """Read little-endian 16-bit word."""
-    return struct.unpack_from('<H', data, offset)[0]
-
-class DW4Monster:
-    """DW4 NES monster from 27-byte record."""
-    __slots__ = ['idx', 'exp', 'gold', 'hp', 'atk', 'def_', 'agi', 'drop_id', 'drop_rate']
-    
-    def __init__(self, idx: int, data: bytes):
-        self.idx = idx
-        self.exp = read_word_le(data, 0)
-        self.gold = read_word_le(data, 2)
-        self.hp = read_word_le(data, 4)
-        self.atk = data[6]
-        self.def_ = data[7]
-        self.agi = data[8]
-        self.drop_id = data[19]
-        self.drop_rate = data[23]
-    
-    def is_valid(self) -> bool:
-        """Check if monster data looks reasonable."""
-        # HP should be 1-999, ATK/DEF/AGI reasonable
-        return 1 <= self.hp <= 999 and 0 <= self.atk <= 255 and 0 <= self.def_ <= 255
+# From DW4Lib.DataStructures.Monster C# source:
+# Bank 6 ($06), CPU address $A2A2 (file offset 0x1A2B2, see nes_rom.py)
 
-def extract_dw4_monsters() -> List[DW4Monster]:
+def extract_dw4_monsters() -> MonsterTable:
     """Extract monsters from DW4 NES ROM."""
-    if not ROM_PATH.exists():
-        raise FileNotFoundError(f"ROM not found: {ROM_PATH}")
-    
-    with open(ROM_PATH, "rb") as f:
-        rom = f.read()
-    
-    if MONSTER_OFFSET + MONSTER_SIZE > len(rom):
-        raise ValueError(f"Monster table offset {MONSTER_OFFSET:06X} out of bounds")
-    
-    monsters = []
-    for i in range(MONSTER_LIMIT):
-        offset = MONSTER_OFFSET + (i * MONSTER_SIZE)
-        if offset + MONSTER_SIZE > len(rom):
-            break
-        
-        record = rom[offset:offset + MONSTER_SIZE]
-        monster = DW4Monster(i, record)
+    with NesRom.open(ROM_PATH) as rom:
+        return MonsterTable.from_rom(rom, DW4_MONSTER_BANK, DW4_MONSTER_CPU_ADDR, MONSTER_LIMIT)
+
+def write_pasm_monsters(monsters: MonsterTable, output_path: Path, compact: bool = False, incbin: bool = False):
+    """Write monsters to Poppy-compatible .pasm file (or .pasm stub + .bin with incbin)."""
+    with open_pasm(output_path, compact, incbin) as w:
+        w.banner(
+            "DW4 Monsters - Converted to DQ3r SNES Format",
+            "Generated from DW4 NES ROM via Python converter",
+            "Structure per monster:",
+            "  HP (2 bytes, little-endian)",
+            "  Experience (2 bytes, LE)",
+            "  Gold (2 bytes, LE)",
+            "  Attack (1 byte)",
+            "  Defense (1 byte)",
+            "  Agility (1 byte)",
+            "  Drop Item ID (1 byte)",
+            "  Drop Rate (1 byte)",
+        )
+        w.blank()
+        w.const("MONSTER_COUNT", f"${len(monsters):03X}")
+        w.blank()
+        w.label("MONSTER_TABLE")
         
-        if not monster.is_valid():
-            break
+        for idx, row in enumerate(monsters.select(MONSTER.names), monsters.first_idx):
+            hp, exp, gold, atk, def_, agi = row[:6]
+            w.blank()
+            w.comment(f"Monster ${idx:02X}: HP={hp:3d} ATK={atk:2d} DEF={def_:2d} AGI={agi:2d}")
+            w.label(f"monster_{idx:02X}")
+            w.record(MONSTER, row, comments=False)
         
-        monsters.append(monster)
-    
-    return monsters
-
-def write_pasm_monsters(monsters: List[DW4Monster], output_path: Path):
-    """Write monsters to Poppy-compatible .pasm file."""
-    lines = [
-        "; ============================================================================",
-        "; DW4 Monsters - Converted to DQ3r SNES Format",
-        "; ============================================================================",
-        "; Generated from DW4 NES ROM via Python converter",
-        "; Structure per monster:",
-        ";   HP (2 bytes, little-endian)",
-        ";   Experience (2 bytes, LE)",
-        ";   Gold (2 bytes, LE)",
-        ";   Attack (1 byte)",
-        ";   Defense (1 byte)",
-        ";   Agility (1 byte)",
-        ";   Drop Item ID (1 byte)",
-        ";   Drop Rate (1 byte)",
-        "; ============================================================================",
-        "",
-        f"MONSTER_COUNT = ${len(monsters):03X}",
-        "",
-        "MONSTER_TABLE:",
-    ]
-    
-    for m in monsters:
-        lines.append("")
-        lines.append(f"; Monster ${m.idx:02X}: HP={m.hp:3d} ATK={m.atk:2d} DEF={m.def_:2d} AGI={m.agi:2d}")
-        lines.append(f"monster_{m.idx:02X}:")
-        lines.append(f"\t.word ${m.hp:04x}")
-        lines.append(f"\t.word ${m.exp:04x}")
-        lines.append(f"\t.word ${m.gold:04x}")
-        lines.append(f"\t.byte ${m.atk:02x}")
-        lines.append(f"\t.byte ${m.def_:02x}")
-        lines.append(f"\t.byte ${m.agi:02x}")
-        lines.append(f"\t.byte ${m.drop_id:02x}")
-        lines.append(f"\t.byte ${m.drop_rate:02x}")
-    
-    lines.extend(["", "MONSTER_TABLE_END:"])
-    
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, "w") as f:
-        f.write("\n".join(lines))
+        w.blank()
+        w.label("MONSTER_TABLE_END")
 
 def main():
     print("=" * 70)
     print("DW4 NES to DQ4r SNES Monster Converter")
     print("=" * 70)
     print(f"\nROM Path: {ROM_PATH}")
-    print(f"Monster Table Offset: 0x{MONSTER_OFFSET:06X}")
+    print(f"Monster Table: Bank {DW4_MONSTER_BANK} ${DW4_MONSTER_CPU_ADDR:04X}")
     
     try:
         monsters = extract_dw4_monsters()
@@ -139,7 +75,7 @@ def main():
                       f"EXP={m.exp:5d} Gold={m.gold:5d}")
         
         output = Path("c:\\Users\\me\\source\\repos\\dq4r-info\\src\\data\\monsters_dw4.pasm")
-        write_pasm_monsters(monsters, output)
+        write_pasm_monsters(monsters, output, incbin="--incbin" in sys.argv[1:])
         print(f"\nWrote {output}")
         
     except Exception as e:
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Overlap packer for encounter groups.
+
+Consecutive encounter groups share monsters (`encounter_0000` ends with
+$84,$06 and `encounter_0001` starts with it), so instead of padding every
+group to 6 bytes the groups are stored at their real length in one byte
+stream where overlapping suffixes/prefixes are merged (greedy shortest
+common superstring). Group N is still found in O(1) through a 16-bit
+offset index plus a 4-bit length table (two lengths per byte, low nibble
+first): offset = INDEX[n], length = (LENGTHS[n >> 1] >> 4 * (n & 1)) & $0f.
+
+Greedy merging works bucket-wise from the longest possible overlap down to
+1, linking each group to at most one successor and one predecessor and
+never closing a cycle, which is the classic greedy SCS order for short
+strings without an O(n^2) pair search.
+"""
+
+from typing import Dict, List, NamedTuple, Sequence
+
+from record_schema import ENCOUNTER_SLOTS
+from instrumentation import traced
+
+
+class PackedEncounters(NamedTuple):
+    data: bytes              # Merged monster ID stream
+    offsets: List[int]       # Per group: offset into data
+    lengths: List[int]       # Per group: number of monsters
+
+    @property
+    def count(self) -> int:
+        return len(self.offsets)
+
+    def group(self, n: int) -> bytes:
+        """Monster IDs of group n (what the engine does with the index)."""
+        return self.data[self.offsets[n]:self.offsets[n] + self.lengths[n]]
+
+    def length_table(self) -> bytes:
+        """Lengths packed two per byte, even groups in the low nibble."""
+        lengths = self.lengths + [0] * (self.count & 1)
+        return bytes(lo | hi << 4 for lo, hi in zip(lengths[0::2], lengths[1::2]))
+
+    @property
+    def index_size(self) -> int:
+        return 2 * self.count + (self.count + 1) // 2
+
+    @property
+    def size(self) -> int:
+        return len(self.data) + self.index_size
+
+    @property
+    def padded_size(self) -> int:
+        """Size of the fixed 6-byte-per-group layout."""
+        return ENCOUNTER_SLOTS * self.count
+
+
+def _contained(strings: Sequence[bytes]) -> Dict[bytes, bytes]:
+    """Map every string that occurs inside a longer one to such a container."""
+    container: Dict[bytes, bytes] = {}
+    for s in sorted(strings, key=len, reverse=True):
+        for length in range(1, len(s)):
+            for start in range(len(s) - length + 1):
+                container.setdefault(s[start:start + length], s)
+    return {s: container[s] for s in strings if s in container}
+
+
+def superstring(strings: Sequence[bytes]) -> bytes:
+    """Greedy shortest common superstring of distinct, non-contained strings."""
+    if not strings:
+        return b""
+    max_len = max(len(s) for s in strings)
+    n = len(strings)
+    succ = [-1] * n
+    pred = [-1] * n
+    overlap = [0] * n           # Overlap between i and succ[i]
+    chain_tail = list(range(n)) # Valid for chain heads: last node of the chain
+    chain_head = list(range(n)) # Valid for chain tails: first node of the chain
+
+    for k in range(max_len - 1, 0, -1):
+        # Strings by their length-k prefix, still lacking a predecessor
+        by_prefix: Dict[bytes, List[int]] = {}
+        for j, s in enumerate(strings):
+            if pred[j] == -1 and len(s) > k:
+                by_prefix.setdefault(s[:k], []).append(j)
+        if not by_prefix:
+            continue
+        for i, s in enumerate(strings):
+            if succ[i] != -1 or len(s) <= k:
+                continue
+            candidates = by_prefix.get(s[-k:])
+            if not candidates:
+                continue
+            # Everything listed still lacks a predecessor; skip the chain's own head (cycle)
+            for pos, j in enumerate(candidates):
+                if chain_head[i] != j:
+                    break
+            else:
+                continue
+            del candidates[pos]
+            succ[i], pred[j], overlap[i] = j, i, k
+            head, tail = chain_head[i], chain_tail[j]
+            chain_tail[head] = tail
+            chain_head[tail] = head
+
+    out = bytearray()
+    for head in range(n):
+        if pred[head] != -1:
+            continue
+        node, skip = head, 0
+        while node != -1:
+            out += strings[node][skip:]
+            skip = overlap[node]
+            node = succ[node]
+    return bytes(out)
+
+
+@traced("encounters.pack", records=lambda packed: packed.count)
+def pack_encounters(groups: Sequence[Sequence[int]]) -> PackedEncounters:
+    """Pack monster ID groups (real lengths, no padding) into one merged stream."""
+    raw = [bytes(list(g)[:ENCOUNTER_SLOTS]) for g in groups]
+    unique = list(dict.fromkeys(s for s in raw if s))
+    inside = _contained(unique)
+    roots = [s for s in unique if s not in inside]
+    data = superstring(roots)
+
+    position: Dict[bytes, int] = {}
+    for s in roots:
+        position[s] = data.find(s)
+    for s, outer in inside.items():
+        while outer in inside:
+            outer = inside[outer]
+        position[s] = position[outer] + outer.find(s)
+
+    offsets = [position[s] if s else 0 for s in raw]
+    lengths = [len(s) for s in raw]
+    return PackedEncounters(data, offsets, lengths)
+
+
+def format_report(packed: PackedEncounters) -> str:
+    saved = packed.padded_size - packed.size
+    pct = 100.0 * saved / packed.padded_size if packed.padded_size else 0.0
+    return (
+        f"Encounter groups: {packed.count}\n"
+        f"  Padded layout:  {packed.padded_size} bytes ({ENCOUNTER_SLOTS} x {packed.count})\n"
+        f"  Merged stream:  {len(packed.data)} bytes (from {sum(packed.lengths)} real bytes)\n"
+        f"  Index:          {packed.index_size} bytes (.word offset + 4-bit length per group)\n"
+        f"  Packed total:   {packed.size} bytes, saved {saved} bytes ({pct:.1f}%)"
+    )
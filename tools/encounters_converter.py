@@ -2,61 +2,117 @@
 """Convert DW4 encounters JSON to .pasm format."""
 
 import json
+import sys
 from pathlib import Path
+from typing import Any, Dict, List, Optional
 
-def safe_int(val, default=0):
-	"""Safely convert value to int."""
-	if val is None:
-		return default
-	if isinstance(val, int):
-		return val
-	if isinstance(val, str):
-		if val.startswith('0x'):
-			try:
-				return int(val, 16)
-			except ValueError:
-				return default
-		try:
-			return int(val)
-		except ValueError:
-			return default
-	return default
+from record_schema import ENCOUNTER, ENCOUNTER_SLOTS
+import encounter_packer
+from build_cache import BuildCache
+from encounter_packer import PackedEncounters, format_report, pack_encounters
+from pasm_writer import PasmWriter, output_files, write_pasm
+from instrumentation import traced
+
+MAX_PACKED_SIZE = 0xFFFF		# ENCOUNTER_INDEX holds .word offsets into ENCOUNTER_DATA
 
 # Paths
 dw4_encounters_path = Path("C:/Users/me/source/repos/dragon-warrior-4-info/assets/json/encounters.json")
 output_pasm = Path("src/data/encounters_dw4.pasm")
 
-# Load encounters JSON
-with open(dw4_encounters_path) as f:
-	data = json.load(f)
-
-encounter_groups = data.get("encounter_groups", [])
-print(f"Converting DW4 encounters JSON to .pasm...")
-print(f"Loaded {len(encounter_groups)} encounter groups")
-
-# Generate .pasm
-pasm_lines = [
-	"; Encounters: {} encounter groups from DW4".format(len(encounter_groups)),
-	"ENCOUNTER_COUNT = ${:04x}".format(len(encounter_groups)),
-	"",
-	"ENCOUNTER_TABLE:",
-]
-
-for idx, encounter in enumerate(encounter_groups):
-	monster_ids = encounter.get("monster_ids", [])
-	# Pad to 6 monsters per group
-	while len(monster_ids) < 6:
-		monster_ids.append(0)
-	monster_ids = monster_ids[:6]  # Limit to 6
-	
-	monsters_hex = ", ".join(f"${mid:02x}" for mid in monster_ids)
-	pasm_lines.append(f"encounter_{idx:04x}: .byte {monsters_hex}")
-
-pasm_lines.append("")
-
-# Write .pasm file
-output_pasm.parent.mkdir(parents=True, exist_ok=True)
-with open(output_pasm, 'w') as f:
-	f.write('\n'.join(pasm_lines))
-
-print(f"Wrote {output_pasm}")
+
+@traced("encounters.normalize")
+def encounters_from_json(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+	return data.get("encounter_groups", [])
+
+
+@traced("encounters.load")
+def load_encounters(path: Path = dw4_encounters_path) -> List[Dict[str, Any]]:
+	with open(path) as f:
+		return encounters_from_json(json.load(f))
+
+
+@traced("encounters.emit")
+def write_encounters_pasm(w: PasmWriter, encounter_groups: List[Dict[str, Any]]) -> int:
+	w.comment("Encounters: {} encounter groups from DW4".format(len(encounter_groups)))
+	w.const("ENCOUNTER_COUNT", "${:04x}".format(len(encounter_groups)))
+	w.blank()
+	w.label("ENCOUNTER_TABLE")
+
+	for idx, encounter in enumerate(encounter_groups):
+		monster_ids = encounter.get("monster_ids", [])
+		# Pad to 6 monsters per group, limit to 6
+		monster_ids = (monster_ids + [0] * ENCOUNTER_SLOTS)[:ENCOUNTER_SLOTS]
+
+		w.row(f"encounter_{idx:04x}", ENCOUNTER, monster_ids)
+
+	w.line()
+	return len(encounter_groups)
+
+
+def pack_groups(encounter_groups: List[Dict[str, Any]]) -> PackedEncounters:
+	return pack_encounters([g.get("monster_ids", []) for g in encounter_groups])
+
+
+@traced("encounters.emit")
+def write_packed_encounters_pasm(w: PasmWriter, encounter_groups: List[Dict[str, Any]],
+								 packed: Optional[PackedEncounters] = None) -> int:
+	"""Overlap-merged groups: offset index, 4-bit lengths and the shared monster stream.
+
+	packed is pack_groups(encounter_groups) when the caller already has it.
+	"""
+	packed = packed or pack_groups(encounter_groups)
+	if len(packed.data) > MAX_PACKED_SIZE:
+		raise ValueError(f"Packed encounter data is {len(packed.data)} bytes; "
+						 f"ENCOUNTER_INDEX .word offsets only reach ${MAX_PACKED_SIZE:04X}")
+
+	w.comment("Encounters: {} encounter groups from DW4, overlap-packed".format(packed.count))
+	w.comment("Group n: ENCOUNTER_DATA + ENCOUNTER_INDEX[n], length (ENCOUNTER_LENGTHS[n >> 1] >> 4 * (n & 1)) & $0f")
+	w.const("ENCOUNTER_COUNT", "${:04x}".format(packed.count))
+	w.const("ENCOUNTER_DATA_SIZE", "${:04x}".format(len(packed.data)))
+	w.blank()
+	w.label("ENCOUNTER_INDEX")
+	w.data("H", packed.offsets)
+	w.blank()
+	w.label("ENCOUNTER_LENGTHS")
+	w.data("B", packed.length_table())
+	w.blank()
+	w.label("ENCOUNTER_DATA")
+	w.data("B", packed.data)
+	w.label("ENCOUNTER_DATA_END")
+
+	w.line()
+	return packed.count
+
+
+def main(cache: BuildCache = None):
+	cache = cache or BuildCache(force="--force" in sys.argv[1:])
+	incbin = "--incbin" in sys.argv[1:]
+	packed = "--packed" in sys.argv[1:]
+	outputs = output_files(output_pasm, incbin)
+	options = {name: True for name, on in (("incbin", incbin), ("packed", packed)) if on}
+	code = [__file__, encounter_packer.__file__] if packed else [__file__]
+	if cache.is_fresh("encounters", [dw4_encounters_path], outputs, code, options):
+		print(f"{output_pasm} is up to date")
+		return
+
+	# Load encounters JSON
+	encounter_groups = load_encounters()
+	print(f"Converting DW4 encounters JSON to .pasm...")
+	print(f"Loaded {len(encounter_groups)} encounter groups")
+
+	# Write .pasm file
+	if packed:
+		packed_groups = pack_groups(encounter_groups)
+		write_pasm(output_pasm, write_packed_encounters_pasm, encounter_groups, packed_groups, incbin=incbin)
+	else:
+		write_pasm(output_pasm, write_encounters_pasm, encounter_groups, incbin=incbin)
+
+	print(f"Wrote {output_pasm}")
+	if packed:
+		print(format_report(packed_groups))
+
+	cache.record("encounters", [dw4_encounters_path], outputs, code, options)
+
+
+if __name__ == "__main__":
+	main()
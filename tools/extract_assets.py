@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+PNG -> SNES 4bpp tiles + tilemaps (Issue #2), called by build.ps1.
+
+Every PNG under --input becomes a deduplicated tile blob, a tilemap and a
+CGRAM palette in src/data/generated/, and --output (src/data/generated.asm)
+gets a label, constants and .incbin lines for each one:
+
+    <NAME>_TILE_COUNT, <NAME>_MAP_WIDTH, <NAME>_MAP_HEIGHT, <NAME>_COLORS
+    <NAME>_CHR .. <NAME>_CHR_END      4bpp tiles, 32 bytes each
+    <NAME>_MAP .. <NAME>_MAP_END      tilemap words (vhopppcc cccccccc), row-major
+    <NAME>_CGRAM .. <NAME>_CGRAM_END  BGR555 colors from CGRAM entry 0, ready to DMA
+
+Indexed PNGs map straight to CGRAM: color i is palette i >> 4, entry i & 15,
+and each 8x8 tile may only use one 16-color palette row (entry 0 of any row
+is transparent and fits everywhere). RGB/RGBA images with at most 16 colors
+are indexed in first-use order, with fully transparent pixels as color 0.
+Images with more colors need --quantize PALETTE: a CGRAM blob whose first 16
+colors they are mapped onto (nearest color, see nes_palette.Quantizer).
+
+Tiles that are mirrors of an earlier tile are stored once and flipped by the
+tilemap (see snes_tiles.py). Requires NumPy and Pillow.
+
+Usage:
+    python tools/extract_assets.py --input assets --output src/data/generated.asm --verbose
+    python tools/extract_assets.py --input assets --output build/gfx.asm --tile-base 0x100 --no-flip
+    python tools/extract_assets.py --quantize build/field.cgram --verbose
+"""
+
+import argparse
+import re
+import sys
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from build_cache import BuildCache, glob_inputs
+from instrumentation import traced
+from nes_palette import Quantizer, cgram_blob, to_bgr555
+from output_file import write_output
+from pasm_writer import PasmWriter, write_pasm
+from snes_tiles import (TILE_SIZE, TileSet, dedupe_tiles, pack_planar, split_tiles, tilemap_entries)
+
+BPP = 4
+COLORS_PER_PALETTE = 1 << BPP
+CHR_SUFFIX = ".chr"
+MAP_SUFFIX = ".map"
+CGRAM_SUFFIX = ".cgram"
+MAX_COLORS = 8 * COLORS_PER_PALETTE      # BG palettes 0-7
+
+
+class Asset(NamedTuple):
+    name: str                                 # Label prefix, e.g. FONT_MAIN
+    source: Path
+    width: int                                # Tilemap size in tiles
+    height: int
+    tileset: TileSet
+    chr_data: bytes
+    map_data: bytes
+    cgram_data: bytes
+
+    @property
+    def colors(self) -> int:
+        return len(self.cgram_data) // 2
+
+    @property
+    def tile_count(self) -> int:
+        return len(self.tileset.tiles)
+
+
+def asset_name(path: Path, root: Path) -> str:
+    """assets/gfx/font-main.png -> GFX_FONT_MAIN."""
+    rel = path.relative_to(root).with_suffix("")
+    return re.sub(r"[^0-9A-Za-z]+", "_", "_".join(rel.parts)).strip("_").upper()
+
+
+def indexed_palette(img: Image.Image, pixels: np.ndarray) -> np.ndarray:
+    """BGR555 colors of every palette row an indexed image uses."""
+    rows = (int(pixels.max()) >> BPP) + 1 if pixels.size else 1
+    size = min(rows * COLORS_PER_PALETTE, MAX_COLORS)
+    rgb = np.zeros((size, 3), dtype=np.uint8)
+    source = np.array(img.getpalette() or [], dtype=np.uint8).reshape(-1, 3)[:size]
+    rgb[:len(source)] = source
+    return to_bgr555(rgb)
+
+
+def load_indexed(path: Path, quantizer: Optional[Quantizer] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """(H, W) uint8 color indices and the BGR555 palette they index."""
+    with Image.open(path) as img:
+        if img.mode == "P":
+            pixels = np.asarray(img, dtype=np.uint8)
+            return pixels, indexed_palette(img, pixels)
+        if img.mode in ("1", "L"):
+            pixels = np.asarray(img.convert("L"), dtype=np.uint8)
+            rgba = np.stack([pixels, pixels, pixels, np.full_like(pixels, 0xFF)], axis=-1)
+        else:
+            rgba = np.asarray(img.convert("RGBA"), dtype=np.uint8)
+
+    # Pack RGBA into one uint32 per pixel; every fully transparent pixel is the same color
+    packed = rgba.view("<u4").reshape(rgba.shape[:2]).copy()
+    transparent = rgba[..., 3] == 0
+    packed[transparent] = 0
+    colors, first, inverse = np.unique(packed, return_index=True, return_inverse=True)
+    if len(colors) > COLORS_PER_PALETTE and quantizer is not None:
+        pixels = quantizer.quantize(rgba[..., :3])
+        pixels[transparent] = 0
+        return pixels, quantizer.palette[:COLORS_PER_PALETTE]
+    order = np.argsort(first)
+    if transparent.any():
+        clear = int(np.searchsorted(colors, 0))
+        order = np.concatenate([[clear], order[order != clear]])
+    if len(colors) > COLORS_PER_PALETTE:
+        raise ValueError(f"{path.name} has {len(colors)} colors; save it as an indexed PNG "
+                         f"(16 colors per palette row) or pass --quantize with a target palette")
+    rank = np.empty(len(colors), dtype=np.uint8)
+    rank[order] = np.arange(len(colors))
+    rgba_colors = colors[order].astype("<u4").view(np.uint8).reshape(-1, 4)
+    return rank[inverse.reshape(packed.shape)], to_bgr555(rgba_colors[:, :3])
+
+
+def tile_palettes(tiles: np.ndarray, name: str, width: int) -> np.ndarray:
+    """Palette row per tile; fails on tiles that mix rows."""
+    rows = (tiles >> BPP).reshape(len(tiles), -1).astype(np.int16)
+    opaque = (tiles & (COLORS_PER_PALETTE - 1)).reshape(len(tiles), -1) != 0
+    low = np.where(opaque, rows, 0xFF).min(axis=1)
+    high = np.where(opaque, rows, -1).max(axis=1)
+    mixed = np.flatnonzero(opaque.any(axis=1) & (low != high))
+    if len(mixed):
+        t = int(mixed[0])
+        raise ValueError(f"{name}: tile ({t % width}, {t // width}) uses colors from palette rows "
+                         f"{int(low[t])} and {int(high[t])}")
+    return np.maximum(high, 0)
+
+
+@traced("assets.convert")
+def convert_image(path: Path, root: Path, tile_base: int = 0, priority: bool = False,
+                  flips: bool = True, quantizer: Optional[Quantizer] = None) -> Asset:
+    """Tiles, tilemap, palette and their packed bytes for one PNG."""
+    pixels, palette = load_indexed(path, quantizer)
+    name = asset_name(path, root)
+    try:
+        tiles = split_tiles(pixels)
+    except ValueError as e:
+        raise ValueError(f"{path.name}: {e}") from None
+    height, width = pixels.shape[0] // TILE_SIZE, pixels.shape[1] // TILE_SIZE
+    palettes = tile_palettes(tiles, path.name, width)
+    tileset = dedupe_tiles(tiles & (COLORS_PER_PALETTE - 1), flips)
+    try:
+        words = tilemap_entries(tileset.index, tileset.flips, palettes, tile_base, priority)
+    except ValueError as e:
+        raise ValueError(f"{path.name}: {e}") from None
+    return Asset(name, path, width, height, tileset, pack_planar(tileset.tiles, BPP), words.tobytes(),
+                 cgram_blob(palette))
+
+
+def blob_dir(output: Path) -> Path:
+    """src/data/generated.asm -> src/data/generated/ (removed by build.ps1 -Clean)."""
+    return output.with_suffix("")
+
+
+def include_dir(output: Path) -> str:
+    """Blob directory as seen from src/ ("data/generated")."""
+    return f"{output.parent.name}/{output.stem}"
+
+
+def write_assets_asm(w: PasmWriter, assets: List[Asset], include: str) -> int:
+    """Constants, labels and .incbin lines for every converted image."""
+    w.banner(
+        "Generated Assets - Graphics",
+        "Auto-generated by tools/extract_assets.py (do not edit)",
+        f"Tiles: SNES {BPP}bpp, {TILE_SIZE * BPP} bytes each; tilemaps: vhopppcc cccccccc words",
+    )
+    for asset in assets:
+        tiles = asset.width * asset.height
+        chr_name, map_name, cgram_name = blob_names(asset.name)
+        w.blank()
+        w.comment(f"{asset.source.name}: {asset.width}x{asset.height} tiles, {asset.tile_count} unique "
+                  f"of {tiles} ({asset.tileset.flipped} flipped)")
+        w.const(f"{asset.name}_TILE_COUNT", f"${asset.tile_count:04x}")
+        w.const(f"{asset.name}_MAP_WIDTH", f"${asset.width:02x}")
+        w.const(f"{asset.name}_MAP_HEIGHT", f"${asset.height:02x}")
+        w.const(f"{asset.name}_COLORS", f"${asset.colors:02x}")
+        w.label(f"{asset.name}_CHR")
+        w.line(f'\t.incbin "{include}/{chr_name}"')
+        w.label(f"{asset.name}_CHR_END")
+        w.label(f"{asset.name}_MAP")
+        w.line(f'\t.incbin "{include}/{map_name}"')
+        w.label(f"{asset.name}_MAP_END")
+        w.label(f"{asset.name}_CGRAM")
+        w.line(f'\t.incbin "{include}/{cgram_name}"')
+        w.label(f"{asset.name}_CGRAM_END")
+    w.blank()
+    return len(assets)
+
+
+def blob_names(name: str) -> Tuple[str, str, str]:
+    """Tile, tilemap and palette blob file names for an asset label."""
+    return tuple(f"{name.lower()}{suffix}" for suffix in (CHR_SUFFIX, MAP_SUFFIX, CGRAM_SUFFIX))
+
+
+def blob_paths(output: Path, name: str) -> Tuple[Path, Path, Path]:
+    return tuple(blob_dir(output) / blob for blob in blob_names(name))
+
+
+def asset_outputs(output: Path, names: List[str]) -> List[Path]:
+    return [output] + [path for name in names for path in blob_paths(output, name)]
+
+
+def remove_stale(output: Path, keep: List[Path]):
+    """Drop blobs of images that no longer exist."""
+    blobs = blob_dir(output)
+    if not blobs.is_dir():
+        return
+    for path in blobs.iterdir():
+        if path.suffix in (CHR_SUFFIX, MAP_SUFFIX, CGRAM_SUFFIX) and path not in keep:
+            path.unlink()
+
+
+def switch_args(argv: List[str]) -> List[str]:
+    """build.ps1 passes `--verbose:$Verbose`, which arrives as --verbose:True / --verbose:False."""
+    out = []
+    for arg in argv:
+        flag, sep, value = arg.partition(":")
+        if sep and flag.startswith("--"):
+            if value.lower() in ("true", "$true", "1"):
+                out.append(flag)
+            elif value.lower() not in ("false", "$false", "0"):
+                out.append(arg)
+        else:
+            out.append(arg)
+    return out
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Convert PNG assets to SNES 4bpp tiles and tilemaps")
+    parser.add_argument("--input", type=Path, default=Path("assets"), help="Directory searched for *.png")
+    parser.add_argument("--output", type=Path, default=Path("src/data/generated.asm"),
+                        help="Generated include (blobs go in a directory of the same name)")
+    parser.add_argument("--tile-base", type=lambda s: int(s, 0), default=0,
+                        help="First VRAM tile number used by the tilemaps")
+    parser.add_argument("--priority", action="store_true", help="Set the priority bit in every tilemap entry")
+    parser.add_argument("--no-flip", dest="flips", action="store_false", help="Only merge identical tiles")
+    parser.add_argument("--quantize", type=Path, metavar="CGRAM",
+                        help="Map images with more than 16 colors onto the first 16 colors of this CGRAM blob")
+    parser.add_argument("--force", action="store_true", help="Regenerate even if nothing changed")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(switch_args(sys.argv[1:] if argv is None else argv))
+
+    try:
+        images = glob_inputs(args.input, "**/*.png")
+        options = {"tile_base": args.tile_base, "priority": args.priority, "flips": args.flips}
+        inputs = images + ([args.quantize] if args.quantize else [])
+        code = [__file__, Path(__file__).with_name("snes_tiles.py"), Path(__file__).with_name("nes_palette.py")]
+        cache = BuildCache(force=args.force)
+        names = [asset_name(p, args.input) for p in images]
+        outputs = asset_outputs(args.output, names)
+        if cache.is_fresh("assets", inputs, outputs, code, options):
+            print(f"{args.output} is up to date")
+            return 0
+        duplicates = {n for n in names if names.count(n) > 1}
+        if duplicates:
+            raise ValueError(f"Images map to the same label: {', '.join(sorted(duplicates))}")
+
+        quantizer = None
+        if args.quantize:
+            # Entry 0 stays transparent, so quantized pixels use entries 1-15
+            quantizer = Quantizer(np.fromfile(args.quantize, dtype="<u2")[:COLORS_PER_PALETTE], first=1)
+
+        assets = []
+        for path in images:
+            asset = convert_image(path, args.input, args.tile_base, args.priority, args.flips, quantizer)
+            assets.append(asset)
+            if args.verbose:
+                print(f"  {path.relative_to(args.input)}: {asset.width}x{asset.height} tiles -> "
+                      f"{asset.tile_count} unique ({asset.tileset.flipped} flipped), "
+                      f"{len(asset.chr_data)} bytes CHR, {asset.colors} colors")
+            for blob, data in zip(blob_paths(args.output, asset.name),
+                                  (asset.chr_data, asset.map_data, asset.cgram_data)):
+                write_output(blob, data)
+
+        write_pasm(args.output, write_assets_asm, assets, include_dir(args.output))
+        remove_stale(args.output, outputs)
+        total = sum(a.width * a.height for a in assets)
+        unique = sum(a.tile_count for a in assets)
+        print(f"Wrote {args.output}: {len(assets)} images, {unique} unique tiles of {total}")
+        cache.record("assets", inputs, outputs, code, options)
+        return 0
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
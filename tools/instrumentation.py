@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Spans and counters for the extract / convert tools.
+
+    from instrumentation import count, span, traced
+
+    @traced("spells.load")                    # Records = len(result) or the returned int
+    def load_spells(): ...
+
+    with span("monsters.emit") as s:
+        s.records = write_monsters_pasm(w, monsters)
+    count("snapshot.hit")
+
+Each span records wall time, records processed, counters and (with memory
+tracing) the tracemalloc peak above the memory in use when it started.
+Spans nest per thread. tracemalloc keeps one peak for the whole process, so
+a span that overlaps a span on another thread gets no peak (peak_bytes None,
+null in the trace); the pipeline runs its stages serially when it traces
+memory.
+
+Tracing is off by default. Disabled, span() hands back one shared no-op
+object and count() / @traced return after a single global check, so the
+instrumented tools run as before. Enable it with enable(), the pipeline's
+--trace option, or for any tool with the environment:
+
+    DQ4R_TRACE=build/trace.json        file, or a directory for <script>.trace.json
+    DQ4R_TRACE_FORMAT=chrome           Chrome trace-event JSON (chrome://tracing, Perfetto)
+    DQ4R_TRACE_MEMORY=0                skip tracemalloc (faster, no peaks)
+"""
+
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Union
+
+TRACE_VERSION = 1
+TRACE_FORMATS = ("json", "chrome")
+
+
+class Span:
+    """One timed region; use as a context manager."""
+
+    __slots__ = ("tracer", "name", "category", "args", "records", "counters", "thread", "depth",
+                 "start_ns", "end_ns", "peak_bytes", "error", "_mem_start", "_peak_seen", "_parent")
+
+    def __init__(self, tracer: "Tracer", name: str, category: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.records = 0
+        self.counters: Counter = Counter()
+        self.peak_bytes: Optional[int] = 0   # None once another thread's span overlapped it
+        self.error: Optional[str] = None
+
+    def add(self, records: int):
+        self.records += records
+
+    def __enter__(self) -> "Span":
+        stack = self.tracer._stack()
+        self._parent = stack[-1] if stack else None
+        self.thread = self.tracer._thread_id()
+        self.depth = len(stack)
+        self.tracer._open(self)
+        if self.tracer.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._parent is not None:
+                self._parent._peak_seen = max(self._parent._peak_seen, peak)
+            tracemalloc.reset_peak()
+            self._mem_start = self._peak_seen = current
+        stack.append(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.perf_counter_ns()
+        self.tracer._stack().pop()
+        self.tracer._close(self)
+        if self.tracer.memory:
+            peak = max(tracemalloc.get_traced_memory()[1], self._peak_seen)
+            if self.peak_bytes is not None:
+                self.peak_bytes = peak - self._mem_start
+            if self._parent is not None:
+                self._parent._peak_seen = max(self._parent._peak_seen, peak)
+            tracemalloc.reset_peak()
+        if exc_type is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        self.tracer._finish(self)
+        return False
+
+    @property
+    def seconds(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+
+class _NullSpan:
+    """Shared stand-in while tracing is disabled; every operation is a no-op."""
+
+    __slots__ = ()
+    records = 0
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+    def add(self, records: int):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Collects finished spans and counter totals."""
+
+    def __init__(self, memory: bool = True):
+        self.memory = memory
+        self.spans: List[Span] = []
+        self.counters: Counter = Counter()
+        self.origin_ns = time.perf_counter_ns()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._threads: Dict[int, int] = {}
+        self._thread_names: Dict[int, str] = {}
+        self._open_spans: List[Span] = []
+        self._owns_tracemalloc = memory and not tracemalloc.is_tracing()
+        if self._owns_tracemalloc:
+            tracemalloc.start()
+
+    def close(self):
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _thread_id(self) -> int:
+        ident = threading.get_ident()
+        tid = self._threads.get(ident)
+        if tid is None:
+            with self._lock:
+                tid = self._threads.setdefault(ident, len(self._threads))
+                self._thread_names[tid] = threading.current_thread().name
+        return tid
+
+    def _open(self, s: Span):
+        """Track s as open; spans open on two threads at once lose their memory peaks."""
+        with self._lock:
+            if any(o.thread != s.thread for o in self._open_spans):
+                for o in self._open_spans:
+                    o.peak_bytes = None
+                s.peak_bytes = None
+            self._open_spans.append(s)
+
+    def _close(self, s: Span):
+        with self._lock:
+            self._open_spans.remove(s)
+
+    def _finish(self, s: Span):
+        with self._lock:
+            self.spans.append(s)
+
+    def count(self, name: str, n: int = 1):
+        stack = self._stack()
+        if stack:
+            stack[-1].counters[name] += n
+        with self._lock:
+            self.counters[name] += n
+
+    # ------------------------------------------------------------------
+    # Output
+    # ------------------------------------------------------------------
+
+    def _ms(self, ns: int) -> float:
+        return round(ns / 1e6, 3)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per span name: calls, total wall ms, records and the largest peak (None if none was measured)."""
+        out: Dict[str, Dict[str, Any]] = {}
+        for s in sorted(self.spans, key=lambda s: s.start_ns):
+            entry = out.setdefault(s.name, {"calls": 0, "ms": 0.0, "records": 0, "peak_bytes": None})
+            entry["calls"] += 1
+            entry["ms"] = round(entry["ms"] + self._ms(s.end_ns - s.start_ns), 3)
+            entry["records"] += s.records
+            if s.peak_bytes is not None:
+                entry["peak_bytes"] = max(entry["peak_bytes"] or 0, s.peak_bytes)
+        return out
+
+    def to_json(self) -> Dict[str, Any]:
+        spans = []
+        for s in sorted(self.spans, key=lambda s: s.start_ns):
+            entry = {
+                "name": s.name,
+                "category": s.category,
+                "thread": s.thread,
+                "depth": s.depth,
+                "start_ms": self._ms(s.start_ns - self.origin_ns),
+                "duration_ms": self._ms(s.end_ns - s.start_ns),
+                "records": s.records,
+            }
+            if self.memory:
+                entry["peak_bytes"] = s.peak_bytes
+            if s.counters:
+                entry["counters"] = dict(s.counters)
+            if s.args:
+                entry["args"] = s.args
+            if s.error:
+                entry["error"] = s.error
+            spans.append(entry)
+        return {
+            "version": TRACE_VERSION,
+            "memory": self.memory,
+            "threads": {str(tid): name for tid, name in sorted(self._thread_names.items())},
+            "spans": spans,
+            "counters": dict(sorted(self.counters.items())),
+            "summary": self.summary(),
+        }
+
+    def to_chrome(self) -> Dict[str, Any]:
+        """Chrome trace-event format: one complete ("X") event per span."""
+        pid = os.getpid()
+        events: List[Dict[str, Any]] = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in sorted(self._thread_names.items())
+        ]
+        end_us = 0.0
+        for s in sorted(self.spans, key=lambda s: s.start_ns):
+            args = dict(s.args, records=s.records)
+            if self.memory and s.peak_bytes is not None:
+                args["peak_bytes"] = s.peak_bytes
+            args.update(s.counters)
+            if s.error:
+                args["error"] = s.error
+            ts = (s.start_ns - self.origin_ns) / 1e3
+            dur = (s.end_ns - s.start_ns) / 1e3
+            end_us = max(end_us, ts + dur)
+            events.append({"name": s.name, "cat": s.category, "ph": "X", "ts": round(ts, 3),
+                           "dur": round(dur, 3), "pid": pid, "tid": s.thread, "args": args})
+        if self.counters:
+            events.append({"name": "counters", "ph": "C", "ts": round(end_us, 3), "pid": pid, "tid": 0,
+                           "args": dict(sorted(self.counters.items()))})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write(self, path: Union[str, Path], fmt: str = "json"):
+        if fmt not in TRACE_FORMATS:
+            raise ValueError(f"Unknown trace format {fmt!r} (expected one of {', '.join(TRACE_FORMATS)})")
+        doc = self.to_chrome() if fmt == "chrome" else self.to_json()
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", newline="\n") as f:
+            json.dump(doc, f, indent=1)
+            f.write("\n")
+
+    def format_summary(self) -> str:
+        lines = [f"{'Span':<32} {'Calls':>5} {'Time':>10} {'Records':>8}" + (f" {'Peak':>10}" if self.memory else "")]
+        for name, e in self.summary().items():
+            line = f"{name:<32} {e['calls']:>5} {e['ms']:>8.1f}ms {e['records']:>8}"
+            if self.memory:
+                peak = e["peak_bytes"]
+                line += f" {'-':>10}" if peak is None else f" {peak / 1024:>8.1f}KB"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+# ----------------------------------------------------------------------
+# Module-level API (what the tools call)
+# ----------------------------------------------------------------------
+
+_tracer: Optional[Tracer] = None
+
+
+def enable(memory: bool = True) -> Tracer:
+    """Start collecting spans (replaces any active tracer)."""
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+    _tracer = Tracer(memory)
+    return _tracer
+
+
+def disable() -> Optional[Tracer]:
+    """Stop collecting; returns the tracer with everything recorded so far."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.close()
+    return tracer
+
+
+def active() -> Optional[Tracer]:
+    return _tracer
+
+
+def span(name: str, category: Optional[str] = None, **args) -> Union[Span, _NullSpan]:
+    """Timed region; category defaults to the last dotted part of name (load, emit, ...)."""
+    if _tracer is None:
+        return NULL_SPAN
+    return Span(_tracer, name, category or name.rpartition(".")[2], args)
+
+
+def count(name: str, n: int = 1):
+    """Add n to a counter (on the innermost open span and in the totals)."""
+    if _tracer is not None:
+        _tracer.count(name, n)
+
+
+def _records(result: Any) -> int:
+    """Returned int (write_*_pasm record counts) or len() of a returned collection."""
+    if isinstance(result, bool):
+        return 0
+    if isinstance(result, int):
+        return result
+    try:
+        return len(result)
+    except TypeError:
+        return 0
+
+
+def traced(name: str, category: Optional[str] = None, records: Callable[[Any], int] = _records) -> Callable:
+    """Decorator: run the function inside span(name); records(result) gives the record count."""
+    def decorate(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with span(name, category) as s:
+                result = func(*args, **kwargs)
+                s.records = records(result)
+                return result
+        return wrapper
+    return decorate
+
+
+def _enable_from_env():
+    target = os.environ.get("DQ4R_TRACE")
+    if not target:
+        return
+    fmt = os.environ.get("DQ4R_TRACE_FORMAT", "json")
+    memory = os.environ.get("DQ4R_TRACE_MEMORY", "1").lower() not in ("0", "false", "no")
+    path = Path(target)
+    if path.suffix.lower() != ".json":
+        path = path / f"{Path(sys.argv[0]).stem or 'python'}.trace.json"
+    tracer = enable(memory)
+    atexit.register(tracer.write, path, fmt)
+
+
+_enable_from_env()
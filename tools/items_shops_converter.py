@@ -4,13 +4,33 @@ Convert DW4 items and shops JSON to DQ4r SNES `.pasm` format.
 """
 
 import json
+import sys
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+import shop_inventory
+from record_schema import ITEM, SHOP_ENTRY, SHOP_HEADER, safe_int
+from build_cache import BuildCache
+from pasm_writer import PasmWriter, output_files, write_pasm
+from shop_inventory import InternedInventories, bitset_size, format_report, intern_inventories, item_bitset
+from instrumentation import traced
 
 DW4_ITEMS_FILE = Path("C:\\Users\\me\\source\\repos\\dragon-warrior-4-info\\assets\\json\\items.json")
 DW4_SHOPS_FILE = Path("C:\\Users\\me\\source\\repos\\dragon-warrior-4-info\\assets\\json\\shops.json")
 OUTPUT_DIR = Path("c:\\Users\\me\\source\\repos\\dq4r-info\\src\\data")
+MAX_SHOP_ITEMS = 16  # Limit to 16 items per shop
 
+@traced("items.normalize")
+def items_from_json(data: Any) -> List[Dict[str, Any]]:
+    """Items list from either a bare array or an object with an items key."""
+    if isinstance(data, list):
+        return data
+    elif isinstance(data, dict) and 'items' in data:
+        return data['items']
+    else:
+        return []
+
+@traced("items.load")
 def load_items() -> List[Dict[str, Any]]:
     """Load items from JSON array."""
     if not DW4_ITEMS_FILE.exists():
@@ -18,16 +38,9 @@ def load_items() -> List[Dict[str, Any]]:
         return []
     
     with open(DW4_ITEMS_FILE) as f:
-        data = json.load(f)
-    
-    # Handle both array format and object with items key
-    if isinstance(data, list):
-        return data
-    elif isinstance(data, dict) and 'items' in data:
-        return data['items']
-    else:
-        return []
+        return items_from_json(json.load(f))
 
+@traced("shops.load")
 def load_shops() -> Dict[str, Any]:
     """Load shops from JSON."""
     if not DW4_SHOPS_FILE.exists():
@@ -37,124 +50,198 @@ def load_shops() -> Dict[str, Any]:
     with open(DW4_SHOPS_FILE) as f:
         return json.load(f)
 
-def items_to_pasm(items: List[Dict[str, Any]]) -> str:
-    """Generate .pasm for items."""
-    lines = [
-        "; ============================================================================",
-        "; DW4 Items - Converted to DQ3r SNES Format",
-        "; ============================================================================",
-        "; Auto-generated from DW4 JSON",
-        "; Each item: Price(2) Flags(1)",
-        "; ============================================================================",
-        "",
-        f"ITEM_COUNT = ${len(items):02X}",
-        "",
-        "ITEM_TABLE:",
-    ]
+@traced("items.emit")
+def write_items_pasm(w: PasmWriter, items: List[Dict[str, Any]]) -> int:
+    """Stream .pasm for items."""
+    w.banner(
+        "DW4 Items - Converted to DQ3r SNES Format",
+        "Auto-generated from DW4 JSON",
+        "Each item: Price(2) Flags(1)",
+    )
+    w.blank()
+    w.const("ITEM_COUNT", f"${len(items):02X}")
+    w.blank()
+    w.label("ITEM_TABLE")
     
     for itm in items:
-        id_val = itm.get('id', '0x00')
-        idx = int(id_val, 0) if isinstance(id_val, str) and id_val.startswith('0x') else int(id_val)
+        idx = safe_int(itm.get('id', '0x00'))
         name = itm.get('name', f'Item {idx}')
-        price = int(itm.get('price', 0))
-        flags = int(itm.get('type', 0))  # type or flags
         
-        lines.append("")
-        lines.append(f"; Item ${idx:02X}: {name}")
-        lines.append(f"item_{idx:02X}:")
-        lines.append(f"\t.word ${price:04x}\t\t; Price {price}")
-        lines.append(f"\t.byte ${flags:02x}\t\t; Type/Flags {flags}")
+        w.blank()
+        w.comment(f"Item ${idx:02X}: {name}")
+        w.label(f"item_{idx:02X}")
+        w.record(ITEM, ITEM.row_from_json(itm))  # type or flags
     
-    lines.append("")
-    lines.append("ITEM_TABLE_END:")
-    
-    return "\n".join(lines)
+    w.blank()
+    w.label("ITEM_TABLE_END")
+    return len(items)
 
-def shops_to_pasm(shops_data: Dict[str, Any]) -> str:
-    """Generate .pasm for shops."""
+@traced("shops.emit")
+def write_shops_pasm(w: PasmWriter, shops_data: Dict[str, Any]) -> int:
+    """Stream .pasm for shops."""
     shops = shops_data.get('shops', [])
     shop_types = shops_data.get('shop_types', {})
     
-    lines = [
-        "; ============================================================================",
-        "; DW4 Shops - Converted to DQ3r SNES Format",
-        "; ============================================================================",
-        "; Auto-generated from DW4 JSON",
-        "; Each shop: Type(1) ItemCount(1) Items(variable)",
-        "; ============================================================================",
-        "",
-        f"SHOP_COUNT = ${len(shops):02X}",
-        "",
-        "SHOP_TYPES:",
-    ]
+    w.banner(
+        "DW4 Shops - Converted to DQ3r SNES Format",
+        "Auto-generated from DW4 JSON",
+        "Each shop: Type(1) ItemCount(1) Items(variable)",
+    )
+    w.blank()
+    w.const("SHOP_COUNT", f"${len(shops):02X}")
+    w.blank()
+    w.label("SHOP_TYPES")
     
     for type_id, type_name in shop_types.items():
-        lines.append(f"\t.byte ${int(type_id):02x}\t\t; {type_name}")
+        w.directive("B", [int(type_id)], type_name)
     
-    lines.extend(["", "SHOP_TABLE:"])
+    w.blank()
+    w.label("SHOP_TABLE")
     
     for shop in shops:
-        idx = shop.get('id', 0)
-        shop_type = shop.get('shop_type', 0)
-        item_ids = shop.get('item_ids', [])
+        idx = safe_int(shop.get('id', 0))
+        shop_type = safe_int(shop.get('shop_type', 0))
+        item_ids = [safe_int(i) & 0xFF for i in shop.get('item_ids', [])[:MAX_SHOP_ITEMS]]
         
-        lines.append("")
-        lines.append(f"; Shop ${idx:02X}: Type {shop_type}")
-        lines.append(f"shop_{idx:02X}:")
-        lines.append(f"\t.byte ${shop_type:02x}\t\t; Shop type")
-        lines.append(f"\t.byte ${len(item_ids):02x}\t\t; Item count")
+        w.blank()
+        w.comment(f"Shop ${idx:02X}: Type {shop_type}")
+        w.label(f"shop_{idx:02X}")
+        w.record(SHOP_HEADER, (shop_type & 0xFF, len(item_ids)))
         
-        for item_id in item_ids[:16]:  # Limit to 16 items per shop
-            lines.append(f"\t.byte ${item_id:02x}\t\t; Item {item_id}")
+        if w.compact:
+            w.data("B", item_ids + [0xFF])
+        else:
+            for item_id in item_ids:
+                w.directive("B", [item_id], f"Item {item_id}")
+            w.directive("B", [0xFF], "End marker")
+    
+    w.blank()
+    w.label("SHOP_TABLE_END")
+    return len(shops)
+
+def shop_inventories(shops: List[Dict[str, Any]]) -> List[List[int]]:
+    return [[safe_int(i) & 0xFF for i in shop.get('item_ids', [])[:MAX_SHOP_ITEMS]] for shop in shops]
+
+@traced("shops.emit")
+def write_interned_shops_pasm(w: PasmWriter, shops_data: Dict[str, Any],
+                              interned: Optional[InternedInventories] = None) -> int:
+    """Stream .pasm for shops with interned inventories and per-shop item bitsets.
+    
+    interned is intern_shops(shops_data) when the caller already has it.
+    """
+    shops = shops_data.get('shops', [])
+    shop_types = shops_data.get('shop_types', {})
+    inventories = shop_inventories(shops)
+    interned = interned or intern_inventories(inventories)
+    bitset_bytes = bitset_size(inventories)
+    
+    w.banner(
+        "DW4 Shops - Converted to DQ3r SNES Format (interned inventories)",
+        "Auto-generated from DW4 JSON",
+        "Each shop: Type(1) InventoryOffset(2) into SHOP_INVENTORY ($ff-terminated lists)",
+        "Stock test: SHOP_BITSETS[shop * SHOP_BITSET_SIZE + (item >> 3)] & (1 << (item & 7))",
+    )
+    w.blank()
+    w.const("SHOP_COUNT", f"${len(shops):02X}")
+    w.const("SHOP_BITSET_SIZE", f"${bitset_bytes:02X}")
+    w.blank()
+    w.label("SHOP_TYPES")
+    
+    for type_id, type_name in shop_types.items():
+        w.directive("B", [int(type_id)], type_name)
+    
+    w.blank()
+    w.label("SHOP_TABLE")
+    
+    for shop, offset in zip(shops, interned.offsets):
+        idx = safe_int(shop.get('id', 0))
+        shop_type = safe_int(shop.get('shop_type', 0))
         
-        lines.append(f"\t.byte $ff\t\t; End marker")
+        w.blank()
+        w.comment(f"Shop ${idx:02X}: Type {shop_type}")
+        w.label(f"shop_{idx:02X}")
+        w.record(SHOP_ENTRY, (shop_type & 0xFF, offset))
+    
+    w.blank()
+    w.label("SHOP_INVENTORY")
+    w.data("B", interned.data)
     
-    lines.append("")
-    lines.append("SHOP_TABLE_END:")
+    w.blank()
+    w.label("SHOP_BITSETS")
+    for shop, items in zip(shops, inventories):
+        w.comment(f"Shop ${safe_int(shop.get('id', 0)):02X}")
+        w.data("B", item_bitset(items, bitset_bytes))
     
-    return "\n".join(lines)
+    w.blank()
+    w.label("SHOP_TABLE_END")
+    return len(shops)
+
+def intern_shops(shops_data: Dict[str, Any]) -> InternedInventories:
+    return intern_inventories(shop_inventories(shops_data.get('shops', [])))
+
+def interned_report(shops_data: Dict[str, Any], interned: InternedInventories) -> str:
+    """Size report for write_interned_shops_pasm (kept out of the emitter, which captures re-run)."""
+    shops = shops_data.get('shops', [])
+    return format_report(interned, len(shops), bitset_size(shop_inventories(shops)))
 
-def main():
+def main(cache: BuildCache = None):
     print("=" * 70)
     print("DW4 Items & Shops JSON to SNES .pasm Converter")
     print("=" * 70)
     
+    cache = cache or BuildCache(force="--force" in sys.argv[1:])
+    incbin = "--incbin" in sys.argv[1:]
+    options = {"incbin": True} if incbin else None
+    
     try:
         # Load and convert items
-        items = load_items()
-        print(f"\nLoaded {len(items)} items")
-        
-        if items:
-            print(f"First 5 items:")
-            for itm in items[:5]:
-                id_val = itm.get('id', '0x00')
-                idx = int(id_val, 0) if isinstance(id_val, str) and id_val.startswith('0x') else int(id_val)
-                print(f"  ${idx:02X}: {itm.get('name')} - ${itm.get('price')}")
+        items_path = OUTPUT_DIR / "items_dw4.pasm"
+        items_out = output_files(items_path, incbin)
+        if cache.is_fresh("items_shops.items", [DW4_ITEMS_FILE], items_out, [__file__], options):
+            print(f"\n{items_path} is up to date")
+        else:
+            items = load_items()
+            print(f"\nLoaded {len(items)} items")
             
-            pasm = items_to_pasm(items)
-            items_path = OUTPUT_DIR / "items_dw4.pasm"
-            items_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(items_path, "w") as f:
-                f.write(pasm)
-            print(f"\nWrote {items_path}")
+            if items:
+                print(f"First 5 items:")
+                for itm in items[:5]:
+                    idx = safe_int(itm.get('id', '0x00'))
+                    print(f"  ${idx:02X}: {itm.get('name')} - ${itm.get('price')}")
+                
+                write_pasm(items_path, write_items_pasm, items, incbin=incbin)
+                print(f"\nWrote {items_path}")
+                cache.record("items_shops.items", [DW4_ITEMS_FILE], items_out, [__file__], options)
         
         # Load and convert shops
-        shops_data = load_shops()
-        shops = shops_data.get('shops', [])
-        print(f"\nLoaded {len(shops)} shops")
-        
-        if shops:
-            print(f"First 3 shops:")
-            for shop in shops[:3]:
-                items_list = shop.get('item_ids', [])
-                print(f"  Shop ${shop.get('id'):02X}: Type {shop.get('shop_type')} - "
-                      f"{len(items_list)} items")
+        shops_path = OUTPUT_DIR / "shops_dw4.pasm"
+        shops_out = output_files(shops_path, incbin)
+        interned = "--interned" in sys.argv[1:]
+        shop_options = dict(options or {}, **({"interned": True} if interned else {}))
+        shop_code = [__file__, shop_inventory.__file__] if interned else [__file__]
+        if cache.is_fresh("items_shops.shops", [DW4_SHOPS_FILE], shops_out, shop_code, shop_options):
+            print(f"\n{shops_path} is up to date")
+        else:
+            shops_data = load_shops()
+            shops = shops_data.get('shops', [])
+            print(f"\nLoaded {len(shops)} shops")
             
-            pasm = shops_to_pasm(shops_data)
-            shops_path = OUTPUT_DIR / "shops_dw4.pasm"
-            with open(shops_path, "w") as f:
-                f.write(pasm)
-            print(f"\nWrote {shops_path}")
+            if shops:
+                print(f"First 3 shops:")
+                for shop in shops[:3]:
+                    items_list = shop.get('item_ids', [])
+                    print(f"  Shop ${shop.get('id'):02X}: Type {shop.get('shop_type')} - "
+                          f"{len(items_list)} items")
+                
+                if interned:
+                    interned_lists = intern_shops(shops_data)
+                    write_pasm(shops_path, write_interned_shops_pasm, shops_data, interned_lists, incbin=incbin)
+                else:
+                    write_pasm(shops_path, write_shops_pasm, shops_data, incbin=incbin)
+                print(f"\nWrote {shops_path}")
+                if interned:
+                    print(interned_report(shops_data, interned_lists))
+                cache.record("items_shops.shops", [DW4_SHOPS_FILE], shops_out, shop_code, shop_options)
         
     except Exception as e:
         print(f"Error: {e}")
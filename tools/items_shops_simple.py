@@ -5,75 +5,66 @@ import json
 from pathlib import Path
 from typing import List, Dict, Any
 
+from record_schema import ITEM_PRICE, SHOP_TYPE, safe_int
+from pasm_writer import PasmWriter, write_pasm
+from instrumentation import traced
+
+DW4_ITEMS_FILE = Path("C:\\Users\\me\\source\\repos\\dragon-warrior-4-info\\assets\\json\\items.json")
+DW4_SHOPS_FILE = Path("C:\\Users\\me\\source\\repos\\dragon-warrior-4-info\\assets\\json\\shops.json")
 OUTPUT_DIR = Path("c:\\Users\\me\\source\\repos\\dq4r-info\\src\\data")
 
-def safe_int(val, base=10):
-    """Safely convert to int, handling hex strings."""
-    if isinstance(val, int):
-        return val
-    if isinstance(val, str):
-        if val.startswith('0x'):
-            return int(val, 16)
-        try:
-            return int(val, base)
-        except:
-            return 0
-    return 0
+@traced("items.normalize")
+def items_from_json(data: Any) -> List[Dict[str, Any]]:
+    """Items list from either a bare array or an object with an items key."""
+    return data if isinstance(data, list) else data.get('items', [])
 
+@traced("items.load")
 def load_items() -> List[Dict[str, Any]]:
     """Load items from JSON."""
-    path = Path("C:\\Users\\me\\source\\repos\\dragon-warrior-4-info\\assets\\json\\items.json")
-    if not path.exists():
+    if not DW4_ITEMS_FILE.exists():
         return []
-    with open(path) as f:
-        data = json.load(f)
-    return data if isinstance(data, list) else data.get('items', [])
+    with open(DW4_ITEMS_FILE) as f:
+        return items_from_json(json.load(f))
 
+@traced("shops.load")
 def load_shops() -> Dict[str, Any]:
     """Load shops from JSON."""
-    path = Path("C:\\Users\\me\\source\\repos\\dragon-warrior-4-info\\assets\\json\\shops.json")
-    if not path.exists():
+    if not DW4_SHOPS_FILE.exists():
         return {}
-    with open(path) as f:
+    with open(DW4_SHOPS_FILE) as f:
         return json.load(f)
 
-def items_to_pasm(items: List[Dict[str, Any]]) -> str:
-    """Generate .pasm for items."""
-    lines = [
-        "; Items: 128 items from DW4",
-        f"ITEM_COUNT = ${len(items):02X}",
-        "",
-        "ITEM_TABLE:",
-    ]
+@traced("items.emit")
+def write_items_pasm(w: PasmWriter, items: List[Dict[str, Any]]) -> int:
+    """Stream .pasm for items."""
+    w.comment("Items: 128 items from DW4")
+    w.const("ITEM_COUNT", f"${len(items):02X}")
+    w.blank()
+    w.label("ITEM_TABLE")
     
     for itm in items:
         idx = safe_int(itm.get('id', 0))
         name = itm.get('name', f'Item')
-        price = safe_int(itm.get('price', 0))
         
-        lines.append(f"item_{idx:02X}: .word ${price:04x} ; {name}")
-    
-    return "\n".join(lines)
+        w.row(f"item_{idx:02X}", ITEM_PRICE, ITEM_PRICE.row_from_json(itm), name)
+    return len(items)
 
-def shops_to_pasm(shops_data: Dict[str, Any]) -> str:
-    """Generate .pasm for shops."""
+@traced("shops.emit")
+def write_shops_pasm(w: PasmWriter, shops_data: Dict[str, Any]) -> int:
+    """Stream .pasm for shops."""
     shops = shops_data.get('shops', [])
-    lines = [
-        "; Shops: DW4 shop data",
-        f"SHOP_COUNT = ${len(shops):02X}",
-        "",
-        "SHOP_TABLE:",
-    ]
+    w.comment("Shops: DW4 shop data")
+    w.const("SHOP_COUNT", f"${len(shops):02X}")
+    w.blank()
+    w.label("SHOP_TABLE")
     
     for shop in shops:
         idx = safe_int(shop.get('id', 0))
-        shop_type = safe_int(shop.get('shop_type', 0))
         item_ids = shop.get('item_ids', [])
         items_list = ",".join(f"${safe_int(i):02X}" for i in item_ids[:8])
         
-        lines.append(f"shop_{idx:02X}: .byte ${shop_type:02X} ; items: {items_list}")
-    
-    return "\n".join(lines)
+        w.row(f"shop_{idx:02X}", SHOP_TYPE, SHOP_TYPE.row_from_json(shop), f"items: {items_list}", upper=True)
+    return len(shops)
 
 def main():
     print("Converting DW4 items/shops JSON to .pasm...")
@@ -82,21 +73,16 @@ def main():
         items = load_items()
         print(f"Loaded {len(items)} items")
         if items:
-            pasm = items_to_pasm(items)
             path = OUTPUT_DIR / "items_dw4.pasm"
-            path.parent.mkdir(parents=True, exist_ok=True)
-            with open(path, "w") as f:
-                f.write(pasm)
+            write_pasm(path, write_items_pasm, items)
             print(f"Wrote {path}")
         
         shops_data = load_shops()
         shops = shops_data.get('shops', [])
         print(f"Loaded {len(shops)} shops")
         if shops:
-            pasm = shops_to_pasm(shops_data)
             path = OUTPUT_DIR / "shops_dw4.pasm"
-            with open(path, "w") as f:
-                f.write(pasm)
+            write_pasm(path, write_shops_pasm, shops_data)
             print(f"Wrote {path}")
     except Exception as e:
         print(f"Error: {e}")
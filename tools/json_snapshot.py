@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Binary snapshot cache for directories of per-record JSON files.
+
+The first load reads every `monster_*.json` / `item_*.json` concurrently and
+writes one packed snapshot: a file manifest (name, size, mtime, SHA-256),
+one column per JSON key (a tag byte + int64 value per row) and a string
+table for names and other non-integer values. Later loads read the snapshot
+in one call and rebuild the records from the columns without parsing JSON.
+
+The snapshot is fresh while the directory mtime and every file's size and
+mtime match the manifest; a file whose stat changed but whose hash did not
+(e.g. touched) still counts as unchanged, and its new mtime is written back
+to the manifest so the next load does not hash it again.
+
+Layout (little-endian):
+    header   4s magic, H version, H columns, I files, I rows, I strings, q dir mtime_ns
+    files    I name string, Q size, q mtime_ns, 32s sha256    (per file)
+    keys     I key string                                    (per column)
+    columns  rows tag bytes, padded to 8, then rows x int64   (per column)
+    strings  I offsets[strings + 1], UTF-8 blob
+"""
+
+import hashlib
+import json
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from build_cache import REPO_ROOT
+from instrumentation import count
+
+SNAPSHOT_DIR = REPO_ROOT / "build" / "snapshots"
+SNAPSHOT_MAGIC = b"DQ4S"
+SNAPSHOT_VERSION = 1
+
+HEADER = struct.Struct("<4sHHIIIq")
+FILE_ENTRY = struct.Struct("<IQq32s")
+INDEX = struct.Struct("<I")
+
+# Cell tags
+MISSING, INT, STR, JSON = 0, 1, 2, 3
+INT64_RANGE = range(-(1 << 63), 1 << 63)
+
+
+class FileStat(NamedTuple):
+    name: str
+    size: int
+    mtime_ns: int
+    sha256: bytes
+
+
+def _pad8(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def _stat_dir(directory: Path, pattern: str) -> Tuple[int, List[Tuple[Path, os.stat_result]]]:
+    files = sorted(directory.glob(pattern))
+    return directory.stat().st_mtime_ns, [(path, path.stat()) for path in files]
+
+
+def _read_file(path: Path) -> Tuple[bytes, Optional[Any], Optional[Exception]]:
+    data = path.read_bytes()
+    try:
+        return data, json.loads(data), None
+    except Exception as e:
+        return data, None, e
+
+
+class _StringTable:
+    def __init__(self):
+        self.strings: List[str] = []
+        self.index: Dict[str, int] = {}
+
+    def add(self, text: str) -> int:
+        idx = self.index.get(text)
+        if idx is None:
+            idx = self.index[text] = len(self.strings)
+            self.strings.append(text)
+        return idx
+
+    def pack(self) -> bytes:
+        blobs = [s.encode("utf-8") for s in self.strings]
+        offsets = [0]
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        return struct.pack(f"<{len(offsets)}I", *offsets) + b"".join(blobs)
+
+
+def _encode_cell(value: Any, strings: _StringTable) -> Tuple[int, int]:
+    if type(value) is int and value in INT64_RANGE:
+        return INT, value
+    if type(value) is str:
+        return STR, strings.add(value)
+    return JSON, strings.add(json.dumps(value, separators=(",", ":")))
+
+
+def write_snapshot(path: Path, dir_mtime_ns: int, files: List[FileStat], records: List[Dict[str, Any]]):
+    """Pack records column-wise into a snapshot file (written atomically)."""
+    strings = _StringTable()
+    keys: List[str] = []
+    seen = set()
+    for record in records:
+        for key in record:
+            if key not in seen:
+                seen.add(key)
+                keys.append(key)
+
+    rows = len(records)
+    out = bytearray()
+    out += HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(keys), len(files), rows, 0, dir_mtime_ns)
+    for f in files:
+        out += FILE_ENTRY.pack(strings.add(f.name), f.size, f.mtime_ns, f.sha256)
+    for key in keys:
+        out += INDEX.pack(strings.add(key))
+    for key in keys:
+        tags = bytearray(rows)
+        values = [0] * rows
+        for i, record in enumerate(records):
+            if key in record:
+                tags[i], values[i] = _encode_cell(record[key], strings)
+        out += tags + bytes(_pad8(len(out) + rows) - len(out) - rows)
+        out += struct.pack(f"<{rows}q", *values)
+    struct.pack_into("<I", out, 16, len(strings.strings))  # Header string count
+    out += strings.pack()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_bytes(out)
+    os.replace(tmp, path)
+
+
+class Snapshot:
+    """Snapshot file read into memory; records are rebuilt from the columns on demand."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        view = memoryview(path.read_bytes())
+        try:
+            magic, version, ncols, nfiles, rows, nstrings, self.dir_mtime_ns = HEADER.unpack_from(view, 0)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise ValueError(f"Not a version {SNAPSHOT_VERSION} snapshot: {path}")
+            self.rows = rows
+
+            pos = HEADER.size
+            entries = list(FILE_ENTRY.iter_unpack(view[pos:pos + nfiles * FILE_ENTRY.size]))
+            pos += nfiles * FILE_ENTRY.size
+            key_ids = [i for (i,) in INDEX.iter_unpack(view[pos:pos + ncols * INDEX.size])]
+            pos += ncols * INDEX.size
+
+            self._columns = []
+            for _ in range(ncols):
+                tags = bytes(view[pos:pos + rows])
+                pos = _pad8(pos + rows)
+                values = view[pos:pos + rows * 8].cast("q").tolist()
+                pos += rows * 8
+                self._columns.append((tags, values))
+
+            offsets = view[pos:pos + (nstrings + 1) * 4].cast("I").tolist()
+            pos += (nstrings + 1) * 4
+            blob = bytes(view[pos:pos + offsets[-1]])
+            self.strings = [blob[a:b].decode("utf-8") for a, b in zip(offsets, offsets[1:])]
+        finally:
+            view.release()
+
+        self.keys = [self.strings[i] for i in key_ids]
+        self.files = [FileStat(self.strings[n], size, mtime, digest) for n, size, mtime, digest in entries]
+        self.touched: List[Tuple[int, int]] = []   # (file index, new mtime_ns) of files re-hashed by is_fresh
+
+    def is_fresh(self, dir_mtime_ns: int, stats: List[Tuple[Path, os.stat_result]]) -> bool:
+        """Directory and file stats match; files whose stat changed are re-hashed (see refresh_stats)."""
+        self.touched = []
+        if dir_mtime_ns != self.dir_mtime_ns or len(stats) != len(self.files):
+            return False
+        for i, ((path, st), f) in enumerate(zip(stats, self.files)):
+            if path.name != f.name:
+                return False
+            if st.st_size == f.size and st.st_mtime_ns == f.mtime_ns:
+                continue
+            if st.st_size != f.size or hashlib.sha256(path.read_bytes()).digest() != f.sha256:
+                return False
+            self.touched.append((i, st.st_mtime_ns))
+        return True
+
+    def refresh_stats(self):
+        """Write the mtimes of files is_fresh re-hashed back into the manifest, in place."""
+        if not self.touched:
+            return
+        mtime_at = FILE_ENTRY.size - 32 - 8                  # After name index and size
+        with open(self.path, "r+b") as f:
+            for i, mtime_ns in self.touched:
+                f.seek(HEADER.size + i * FILE_ENTRY.size + mtime_at)
+                f.write(struct.pack("<q", mtime_ns))
+                self.files[i] = self.files[i]._replace(mtime_ns=mtime_ns)
+        self.touched = []
+
+    def records(self) -> List[Dict[str, Any]]:
+        strings = self.strings
+        records: List[Dict[str, Any]] = [{} for _ in range(self.rows)]
+        for key, (tags, values) in zip(self.keys, self._columns):
+            for record, tag, value in zip(records, tags, values):
+                if tag == INT:
+                    record[key] = value
+                elif tag == STR:
+                    record[key] = strings[value]
+                elif tag == JSON:
+                    # Only non-scalar / non-int values (lists, floats, null) are stored as JSON text
+                    record[key] = json.loads(strings[value])
+        return records
+
+
+def snapshot_path(directory: Path, pattern: str, cache_dir: Path = SNAPSHOT_DIR) -> Path:
+    key = hashlib.sha1(f"{Path(directory).resolve()}|{pattern}".encode()).hexdigest()[:12]
+    return cache_dir / f"{Path(directory).name}-{key}.snap"
+
+
+def load_json_dir(directory: Path, pattern: str, cache_dir: Optional[Path] = SNAPSHOT_DIR,
+                  workers: int = 8) -> List[Dict[str, Any]]:
+    """All JSON records of directory/pattern in file-name order, via the snapshot when fresh."""
+    directory = Path(directory)
+    dir_mtime_ns, stats = _stat_dir(directory, pattern)
+    path = snapshot_path(directory, pattern, cache_dir) if cache_dir else None
+
+    if path is not None and path.exists():
+        try:
+            snapshot = Snapshot(path)
+            if snapshot.is_fresh(dir_mtime_ns, stats):
+                count("snapshot.hit")
+                if snapshot.touched:
+                    count("snapshot.refreshed", len(snapshot.touched))
+                    snapshot.refresh_stats()
+                return snapshot.records()
+        except (ValueError, struct.error, OSError):
+            pass  # Rebuild below
+
+    count("snapshot.miss" if path is not None else "snapshot.off")
+    count("json.files", len(stats))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        loaded = list(pool.map(_read_file, [p for p, _ in stats]))
+
+    records = []
+    files = []
+    for (file_path, st), (data, record, error) in zip(stats, loaded):
+        files.append(FileStat(file_path.name, st.st_size, st.st_mtime_ns, hashlib.sha256(data).digest()))
+        if error is not None:
+            print(f"Warning: Failed to load {file_path}: {error}")
+        else:
+            records.append(record)
+
+    if path is not None and all(isinstance(r, dict) for r in records):
+        write_snapshot(path, dir_mtime_ns, files, records)
+    return records
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+LZ compression for generated data tables (DQ4R-LZ).
+
+Byte-oriented LZ77 chosen for a short 65816 decoder (src/engine/lz_decompress.pasm):
+no bit buffers, no Huffman stage, every token starts with one command byte.
+
+    header  uint16  decompressed size (little-endian), then commands until
+                    that many bytes have been produced:
+    0nnnnnnn                        literals: copy the next n+1 bytes (1-128)
+    10nnnnnn dddddddd               near match: n+3 bytes (3-66) from output - (d+1), d < $100
+    11nnnnnn dddddddd dddddddd      far match: n+3 bytes (3-66) from output - (d+1), d < $10000
+
+Matches may overlap the bytes they produce (distance < length repeats a
+pattern), so the decoder copies forward one byte at a time.
+
+Matches are found with hash chains over 3-byte prefixes. The level sets how
+many chain entries are tried per position and whether matching is lazy
+(defer a match by one byte when the next position has a longer one):
+
+    0  literals only        1-3  greedy, short chains      4-9  lazy, chains up to 4096
+
+Usage:
+    python tools/lz_compress.py build/tables/*.bin --level 9
+    python tools/lz_compress.py src/data/monsters_dw4.lz --decompress --output build/
+"""
+
+import argparse
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from output_file import write_output
+
+MIN_MATCH = 3
+MAX_MATCH = 66                 # 6-bit length field + MIN_MATCH
+MAX_LITERALS = 128
+NEAR_DISTANCE = 0x100
+MAX_DISTANCE = 0x10000
+MAX_SIZE = 0xFFFF              # 16-bit size header (the decoder indexes output with Y)
+LZ_SUFFIX = ".lz"
+
+DEFAULT_LEVEL = 6
+# level -> (max chain entries tried per position, lazy matching)
+LEVELS = {
+    0: (0, False),
+    1: (1, False),
+    2: (4, False),
+    3: (8, False),
+    4: (16, True),
+    5: (32, True),
+    6: (64, True),
+    7: (256, True),
+    8: (1024, True),
+    9: (4096, True),
+}
+
+
+class CompressedTable(NamedTuple):
+    name: str
+    raw_size: int
+    packed_size: int
+    seconds: float
+    error: str = ""
+    raw: bool = False                         # Packing did not shrink it; the table stays uncompressed
+
+    @property
+    def ratio(self) -> float:
+        """Packed size as a fraction of the raw size."""
+        return self.packed_size / self.raw_size if self.raw_size else 1.0
+
+    @property
+    def saved(self) -> int:
+        return self.raw_size - self.packed_size
+
+
+def _match_cost(length: int, distance: int) -> int:
+    """Bytes saved by a match over emitting its bytes as literals."""
+    return length - (2 if distance <= NEAR_DISTANCE else 3)
+
+
+class _MatchFinder:
+    """Hash chains over 3-byte prefixes (head: newest position per prefix, prev: next older)."""
+
+    def __init__(self, data: bytes, max_chain: int):
+        self.data = data
+        self.max_chain = max_chain
+        self.head: Dict[bytes, int] = {}
+        self.prev: List[int] = [-1] * len(data)
+        self.inserted = 0
+
+    def insert_to(self, end: int):
+        """Add every position before end to the chains."""
+        data, head, prev = self.data, self.head, self.prev
+        for pos in range(self.inserted, min(end, len(data) - MIN_MATCH + 1)):
+            key = data[pos:pos + MIN_MATCH]
+            prev[pos] = head.get(key, -1)
+            head[key] = pos
+        self.inserted = max(self.inserted, end)
+
+    def find(self, pos: int):
+        """(length, distance) of the most profitable match at pos, or (0, 0)."""
+        data = self.data
+        limit = min(MAX_MATCH, len(data) - pos)
+        if limit < MIN_MATCH:
+            return 0, 0
+        self.insert_to(pos)
+        best_len = best_dist = best_gain = 0
+        cand = self.head.get(data[pos:pos + MIN_MATCH], -1)
+        chain = self.max_chain
+        while cand >= 0 and chain:
+            distance = pos - cand
+            if distance > MAX_DISTANCE:
+                break
+            chain -= 1
+            # Cheap reject: a longer match must also agree at the current best length
+            if best_len and data[cand + best_len] != data[pos + best_len]:
+                cand = self.prev[cand]
+                continue
+            length = MIN_MATCH
+            while length < limit and data[cand + length] == data[pos + length]:
+                length += 1
+            gain = _match_cost(length, distance)
+            if gain > best_gain:
+                best_len, best_dist, best_gain = length, distance, gain
+                if length == limit:
+                    break
+            cand = self.prev[cand]
+        return best_len, best_dist
+
+
+def compress(data: bytes, level: int = DEFAULT_LEVEL) -> bytes:
+    """DQ4R-LZ stream for data (at most MAX_SIZE bytes)."""
+    if len(data) > MAX_SIZE:
+        raise ValueError(f"{len(data)} bytes exceeds the {MAX_SIZE}-byte block limit")
+    if level not in LEVELS:
+        raise ValueError(f"Unknown level {level} (expected 0-9)")
+    data = bytes(data)
+    max_chain, lazy = LEVELS[level]
+    out = bytearray(struct.pack("<H", len(data)))
+    finder = _MatchFinder(data, max_chain)
+    literal_start = 0
+
+    def flush_literals(end: int):
+        nonlocal literal_start
+        while literal_start < end:
+            run = min(MAX_LITERALS, end - literal_start)
+            out.append(run - 1)
+            out.extend(data[literal_start:literal_start + run])
+            literal_start += run
+
+    pos = 0
+    n = len(data)
+    ahead = None  # Match already found at pos by the lazy check
+    while pos < n:
+        length, distance = ahead or (finder.find(pos) if max_chain else (0, 0))
+        ahead = None
+        if length and lazy and pos + 1 < n:
+            ahead = finder.find(pos + 1)
+            # Deferring costs data[pos] as a literal, so the next match has to save more than that
+            if _match_cost(*ahead) > _match_cost(length, distance) + 1:
+                pos += 1
+                continue
+            ahead = None
+        if not length:
+            pos += 1
+            continue
+
+        flush_literals(pos)
+        d = distance - 1
+        if distance <= NEAR_DISTANCE:
+            out += bytes((0x80 | (length - MIN_MATCH), d))
+        else:
+            out += bytes((0xC0 | (length - MIN_MATCH), d & 0xFF, d >> 8))
+        pos += length
+        literal_start = pos
+    flush_literals(n)
+    return bytes(out)
+
+
+def decompress(stream: bytes) -> bytes:
+    """Reference decoder; mirrors the 65816 routine step for step."""
+    if len(stream) < 2:
+        raise ValueError("Stream too short for a DQ4R-LZ header")
+    size = stream[0] | stream[1] << 8
+    out = bytearray()
+    pos = 2
+    while len(out) < size:
+        cmd = stream[pos]
+        pos += 1
+        if cmd < 0x80:
+            run = cmd + 1
+            if pos + run > len(stream):
+                raise ValueError(f"Literal run past the end of the stream at ${pos - 1:04X}")
+            out += stream[pos:pos + run]
+            pos += run
+            continue
+        length = (cmd & 0x3F) + MIN_MATCH
+        d = stream[pos]
+        pos += 1
+        if cmd & 0x40:
+            d |= stream[pos] << 8
+            pos += 1
+        start = len(out) - (d + 1)
+        if start < 0:
+            raise ValueError(f"Match reaches before the start of the output at ${pos:04X}")
+        for i in range(length):  # Forward copy: overlapping matches repeat their pattern
+            out.append(out[start + i])
+    if len(out) != size:
+        raise ValueError(f"Stream produced {len(out)} bytes, header says {size}")
+    return bytes(out)
+
+
+def compress_table(name: str, data: bytes, level: int = DEFAULT_LEVEL) -> Tuple[Optional[bytes], CompressedTable]:
+    """Compress and round-trip check one table.
+
+    Oversized tables come back with an error, and tables that do not shrink
+    come back flagged raw; both return no packed bytes.
+    """
+    start = time.perf_counter()
+    try:
+        packed = compress(data, level)
+    except ValueError as e:
+        return None, CompressedTable(name, len(data), len(data), time.perf_counter() - start, str(e))
+    if decompress(packed) != bytes(data):
+        raise AssertionError(f"{name}: LZ round trip does not reproduce the input")
+    table = CompressedTable(name, len(data), len(packed), time.perf_counter() - start)
+    if len(packed) >= len(data):
+        return None, table._replace(raw=True)
+    return packed, table
+
+
+def format_report(tables: List[CompressedTable]) -> List[str]:
+    lines = [f"{'Table':<14} {'Raw':>8} {'Packed':>8} {'Ratio':>7} {'Time':>9}"]
+    for t in tables:
+        if t.error:
+            lines.append(f"{t.name:<14} {t.raw_size:>8} {'-':>8} {'-':>7} {'':>9}  ({t.error})")
+        elif t.raw:
+            lines.append(f"{t.name:<14} {t.raw_size:>8} {'-':>8} {'-':>7} {t.seconds * 1000:>7.1f}ms  "
+                         f"(kept raw: packing gave {t.packed_size} bytes, {t.ratio:.1%})")
+        else:
+            lines.append(f"{t.name:<14} {t.raw_size:>8} {t.packed_size:>8} {t.ratio:>7.1%} "
+                         f"{t.seconds * 1000:>7.1f}ms")
+    counted = [t for t in tables if not t.error]          # Raw tables count at their raw size
+    raw = sum(t.raw_size for t in counted)
+    size = sum(t.raw_size if t.raw else t.packed_size for t in counted)
+    lines.append(f"{'total':<14} {raw:>8} {size:>8} {size / raw if raw else 1:>7.1%}")
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="DQ4R-LZ compress / decompress files")
+    parser.add_argument("files", nargs="+", type=Path, help="Files to compress (or .lz files with --decompress)")
+    parser.add_argument("--level", type=int, choices=sorted(LEVELS), default=DEFAULT_LEVEL,
+                        help="0 = literals only, 9 = slowest / smallest")
+    parser.add_argument("--decompress", action="store_true", help="Decode .lz files")
+    parser.add_argument("--output", type=Path, help="Output directory (default: next to each input)")
+    args = parser.parse_args(argv)
+
+    try:
+        tables = []
+        for path in args.files:
+            target_dir = args.output or path.parent
+            data = path.read_bytes()
+            if args.decompress:
+                write_output(target_dir / path.with_suffix(".bin").name, decompress(data))
+                print(f"{path} -> {target_dir / path.with_suffix('.bin').name}")
+                continue
+            packed, table = compress_table(path.name, data, args.level)
+            tables.append(table)
+            if packed is not None:
+                write_output(target_dir / (path.stem + LZ_SUFFIX), packed)
+        if tables:
+            print("\n".join(format_report(tables)))
+        return 1 if any(t.error for t in tables) else 0
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
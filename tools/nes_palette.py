@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+NES -> SNES palette conversion (BGR555 colors, CGRAM blobs, attribute tables).
+
+The 64 NES master colors are converted to SNES BGR555 once, at import, into
+NES_TO_BGR555; every conversion after that is a NumPy gather over whole
+palette or attribute arrays.
+
+    BGR555 word   0bbbbbgg gggrrrrr   (little-endian in CGRAM)
+
+NES palette RAM ($3F00-$3F1F) holds four background and four sprite
+sub-palettes of four colors. Two CGRAM layouts are supported:
+
+    rows    sub-palette k -> CGRAM palette k (BG) / 8 + k (sprites), entries 0-3;
+            the attribute value is the tilemap palette number as is
+    slots   sub-palette k -> entries 4k..4k+3 of palette 0 (BG) / 8 (sprites);
+            matches chr_converter.py --group, one 16-color palette per layer
+
+Quantizer maps 24-bit images onto a fixed palette. Nearest colors are
+cached per 15-bit SNES color (32768 entries), and only colors not seen
+before are searched, so large images cost one lookup per pixel.
+
+Usage:
+    python tools/nes_palette.py 0F 16 27 30 0F 01 21 31 --output build/title.cgram
+    python tools/nes_palette.py --ram palette_ram.bin --layout slots --output build/field.cgram
+    python tools/nes_palette.py --lut src/data/nes_palette.pasm
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import List, Optional, Union
+
+import numpy as np
+
+from output_file import write_output
+from pasm_writer import PasmWriter, write_pasm
+
+NES_COLORS = 64
+SUBPALETTES = 4                  # Per layer (BG / sprites)
+SUBPALETTE_SIZE = 4
+PALETTE_RAM_SIZE = 2 * SUBPALETTES * SUBPALETTE_SIZE
+CGRAM_PALETTE_SIZE = 16
+CGRAM_COLORS = 256
+SPRITE_PALETTE_BASE = 8          # OBJ palettes are CGRAM palettes 8-15
+COLOR_CACHE_SIZE = 1 << 15
+LAYOUTS = ("rows", "slots")
+
+# Common 2C02 master palette (RGB); pass a 192-byte .pal file to use another
+NES_RGB = np.array([
+    0x7C7C7C, 0x0000FC, 0x0000BC, 0x4428BC, 0x940084, 0xA80020, 0xA81000, 0x881400,
+    0x503000, 0x007800, 0x006800, 0x005800, 0x004058, 0x000000, 0x000000, 0x000000,
+    0xBCBCBC, 0x0078F8, 0x0058F8, 0x6844FC, 0xD800CC, 0xE40058, 0xF83800, 0xE45C10,
+    0xAC7C00, 0x00B800, 0x00A800, 0x00A844, 0x008888, 0x000000, 0x000000, 0x000000,
+    0xF8F8F8, 0x3CBCFC, 0x6888FC, 0x9878F8, 0xF878F8, 0xF85898, 0xF87858, 0xFCA044,
+    0xF8B800, 0xB8F818, 0x58D854, 0x58F898, 0x00E8D8, 0x787878, 0x000000, 0x000000,
+    0xFCFCFC, 0xA4E4FC, 0xB8B8F8, 0xD8B8F8, 0xF8B8F8, 0xF8A4C0, 0xF0D0B0, 0xFCE0A8,
+    0xF8D878, 0xD8F878, 0xB8F8B8, 0xB8F8D8, 0x00FCFC, 0xF8D8F8, 0x000000, 0x000000,
+], dtype=np.uint32)
+
+
+def unpack_rgb(colors: np.ndarray) -> np.ndarray:
+    """0xRRGGBB integers -> (..., 3) uint8."""
+    colors = np.asarray(colors, dtype=np.uint32)
+    return np.stack([colors >> 16, colors >> 8, colors], axis=-1).astype(np.uint8)
+
+
+def to_bgr555(rgb: np.ndarray) -> np.ndarray:
+    """(..., 3) 8-bit RGB -> BGR555 words."""
+    c = np.asarray(rgb, dtype=np.uint16) >> 3
+    return (c[..., 2] << 10 | c[..., 1] << 5 | c[..., 0]).astype(np.uint16)
+
+
+def from_bgr555(words: np.ndarray) -> np.ndarray:
+    """BGR555 words -> (..., 3) 8-bit RGB (low bits copied from the top, so $1F -> $FF)."""
+    w = np.asarray(words, dtype=np.uint16)
+    c = np.stack([w & 0x1F, w >> 5 & 0x1F, w >> 10 & 0x1F], axis=-1)
+    return (c << 3 | c >> 2).astype(np.uint8)
+
+
+NES_TO_BGR555 = to_bgr555(unpack_rgb(NES_RGB))
+
+
+def load_master_palette(path: Union[str, Path]) -> np.ndarray:
+    """64-entry BGR555 table from a .pal file (64 RGB triples; emphasis sets beyond that are ignored)."""
+    data = np.fromfile(path, dtype=np.uint8)
+    if len(data) < NES_COLORS * 3:
+        raise ValueError(f"{path}: {len(data)} bytes, expected at least {NES_COLORS * 3}")
+    return to_bgr555(data[:NES_COLORS * 3].reshape(NES_COLORS, 3))
+
+
+def nes_to_bgr555(indices, table: np.ndarray = NES_TO_BGR555) -> np.ndarray:
+    """BGR555 color for every NES color index (any shape; bits 6-7 are ignored)."""
+    return table[np.asarray(indices, dtype=np.uint8) & (NES_COLORS - 1)]
+
+
+def cgram_palettes(palette_ram, layout: str = "rows", table: np.ndarray = NES_TO_BGR555) -> np.ndarray:
+    """(16, 16) CGRAM palettes for a 32-byte NES palette RAM image.
+
+    The NES shares color 0 between all sub-palettes ($3F00 mirrors into
+    $3F04/$3F08/...), so entry 0 of every sub-palette gets the backdrop color.
+    """
+    ram = np.asarray(palette_ram, dtype=np.uint8)
+    if ram.shape != (PALETTE_RAM_SIZE,):
+        raise ValueError(f"Palette RAM must be {PALETTE_RAM_SIZE} bytes, got {ram.size}")
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout {layout!r} (expected {' / '.join(LAYOUTS)})")
+    colors = nes_to_bgr555(ram, table).reshape(2, SUBPALETTES, SUBPALETTE_SIZE)
+    colors[:, :, 0] = colors[0, 0, 0]
+
+    cgram = np.zeros((CGRAM_COLORS // CGRAM_PALETTE_SIZE, CGRAM_PALETTE_SIZE), dtype=np.uint16)
+    for layer, base in enumerate((0, SPRITE_PALETTE_BASE)):
+        if layout == "rows":
+            cgram[base:base + SUBPALETTES, :SUBPALETTE_SIZE] = colors[layer]
+        else:
+            cgram[base, :SUBPALETTES * SUBPALETTE_SIZE] = colors[layer].ravel()
+    return cgram
+
+
+def cgram_blob(colors: np.ndarray) -> bytes:
+    """Little-endian BGR555 words, ready to DMA to $2122."""
+    colors = np.asarray(colors, dtype=np.uint16).ravel()
+    if len(colors) > CGRAM_COLORS:
+        raise ValueError(f"{len(colors)} colors do not fit in CGRAM ({CGRAM_COLORS})")
+    return colors.astype("<u2").tobytes()
+
+
+def attribute_palettes(attributes, rows: int = 30, cols: int = 32) -> np.ndarray:
+    """(rows, cols) sub-palette number per tile from a 64-byte attribute table.
+
+    Each attribute byte covers 4x4 tiles; bits 0-1 / 2-3 / 4-5 / 6-7 are the
+    top-left / top-right / bottom-left / bottom-right 2x2 quadrants.
+    """
+    attr = np.asarray(attributes, dtype=np.uint8).reshape(8, 8)
+    y, x = np.mgrid[0:rows, 0:cols]
+    shift = (y >> 1 & 1) * 4 + (x >> 1 & 1) * 2
+    return (attr[y >> 2, x >> 2] >> shift & 3).astype(np.uint8)
+
+
+def nametable_palettes(nametable) -> np.ndarray:
+    """(30, 32) sub-palette per tile of a 1 KB nametable (attribute table at $3C0)."""
+    data = np.asarray(nametable, dtype=np.uint8)
+    if data.size != 0x400:
+        raise ValueError(f"Nametable must be 1024 bytes, got {data.size}")
+    return attribute_palettes(data[0x3C0:])
+
+
+class Quantizer:
+    """Nearest-color mapping onto a fixed BGR555 palette, cached per 15-bit color."""
+
+    # Squared distance weights for R, G, B (green differences are the most visible)
+    WEIGHTS = np.array([2, 4, 3], dtype=np.int32)
+
+    def __init__(self, palette: np.ndarray, first: int = 0):
+        """palette: BGR555 colors; entries before `first` (e.g. a transparent 0) are never chosen."""
+        self.palette = np.asarray(palette, dtype=np.uint16)
+        if first >= len(self.palette):
+            raise ValueError(f"Palette has {len(self.palette)} colors, none at or after entry {first}")
+        self.first = first
+        self._targets = from_bgr555(self.palette[first:]).astype(np.int32)
+        self.cache = np.full(COLOR_CACHE_SIZE, -1, dtype=np.int16)
+
+    def _fill(self, colors: np.ndarray):
+        """Search the nearest palette entry for 15-bit colors not cached yet."""
+        missing = colors[self.cache[colors] < 0]
+        if not len(missing):
+            return
+        rgb = from_bgr555(missing).astype(np.int32)
+        for start in range(0, len(rgb), 4096):  # Bound the (colors, palette) distance matrix
+            diff = rgb[start:start + 4096, None, :] - self._targets[None, :, :]
+            dist = (diff * diff * self.WEIGHTS).sum(axis=-1)
+            self.cache[missing[start:start + 4096]] = dist.argmin(axis=1) + self.first
+
+    def quantize(self, rgb: np.ndarray) -> np.ndarray:
+        """(..., 3) 8-bit RGB -> palette indices of the same shape."""
+        colors = to_bgr555(rgb)
+        self._fill(np.unique(colors))
+        return self.cache[colors].astype(np.uint8)
+
+
+def write_lut_pasm(w: PasmWriter, table: np.ndarray) -> int:
+    w.banner(
+        "NES -> SNES BGR555 Color Table",
+        "Auto-generated by tools/nes_palette.py",
+        "NES_TO_BGR555: .word per NES color index $00-$3F",
+    )
+    w.blank()
+    w.label("NES_TO_BGR555")
+    for row in range(0, NES_COLORS, 8):
+        w.directive("H", [int(c) for c in table[row:row + 8]], f"${row:02X}-${row + 7:02X}")
+    w.blank()
+    return NES_COLORS
+
+
+def parse_colors(values: List[str]) -> np.ndarray:
+    return np.array([int(v, 16) for v in values], dtype=np.uint8)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Convert NES palettes to SNES CGRAM data")
+    parser.add_argument("colors", nargs="*", help="NES color indices in hex (as many as needed, in CGRAM order)")
+    parser.add_argument("--ram", type=Path, help="32-byte NES palette RAM dump ($3F00-$3F1F)")
+    parser.add_argument("--layout", choices=LAYOUTS, default="rows", help="CGRAM layout for --ram")
+    parser.add_argument("--palette", type=Path, help="Master palette .pal file (default: built-in 2C02)")
+    parser.add_argument("--output", type=Path, help="Write a CGRAM blob here")
+    parser.add_argument("--lut", type=Path, help="Write the 64-entry table as .pasm")
+    args = parser.parse_args(argv)
+
+    try:
+        table = load_master_palette(args.palette) if args.palette else NES_TO_BGR555
+        if args.lut:
+            write_pasm(args.lut, write_lut_pasm, table)
+            print(f"Wrote {args.lut}")
+        if args.ram:
+            colors = cgram_palettes(np.fromfile(args.ram, dtype=np.uint8), args.layout, table)
+        elif args.colors:
+            colors = nes_to_bgr555(parse_colors(args.colors), table)
+        else:
+            return 0
+        print(" ".join(f"{c:04X}" for c in colors.ravel()[:64]) + (" ..." if colors.size > 64 else ""))
+        if args.output:
+            write_output(args.output, cgram_blob(colors))
+            print(f"Wrote {args.output} ({colors.size * 2} bytes)")
+        return 0
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
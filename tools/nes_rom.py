@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped NES ROM access layer.
+Parses the iNES header once and exposes PRG/CHR banks as zero-copy views,
+so every DW4 tool agrees on bank / CPU address to file offset mapping.
+"""
+
+import mmap
+from pathlib import Path
+from typing import Iterator, Optional, Tuple, Union
+
+DW4_ROM_PATH = Path("C:\\Users\\me\\source\\repos\\dragon-warrior-4-info\\roms\\Dragon Warrior IV (1992-10)(Enix)(US).nes")
+
+INES_MAGIC = b"NES\x1a"
+INES_HEADER_SIZE = 0x10
+TRAINER_SIZE = 0x200
+PRG_BANK_SIZE = 0x4000  # 16 KB, switchable at CPU $8000-$BFFF (MMC1)
+CHR_BANK_SIZE = 0x2000  # 8 KB
+PRG_CPU_BASE = 0x8000
+PRG_FIXED_BASE = 0xC000  # MMC1 default: $C000-$FFFF is always the last PRG bank
+
+# DW4 monster table: Bank 6, CPU $A2A2
+# File offset = 0x10 + (6 * 0x4000) + ($A2A2 - $8000) = 0x10 + 0x18000 + 0x22A2 = 0x1A2B2
+DW4_MONSTER_BANK = 6
+DW4_MONSTER_CPU_ADDR = 0xA2A2
+
+
+class NesRom:
+    """iNES image backed by mmap (or any bytes-like object)."""
+
+    def __init__(self, data: Union[bytes, bytearray, memoryview, mmap.mmap], path: Optional[Path] = None):
+        self.path = path
+        self._file = None
+        self._mmap = data if isinstance(data, mmap.mmap) else None
+        self.data = memoryview(data)
+
+        if len(self.data) < INES_HEADER_SIZE or bytes(self.data[0:4]) != INES_MAGIC:
+            self.data.release()
+            raise ValueError(f"Not an iNES image: {path or '<memory>'}")
+
+        header = self.data[0:INES_HEADER_SIZE]
+        self.prg_banks = header[4]
+        self.chr_banks = header[5]
+        self.flags6 = header[6]
+        self.flags7 = header[7]
+        self.mirroring = self.flags6 & 0x01
+        self.has_battery = bool(self.flags6 & 0x02)
+        self.has_trainer = bool(self.flags6 & 0x04)
+        self.mapper = (self.flags7 & 0xF0) | (self.flags6 >> 4)
+        header.release()
+
+        self.prg_offset = INES_HEADER_SIZE + (TRAINER_SIZE if self.has_trainer else 0)
+        self.prg_size = self.prg_banks * PRG_BANK_SIZE
+        self.chr_offset = self.prg_offset + self.prg_size
+        self.chr_size = self.chr_banks * CHR_BANK_SIZE
+
+        if self.chr_offset + self.chr_size > len(self.data):
+            self.data.release()
+            raise ValueError(
+                f"Truncated iNES image: header declares {self.prg_banks} PRG / {self.chr_banks} CHR banks, "
+                f"file has {len(data)} bytes"
+            )
+
+    @classmethod
+    def open(cls, path: Path = DW4_ROM_PATH) -> "NesRom":
+        """Memory-map a ROM file read-only."""
+        path = Path(path)
+        if not path.exists():
+            raise FileNotFoundError(f"ROM not found: {path}")
+
+        f = open(path, "rb")
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                rom = cls(mm, path)
+            except Exception:
+                mm.close()                    # The constructor released its view on failure
+                raise
+        except Exception:
+            f.close()
+            raise
+        rom._file = f
+        return rom
+
+    def close(self):
+        """Release the mapping. Views handed out must be released first."""
+        self.data.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "NesRom":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    # ------------------------------------------------------------------
+    # Views
+    # ------------------------------------------------------------------
+
+    @property
+    def prg(self) -> memoryview:
+        """Whole PRG-ROM region."""
+        return self.data[self.prg_offset:self.prg_offset + self.prg_size]
+
+    @property
+    def chr(self) -> memoryview:
+        """Whole CHR-ROM region (empty for CHR-RAM carts)."""
+        return self.data[self.chr_offset:self.chr_offset + self.chr_size]
+
+    def prg_bank(self, bank: int) -> memoryview:
+        """Zero-copy view of one 16 KB PRG bank."""
+        if not 0 <= bank < self.prg_banks:
+            raise IndexError(f"PRG bank {bank} out of range (0-{self.prg_banks - 1})")
+        start = self.prg_offset + bank * PRG_BANK_SIZE
+        return self.data[start:start + PRG_BANK_SIZE]
+
+    def chr_bank(self, bank: int) -> memoryview:
+        """Zero-copy view of one 8 KB CHR bank."""
+        if not 0 <= bank < self.chr_banks:
+            raise IndexError(f"CHR bank {bank} out of range (0-{self.chr_banks - 1})")
+        start = self.chr_offset + bank * CHR_BANK_SIZE
+        return self.data[start:start + CHR_BANK_SIZE]
+
+    def iter_prg_banks(self) -> Iterator[memoryview]:
+        for bank in range(self.prg_banks):
+            yield self.prg_bank(bank)
+
+    def iter_chr_banks(self) -> Iterator[memoryview]:
+        for bank in range(self.chr_banks):
+            yield self.chr_bank(bank)
+
+    # ------------------------------------------------------------------
+    # Address mapping
+    # ------------------------------------------------------------------
+
+    def file_offset(self, bank: int, cpu_addr: int) -> int:
+        """Translate (PRG bank, CPU address) to a file offset.
+
+        Switchable banks are seen at $8000-$BFFF; $C000-$FFFF is only valid
+        for the last bank, which MMC1 keeps fixed there.
+        """
+        if not 0 <= bank < self.prg_banks:
+            raise IndexError(f"PRG bank {bank} out of range (0-{self.prg_banks - 1})")
+        if not PRG_CPU_BASE <= cpu_addr <= 0xFFFF:
+            raise ValueError(f"CPU address ${cpu_addr:04X} is not in PRG space ($8000-$FFFF)")
+        if cpu_addr >= PRG_FIXED_BASE and bank != self.prg_banks - 1:
+            raise ValueError(f"CPU address ${cpu_addr:04X} is in the fixed bank {self.prg_banks - 1} window "
+                             f"($C000-$FFFF), not bank {bank}; use $8000-$BFFF for switchable banks")
+        return self.prg_offset + bank * PRG_BANK_SIZE + (cpu_addr & (PRG_BANK_SIZE - 1))
+
+    def bank_address(self, offset: int) -> Tuple[int, int]:
+        """Translate a file offset inside PRG-ROM to (bank, CPU address in the $8000 window)."""
+        rel = offset - self.prg_offset
+        if not 0 <= rel < self.prg_size:
+            raise ValueError(f"File offset 0x{offset:06X} is not inside PRG-ROM")
+        return rel // PRG_BANK_SIZE, PRG_CPU_BASE + rel % PRG_BANK_SIZE
+
+    def read(self, bank: int, cpu_addr: int, size: int) -> memoryview:
+        """Zero-copy view of `size` bytes at (bank, CPU address)."""
+        start = self.file_offset(bank, cpu_addr)
+        if start + size > len(self.data):
+            raise ValueError(f"Read of {size} bytes at 0x{start:06X} runs past end of ROM")
+        return self.data[start:start + size]
+
+    def describe(self) -> str:
+        return (
+            f"PRG ROM: {self.prg_size} bytes ({self.prg_banks} x 16KB banks)\n"
+            f"CHR ROM: {self.chr_size} bytes ({self.chr_banks} x 8KB banks)\n"
+            f"Mapper: {self.mapper}, mirroring: {self.mirroring}, "
+            f"battery: {self.has_battery}, trainer: {self.has_trainer}"
+        )
+
+
+def format_location(rom: NesRom, offset: int) -> str:
+    """`0x01A2B2 (Bank 6 $A2A2)` style location string."""
+    try:
+        bank, cpu_addr = rom.bank_address(offset)
+    except ValueError:
+        return f"0x{offset:06X}"
+    return f"0x{offset:06X} (Bank {bank} ${cpu_addr:04X})"
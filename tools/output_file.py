@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Write-if-changed output files for the generators.
+
+An OutputFile streams into a temporary file next to its target (UTF-8, "\\n"
+newlines on every platform). On close the temporary file is hashed against
+the existing output: identical bytes leave the target and its mtime alone,
+different bytes replace it with one os.replace, so readers never see a
+half-written file. If generation fails the temporary file is discarded and
+the previous output is kept.
+
+Each close produces an OutputResult (created / changed / unchanged), which
+the pipeline uses to report whether anything downstream needs reassembling.
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Union
+
+from build_cache import hash_file
+
+BUFFER_SIZE = 1 << 16
+
+
+class OutputResult(NamedTuple):
+    path: Path
+    status: str                           # created / changed / unchanged
+    size: int
+
+    @property
+    def changed(self) -> bool:
+        return self.status != "unchanged"
+
+
+class OutputFile:
+    """File-like writer that only replaces path when the new content differs."""
+
+    def __init__(self, path: Union[str, Path], binary: bool = False, buffering: int = BUFFER_SIZE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        if binary:
+            self._file = open(self.tmp_path, "wb", buffering=buffering)
+        else:
+            self._file = open(self.tmp_path, "w", buffering=buffering, encoding="utf-8", newline="\n")
+        self.result: Optional[OutputResult] = None
+
+    @property
+    def name(self) -> str:
+        return str(self.path)
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def write(self, data) -> int:
+        return self._file.write(data)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self) -> OutputResult:
+        """Finish the file: replace the target if the bytes differ, otherwise drop the copy."""
+        if self.result is not None:
+            return self.result
+        self._file.close()
+        size = self.tmp_path.stat().st_size
+        try:
+            old_size = self.path.stat().st_size
+        except FileNotFoundError:
+            old_size = None
+
+        if old_size == size and hash_file(self.path) == hash_file(self.tmp_path):
+            self.tmp_path.unlink()
+            status = "unchanged"
+        else:
+            os.replace(self.tmp_path, self.path)
+            status = "created" if old_size is None else "changed"
+        self.result = OutputResult(self.path, status, size)
+        return self.result
+
+    def abort(self):
+        """Discard everything written; the existing output is left as it was."""
+        if not self._file.closed:
+            self._file.close()
+        try:
+            self.tmp_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "OutputFile":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_output(path: Union[str, Path], data: Union[str, bytes]) -> OutputResult:
+    """Write a whole text or binary file through OutputFile."""
+    with OutputFile(path, binary=isinstance(data, (bytes, bytearray))) as f:
+        f.write(data)
+    return f.result
+
+
+def changed_paths(results: List[OutputResult]) -> List[Path]:
+    return [r.path for r in results if r.changed]
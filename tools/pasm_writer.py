@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Streaming .pasm emitter.
+
+Generators write labels, directive rows and comments straight to a
+buffered text stream instead of collecting a list of lines and joining it,
+so memory stays flat no matter how large a table grows. Lines are
+separated exactly like "\\n".join(lines), which keeps output byte-identical
+to the list-based converters. In compact mode comments and blank lines are
+dropped and consecutive same-width fields share one directive. Files are
+written through OutputFile, so an unchanged table keeps its old mtime.
+
+IncbinWriter takes the same calls but packs the data into a raw .bin blob
+and writes a small .pasm stub (constants, table labels, .incbin), so the
+assembled bytes match the text form exactly. CaptureWriter packs the same
+way but keeps every row in memory (used by verify_rom_data.py).
+"""
+
+import io
+import struct
+from itertools import groupby
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, TextIO, Union
+
+from instrumentation import span
+from output_file import OutputFile, OutputResult, write_output
+from record_schema import DIRECTIVES, RecordSchema
+
+BUFFER_SIZE = 1 << 16
+BYTES_PER_LINE = 16
+
+
+class PasmWriter:
+    """Line-oriented .pasm writer over a text stream."""
+
+    def __init__(self, stream: TextIO, compact: bool = False, per_line: int = BYTES_PER_LINE):
+        self.stream = stream
+        self.compact = compact
+        self.per_line = per_line
+        self.lines = 0
+        self.outputs: List[OutputResult] = []   # Filled on close for files opened with open()
+        self._owns_stream = False
+
+    @classmethod
+    def open(cls, path: Union[str, Path], compact: bool = False, per_line: int = BYTES_PER_LINE) -> "PasmWriter":
+        """Open path for writing (parent directories are created, unchanged content is not rewritten)."""
+        writer = cls(OutputFile(path, buffering=BUFFER_SIZE), compact, per_line)
+        writer._owns_stream = True
+        return writer
+
+    def close(self):
+        with span("pasm.write", file=getattr(self.stream, "name", None)) as s:
+            self._close()
+            s.records = self.lines
+
+    def _close(self):
+        if self._owns_stream:
+            result = self.stream.close()
+            if isinstance(result, OutputResult):
+                self.outputs.append(result)
+        else:
+            self.stream.flush()
+
+    def __enter__(self) -> "PasmWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self._owns_stream and isinstance(self.stream, OutputFile):
+            self.stream.abort()  # Keep the previous output rather than a partial table
+        else:
+            self.close()
+
+    # ------------------------------------------------------------------
+    # Lines
+    # ------------------------------------------------------------------
+
+    def line(self, text: str = ""):
+        """Raw line. Separators go before every line but the first, like str.join."""
+        if self.lines:
+            self.stream.write("\n")
+        self.stream.write(text)
+        self.lines += 1
+
+    def blank(self):
+        if not self.compact:
+            self.line()
+
+    def comment(self, text: str):
+        if not self.compact:
+            self.line(f"; {text}" if text else ";")
+
+    def banner(self, title: str, *texts: str):
+        """Comment header: ruled title followed by description lines."""
+        if self.compact:
+            return
+        rule = "; " + "=" * 76
+        self.line(rule)
+        self.comment(title)
+        self.line(rule)
+        for text in texts:
+            self.comment(text)
+        self.line(rule)
+
+    def const(self, name: str, value: str):
+        """`NAME = value` (value already formatted, e.g. "$32")."""
+        self.line(f"{name} = {value}")
+
+    def label(self, name: str, inline: Optional[str] = None, comment: Optional[str] = None):
+        """`name:` optionally followed by a directive and a trailing comment on the same line."""
+        text = f"{name}:"
+        if inline:
+            text += f" {inline}"
+        if comment is not None and not self.compact:
+            text += f" ; {comment}"
+        self.line(text)
+
+    def row(self, name: str, schema: RecordSchema, row: Sequence, comment: Optional[str] = None,
+            upper: bool = False):
+        """Labelled one-line record: `name: .byte $01, $02 ; comment`."""
+        self.label(name, schema.pasm_inline(row, upper), comment)
+
+    # ------------------------------------------------------------------
+    # Directives
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def format_values(code: str, values: Iterable[int], upper: bool = False) -> str:
+        """`.byte $01, $02` / `.word $0001` for a run of values."""
+        directive, width = DIRECTIVES[code]
+        hex_fmt = f"0{width}{'X' if upper else 'x'}"
+        return f"{directive} " + ", ".join(f"${v:{hex_fmt}}" for v in values)
+
+    def directive(self, code: str, values: Sequence[int], comment: Optional[str] = None, upper: bool = False):
+        """One indented directive row with an optional `\\t\\t; comment`."""
+        text = "\t" + self.format_values(code, values, upper)
+        if comment and not self.compact:
+            text += f"\t\t; {comment}"
+        self.line(text)
+
+    def data(self, code: str, values: Iterable[int], upper: bool = False):
+        """Stream any number of values, per_line values per directive."""
+        batch = []
+        for value in values:
+            batch.append(value)
+            if len(batch) == self.per_line:
+                self.directive(code, batch, upper=upper)
+                batch = []
+        if batch:
+            self.directive(code, batch, upper=upper)
+
+    def record(self, schema: RecordSchema, row: Sequence, upper: bool = False, comments=True):
+        """One record: schema.pasm_block rows, or one directive per same-width run when compact."""
+        if not self.compact:
+            for text in schema.pasm_block(row, upper, comments):
+                self.line(text)
+            return
+
+        def flat():
+            for f, value in zip(schema.value_fields, row):
+                if f.is_int:
+                    yield f.code, value
+                else:
+                    yield from (("B", b) for b in value)
+
+        for code, group in groupby(flat(), key=lambda item: item[0]):
+            self.directive(code, [value for _, value in group], upper=upper)
+
+
+class IncbinWriter(PasmWriter):
+    """PasmWriter that packs data into a .bin blob next to a tiny .pasm stub.
+
+    Comments and free-form lines are dropped. Upper-case labels (tables,
+    e.g. MONSTER_TABLE) are kept: the one at offset 0 precedes the .incbin,
+    ones at the end follow it and any in between become `NAME = START + $n`.
+    A missing XXX_TABLE_END label is added. Lower-case per-row labels
+    (monster_00) are dropped.
+    """
+
+    def __init__(self, stream: TextIO, blob_path: Path, include_path: str):
+        super().__init__(stream, compact=True)
+        self.blob_path = Path(blob_path)
+        self.include_path = include_path
+        self.blob = bytearray()
+        self.consts = []
+        self.labels = []
+        self.row_labels = 0
+
+    @classmethod
+    def open(cls, path: Union[str, Path], include_dir: str = "data") -> "IncbinWriter":
+        """Stub at path, blob at path with a .bin suffix (included as include_dir/<name>.bin)."""
+        path = Path(path)
+        blob_path = path.with_suffix(".bin")
+        include_path = f"{include_dir}/{blob_path.name}" if include_dir else blob_path.name
+        writer = cls(OutputFile(path, buffering=BUFFER_SIZE), blob_path, include_path)
+        writer._owns_stream = True
+        return writer
+
+    def _close(self):
+        if not self.stream.closed:
+            self.outputs.append(write_output(self.blob_path, bytes(self.blob)))
+            self._write_stub()
+        super()._close()
+
+    def _write_stub(self):
+        size = len(self.blob)
+        start = [name for name, offset in self.labels if offset == 0]
+        end = [name for name, offset in self.labels if offset == size and offset]
+        middle = [(name, offset) for name, offset in self.labels if 0 < offset < size]
+        if start and not end and start[-1].endswith("_TABLE"):
+            end = [f"{start[-1]}_END"]
+        if middle and not start:
+            raise ValueError(f"{self.blob_path.name}: inner labels need a start label")
+
+        PasmWriter.line(self, f"; Binary table: {size} bytes in {self.blob_path.name} (generated, do not edit)")
+        for name, value in self.consts:
+            PasmWriter.line(self, f"{name} = {value}")
+        PasmWriter.line(self)
+        for name in start:
+            PasmWriter.line(self, f"{name}:")
+        PasmWriter.line(self, f'\t.incbin "{self.include_path}"')
+        for name in end:
+            PasmWriter.line(self, f"{name}:")
+        for name, offset in middle:
+            PasmWriter.line(self, f"{name} = {start[0]} + ${offset:04x}")
+        PasmWriter.line(self)
+
+    # Text is not emitted until close(); only data, constants and table labels are kept
+
+    def line(self, text: str = ""):
+        pass
+
+    def const(self, name: str, value: str):
+        self.consts.append((name, value))
+
+    def label(self, name: str, inline: Optional[str] = None, comment: Optional[str] = None):
+        if inline is not None:
+            raise ValueError(f"{name}: inline directive text cannot be packed, use row()")
+        if name.isupper():
+            self.labels.append((name, len(self.blob)))
+        else:
+            self.row_labels += 1
+
+    def row(self, name: str, schema: RecordSchema, row: Sequence, comment: Optional[str] = None,
+            upper: bool = False):
+        self.label(name)
+        self.blob += schema.struct.pack(*row)
+
+    def directive(self, code: str, values: Sequence[int], comment: Optional[str] = None, upper: bool = False):
+        self.blob += struct.pack(f"<{len(values)}{code}", *values)
+
+    def record(self, schema: RecordSchema, row: Sequence, upper: bool = False, comments=True):
+        self.blob += schema.struct.pack(*row)
+
+
+class CapturedRow(NamedTuple):
+    label: str                          # Row label (monster_1A), or the table label for unlabelled data
+    offset: int                         # Byte offset from the first table label
+    schema: Optional[RecordSchema]      # None for raw .byte/.word runs
+    values: tuple                       # Schema row, or the raw values
+    code: str = ""                      # Struct code of raw values ("B" / "H")
+
+    @property
+    def size(self) -> int:
+        if self.schema is not None:
+            return self.schema.size
+        return struct.calcsize(f"<{len(self.values)}{self.code}")
+
+
+class CaptureWriter(PasmWriter):
+    """PasmWriter that keeps every emitted row in memory instead of writing text.
+
+    Packs data exactly like IncbinWriter, and also records each row's label,
+    schema, values and offset, so a converter's emitter can serve as the
+    expected side of a ROM check.
+    """
+
+    def __init__(self):
+        super().__init__(io.StringIO(), compact=True)
+        self.blob = bytearray()
+        self.labels: Dict[str, int] = {}
+        self.rows: List[CapturedRow] = []
+        self._current = ""
+
+    def line(self, text: str = ""):
+        pass
+
+    def const(self, name: str, value: str):
+        pass
+
+    def label(self, name: str, inline: Optional[str] = None, comment: Optional[str] = None):
+        if inline is not None:
+            raise ValueError(f"{name}: inline directive text cannot be captured, use row()")
+        if name.isupper():
+            self.labels[name] = len(self.blob)
+        self._current = name
+
+    def _add(self, schema: Optional[RecordSchema], values: Sequence, code: str = ""):
+        row = CapturedRow(self._current, len(self.blob), schema, tuple(values), code)
+        self.rows.append(row)
+        if schema is not None:
+            self.blob += schema.struct.pack(*row.values)
+        else:
+            self.blob += struct.pack(f"<{len(row.values)}{code}", *row.values)
+
+    def row(self, name: str, schema: RecordSchema, row: Sequence, comment: Optional[str] = None,
+            upper: bool = False):
+        self.label(name)
+        self._add(schema, row)
+
+    def directive(self, code: str, values: Sequence[int], comment: Optional[str] = None, upper: bool = False):
+        self._add(None, values, code)
+
+    def data(self, code: str, values: Iterable[int], upper: bool = False):
+        self._add(None, list(values), code)
+
+    def record(self, schema: RecordSchema, row: Sequence, upper: bool = False, comments=True):
+        self._add(schema, row)
+
+
+def open_pasm(path: Union[str, Path], compact: bool = False, incbin: bool = False) -> PasmWriter:
+    """Text writer, or .pasm stub + .bin blob writer when incbin is set."""
+    return IncbinWriter.open(path) if incbin else PasmWriter.open(path, compact)
+
+
+def output_files(path: Union[str, Path], incbin: bool = False) -> List[Path]:
+    """Files a writer opened for path produces."""
+    path = Path(path)
+    return [path, path.with_suffix(".bin")] if incbin else [path]
+
+
+def write_pasm(path: Union[str, Path], emit: Callable[..., object], *args, compact: bool = False,
+               incbin: bool = False):
+    """Stream emit(writer, *args) to path; returns whatever emit returns."""
+    with open_pasm(path, compact, incbin) as w:
+        return emit(w, *args)
+
+
+def pasm_text(emit: Callable[..., object], *args, compact: bool = False) -> str:
+    """Render emit(writer, *args) to a string (for previews and comparisons)."""
+    buf = io.StringIO()
+    emit(PasmWriter(buf, compact), *args)
+    return buf.getvalue()
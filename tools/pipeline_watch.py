@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Watch mode for dq4r_pipeline.py: rebuild only the stages whose JSON changed.
+
+The dependency graph comes straight from each stage's inputs (items.json ->
+items and shops, shops.json -> shops, monster_*.json -> monsters, ...).
+Every poll stats the watched files and re-lists glob inputs, so new and
+deleted monster files are seen too. Changes are collected until nothing
+has changed for the debounce window (editors often write a file in several
+steps), then the affected stages run through the normal build cache.
+
+Polling is used instead of inotify / ReadDirectoryChangesW so the same code
+works on every platform; a stat of a few dozen files every 100ms is cheap.
+"""
+
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+POLL_INTERVAL = 0.1
+DEBOUNCE = 0.25
+
+FileState = Optional[Tuple[int, int]]  # (size, mtime_ns), None while missing
+
+
+def file_state(path: Path) -> FileState:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def dependency_graph(stages: Sequence) -> Dict[Path, List[str]]:
+    """Input file -> names of the stages that read it (in stage order)."""
+    graph: Dict[Path, List[str]] = {}
+    for stage in stages:
+        for path in stage.inputs():
+            names = graph.setdefault(Path(path).resolve(), [])
+            if stage.name not in names:
+                names.append(stage.name)
+    return graph
+
+
+def format_graph(graph: Dict[Path, List[str]]) -> List[str]:
+    """One line per input file; a directory of inputs feeding the same stages is one line."""
+    groups: Dict[Tuple[Path, Tuple[str, ...]], List[Path]] = {}
+    for path, names in graph.items():
+        groups.setdefault((path.parent, tuple(names)), []).append(path)
+    lines = []
+    for (parent, names), paths in groups.items():
+        source = str(paths[0]) if len(paths) == 1 else f"{parent} ({len(paths)} files)"
+        lines.append(f"{source} -> {', '.join(names)}")
+    return lines
+
+
+class InputWatcher:
+    """Polls the inputs of a set of stages and reports which stages changed."""
+
+    def __init__(self, stages: Sequence):
+        self.stages = list(stages)
+        self.graph: Dict[Path, List[str]] = {}
+        self.states: Dict[Path, FileState] = {}
+        self.inputs: Dict[str, Set[Path]] = {}
+        self.snapshot()
+
+    def snapshot(self):
+        self.graph = dependency_graph(self.stages)
+        self.inputs = {s.name: {Path(p).resolve() for p in s.inputs()} for s in self.stages}
+        self.states = {path: file_state(path) for path in self.graph}
+
+    def changed(self) -> Set[str]:
+        """Stages with an input that was modified, added or removed since the last call."""
+        affected: Set[str] = set()
+        for path, state in self.states.items():
+            if file_state(path) != state:
+                affected.update(self.graph[path])
+        for stage in self.stages:
+            current = {Path(p).resolve() for p in stage.inputs()}
+            if current != self.inputs.get(stage.name):
+                affected.add(stage.name)
+        if affected:
+            self.snapshot()
+        return affected
+
+
+def watch(stages: Sequence, run: Callable[[List], object], interval: float = POLL_INTERVAL,
+          debounce: float = DEBOUNCE, log: Callable[[str], None] = print):
+    """Poll until interrupted; run(stages) with just the affected stages after each settled change."""
+    watcher = InputWatcher(stages)
+    log(f"Watching {len(watcher.graph)} input files (poll {interval * 1000:.0f}ms, "
+        f"debounce {debounce * 1000:.0f}ms), Ctrl+C to stop")
+    for line in format_graph(watcher.graph):
+        log(f"  {line}")
+
+    pending: Set[str] = set()
+    last_change = 0.0
+    try:
+        while True:
+            time.sleep(interval)
+            changed = watcher.changed()
+            now = time.perf_counter()
+            if changed:
+                pending |= changed
+                last_change = now
+                continue
+            if pending and now - last_change >= debounce:
+                batch = [s for s in stages if s.name in pending]
+                pending.clear()
+                log(f"\nChanged: {', '.join(s.name for s in batch)}")
+                run(batch)
+    except KeyboardInterrupt:
+        log("\nWatch stopped")
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Declarative record layouts shared by the extractors and converters.
+
+Each RecordSchema compiles its fields once into a struct.Struct and
+derives everything else from that: bulk decode (iter_unpack), bulk
+encode (pack_into a preallocated bytearray), column views, and the
+matching .pasm rows. Adding a field to a layout is one edit here.
+"""
+
+import struct
+from operator import attrgetter, itemgetter
+from typing import Any, Dict, Iterable, Iterator, NamedTuple, Optional, Sequence, Tuple
+
+DIRECTIVES = {"B": (".byte", 2), "H": (".word", 4)}
+
+
+def safe_int(val, default=0):
+    """Safely convert value to int, handling hex strings."""
+    if val is None:
+        return default
+    if isinstance(val, int):
+        return val
+    if isinstance(val, str):
+        try:
+            return int(val, 16) if val.startswith('0x') else int(val)
+        except ValueError:
+            return default
+    return default
+
+
+class Field(NamedTuple):
+    """One record field.
+
+    code:    struct code ("B", "H", "6s", "14x", ...)
+    source:  key / attribute the value comes from (defaults to name)
+    comment: .pasm comment template, formatted with the value ("HP {}")
+    """
+    name: str
+    code: str
+    source: Optional[str] = None
+    comment: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        return self.source or self.name
+
+    @property
+    def is_int(self) -> bool:
+        return self.code in DIRECTIVES
+
+    @property
+    def is_padding(self) -> bool:
+        return self.code.endswith("x")
+
+
+class RecordSchema:
+    """Fixed-size little-endian record layout compiled to a struct.Struct."""
+
+    def __init__(self, name: str, fields: Sequence[Field], size: Optional[int] = None):
+        self.name = name
+        self.fields = tuple(fields)
+        self.struct = struct.Struct("<" + "".join(f.code for f in self.fields))
+        self.size = self.struct.size
+        if size is not None and size != self.size:
+            raise ValueError(f"{name}: fields pack to {self.size} bytes, expected {size}")
+
+        # Padding fields take no value
+        self.value_fields = tuple(f for f in self.fields if not f.is_padding)
+        self.names = tuple(f.name for f in self.value_fields)
+        self.offsets: Dict[str, int] = {}
+        offset = 0
+        for f in self.fields:
+            self.offsets[f.name] = offset
+            offset += struct.calcsize("<" + f.code)
+
+        masks = [(1 << (8 * struct.calcsize("<" + f.code))) - 1 if f.is_int else None for f in self.value_fields]
+        self._masks = masks
+        keys = tuple(f.key for f in self.value_fields)
+        self._items = itemgetter(*keys) if len(keys) > 1 else (lambda obj, _k=keys[0]: (obj[_k],))
+        names = self.names
+        self._attrs = attrgetter(*names) if len(names) > 1 else (lambda obj, _k=names[0]: (getattr(obj, _k),))
+
+    def __repr__(self) -> str:
+        return f"RecordSchema({self.name!r}, {self.size} bytes)"
+
+    # ------------------------------------------------------------------
+    # Row extraction
+    # ------------------------------------------------------------------
+
+    def row_from_json(self, obj: Dict[str, Any]) -> Tuple:
+        """Value tuple from a JSON dict (safe_int + masked to field width)."""
+        return tuple(
+            safe_int(obj.get(f.key)) & mask if mask is not None else obj.get(f.key, b"")
+            for f, mask in zip(self.value_fields, self._masks)
+        )
+
+    def row_from_attrs(self, obj: Any) -> Tuple:
+        """Value tuple from attributes named like the fields (e.g. a DW4Monster row)."""
+        return self._attrs(obj)
+
+    def row_from_items(self, obj: Any) -> Tuple:
+        """Value tuple from a mapping keyed by field sources, without conversion."""
+        return self._items(obj)
+
+    # ------------------------------------------------------------------
+    # Binary codec
+    # ------------------------------------------------------------------
+
+    def unpack_all(self, data) -> Iterator[Tuple]:
+        """Decode every whole record in data."""
+        usable = len(data) - len(data) % self.size
+        return self.struct.iter_unpack(memoryview(data)[:usable])
+
+    def columns(self, data) -> Dict[str, Tuple]:
+        """Decode data into {field: tuple of values}."""
+        rows = list(self.unpack_all(data))
+        if not rows:
+            return {name: () for name in self.names}
+        return dict(zip(self.names, zip(*rows)))
+
+    def pack_all(self, rows: Iterable[Sequence], count: Optional[int] = None) -> bytearray:
+        """Encode rows into one preallocated bytearray."""
+        if count is None:
+            rows = rows if isinstance(rows, (list, tuple)) else list(rows)
+            count = len(rows)
+        out = bytearray(count * self.size)
+        pack_into = self.struct.pack_into
+        offset = 0
+        for row in rows:
+            pack_into(out, offset, *row)
+            offset += self.size
+        if offset != len(out):
+            raise ValueError(f"{self.name}: expected {count} rows, got {offset // self.size}")
+        return out
+
+    # ------------------------------------------------------------------
+    # .pasm emission
+    # ------------------------------------------------------------------
+
+    def _directive(self, f: Field, value, upper: bool) -> str:
+        if f.is_int:
+            directive, width = DIRECTIVES[f.code]
+            return f"{directive} ${value:0{width}{'X' if upper else 'x'}}"
+        hex_fmt = "02X" if upper else "02x"
+        return ".byte " + ", ".join(f"${b:{hex_fmt}}" for b in value)
+
+    def pasm_block(self, row: Sequence, upper: bool = False, comments=True) -> Iterator[str]:
+        """One directive line per field.
+
+        comments: True for the field comments, False for none, or a
+        sequence of templates overriding them.
+        """
+        if comments is True:
+            templates = [f.comment for f in self.value_fields]
+        elif comments:
+            templates = list(comments)
+        else:
+            templates = [None] * len(self.value_fields)
+        for f, value, template in zip(self.value_fields, row, templates):
+            line = "\t" + self._directive(f, value, upper)
+            if template:
+                line += "\t\t; " + template.format(value)
+            yield line
+
+    def pasm_inline(self, row: Sequence, upper: bool = False) -> str:
+        """All fields on one directive (`.byte $01, $02, ...`)."""
+        kinds = {f.code for f in self.value_fields}
+        if len(kinds) != 1 or not kinds <= set(DIRECTIVES):
+            raise ValueError(f"{self.name}: inline rows need a single field width")
+        directive, width = DIRECTIVES[kinds.pop()]
+        hex_fmt = f"0{width}{'X' if upper else 'x'}"
+        return f"{directive} " + ", ".join(f"${v:{hex_fmt}}" for v in row)
+
+
+# ----------------------------------------------------------------------
+# DW4 NES layouts
+# ----------------------------------------------------------------------
+
+DW4_MONSTER = RecordSchema("dw4_monster", [
+    Field("exp", "H"),
+    Field("gold", "H"),
+    Field("hp", "H"),
+    Field("atk", "B"),
+    Field("def_", "B"),
+    Field("agi", "B"),
+    Field("skill_data", "6s"),
+    Field("behavior_data", "4s"),
+    Field("drop_id", "B"),
+    Field("unknown20", "B"),
+    Field("unknown21", "B"),
+    Field("metal_flags", "B"),
+    Field("drop_rate_flags", "B"),
+    Field("status_vulnerability", "B"),
+    Field("unknown25", "B"),
+    Field("unknown26", "B"),
+], size=27)
+
+# ----------------------------------------------------------------------
+# DQ3r / DQ4r SNES layouts
+# ----------------------------------------------------------------------
+
+# Placeholder until the DQ3r disassembly confirms the real layout
+DQ3R_MONSTER = RecordSchema("dq3r_monster", [
+    Field("hp", "H"),
+    Field("exp", "H"),
+    Field("gold", "H"),
+    Field("atk", "B"),
+    Field("def_", "B"),
+    Field("agi", "B"),
+    Field("drop_id", "B"),
+    Field("skill_data", "6s"),
+    Field("behavior_head", "2s"),
+    Field("reserved", "14x"),
+], size=32)
+
+# MONSTER_TABLE row: HP(2) EXP(2) Gold(2) ATK(1) DEF(1) AGI(1) Drop(1) Rate(1)
+MONSTER = RecordSchema("monster", [
+    Field("hp", "H", "hp", "HP {}"),
+    Field("exp", "H", "exp", "Experience {}"),
+    Field("gold", "H", "gold", "Gold {}"),
+    Field("atk", "B", "attack", "Attack {}"),
+    Field("def_", "B", "defense", "Defense {}"),
+    Field("agi", "B", "agility", "Agility {}"),
+    Field("drop_id", "B", "drop_item_id", "Drop Item"),
+    Field("drop_rate_flags", "B", "drop_rate", "Drop Rate"),
+], size=11)
+
+# ITEM_TABLE row: Price(2) Type/Flags(1)
+ITEM = RecordSchema("item", [
+    Field("price", "H", "price", "Price {}"),
+    Field("flags", "B", "type", "Type/Flags {}"),
+], size=3)
+
+# ITEM_TABLE row as emitted by items_shops_simple: Price(2)
+ITEM_PRICE = RecordSchema("item_price", [
+    Field("price", "H", "price"),
+], size=2)
+
+# ITEM_TABLE row as emitted by json_to_pasm: ID(1) Price(2) Flags(1)
+ITEM_WITH_ID = RecordSchema("item_with_id", [
+    Field("id", "B", "id", "ID"),
+    Field("price", "H", "price", "Price"),
+    Field("flags", "B", "flags", "Flags"),
+], size=4)
+
+# SHOP_TABLE entry header: Type(1) ItemCount(1), followed by item IDs and $ff
+SHOP_HEADER = RecordSchema("shop_header", [
+    Field("shop_type", "B", "shop_type", "Shop type"),
+    Field("item_count", "B", "item_count", "Item count"),
+], size=2)
+
+# SHOP_TABLE row of the interned layout: Type(1) InventoryOffset(2)
+SHOP_ENTRY = RecordSchema("shop_entry", [
+    Field("shop_type", "B", "shop_type", "Shop type"),
+    Field("inventory", "H", "inventory", "Inventory offset"),
+], size=3)
+
+# SHOP_TABLE row as emitted by items_shops_simple: Type(1)
+SHOP_TYPE = RecordSchema("shop_type", [
+    Field("shop_type", "B", "shop_type"),
+], size=1)
+
+# SPELL_TABLE row
+SPELL = RecordSchema("spell", [
+    Field("mp_cost", "B"),
+    Field("effect_type", "B"),
+    Field("power", "B"),
+    Field("target_type", "B"),
+    Field("element", "B"),
+    Field("accuracy", "B"),
+], size=6)
+
+# ENCOUNTER_TABLE row: up to 6 monster IDs, zero padded
+ENCOUNTER_SLOTS = 6
+ENCOUNTER = RecordSchema("encounter", [
+    Field(f"monster{i}", "B") for i in range(ENCOUNTER_SLOTS)
+], size=6)
+
+# CHARACTER_TABLE row
+CHARACTER = RecordSchema("character", [
+    Field("id", "B"),
+    Field("chapter", "B", "playable_chapter"),
+], size=2)
+
+SCHEMAS = {s.name: s for s in (
+    DW4_MONSTER, DQ3R_MONSTER, MONSTER, ITEM, ITEM_PRICE, ITEM_WITH_ID,
+    SHOP_HEADER, SHOP_ENTRY, SHOP_TYPE, SPELL, ENCOUNTER, CHARACTER,
+)}
@@ -1,68 +1,48 @@
 #!/usr/bin/env python3
-"""Find actual DW4 monster table by pattern scanning."""
+"""Find actual DW4 monster table (or other record tables) by sequence scanning."""
 
-import struct
-from pathlib import Path
+import argparse
+import time
+from typing import List
 
-ROM_PATH = Path("C:\\Users\\me\\source\\repos\\dragon-warrior-4-info\\roms\\Dragon Warrior IV (1992-10)(Enix)(US).nes")
+from nes_rom import NesRom, DW4_ROM_PATH as ROM_PATH
+from table_scanner import SCHEMAS, MONSTER_SCAN, TableCandidate, scan_rom
 
-def scan_for_monster_table(rom: bytes) -> list:
-    """Scan ROM for likely monster table starts."""
-    candidates = []
-    
-    # Look for patterns: 4-byte LE number (could be EXP), followed by reasonable values
-    # Typical first monster: low EXP, low gold, 4-50 HP
-    for offset in range(len(rom) - 100):
-        # Try to read as 27-byte monster record
-        if offset + 27 > len(rom):
-            break
-        
-        record = rom[offset:offset + 27]
-        exp = struct.unpack_from('<H', record, 0)[0]
-        gold = struct.unpack_from('<H', record, 2)[0]
-        hp = struct.unpack_from('<H', record, 4)[0]
-        atk = record[6]
-        def_ = record[7]
-        agi = record[8]
-        
-        # Sanity checks: reasonable game stats
-        if (1 <= hp <= 300 and 0 <= atk <= 255 and 0 <= def_ <= 255 and
-            0 <= agi <= 50 and 1 <= exp <= 5000 and 1 <= gold <= 5000):
-            candidates.append({
-                'offset': offset,
-                'hp': hp, 'exp': exp, 'gold': gold,
-                'atk': atk, 'def': def_, 'agi': agi
-            })
-    
-    return candidates
+def scan_for_monster_table(rom: NesRom, min_run: int = None) -> List[TableCandidate]:
+    """Scan PRG-ROM for runs of plausible 27-byte monster records, best first."""
+    return scan_rom(rom, MONSTER_SCAN, min_run)
 
 def main():
-    with open(ROM_PATH, "rb") as f:
-        rom = f.read()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rom", default=str(ROM_PATH), help="NES ROM path")
+    parser.add_argument("--schema", choices=sorted(SCHEMAS), default="monster", help="Record schema to hunt for")
+    parser.add_argument("--min-run", type=int, default=None, help="Minimum consecutive plausible records")
+    parser.add_argument("--top", type=int, default=20, help="Number of candidates to print")
+    args = parser.parse_args()
     
-    print(f"Scanning {len(rom)} byte ROM for monster table...")
-    candidates = scan_for_monster_table(rom)
-    
-    print(f"\nFound {len(candidates)} candidate offsets:")
-    for c in candidates[:20]:
-        bank = (c['offset'] - 0x10) // 0x4000
-        bank_ofs = (c['offset'] - 0x10) % 0x4000
-        cpu_addr = bank_ofs + 0x8000
-        print(f"  0x{c['offset']:06X} (Bank {bank} ${cpu_addr:04X}): "
-              f"HP={c['hp']:3d} ATK={c['atk']:2d} DEF={c['def']:2d} EXP={c['exp']:4d} Gold={c['gold']:4d}")
-    
-    # Check if any form a sequence (good sign for table start)
-    if candidates:
-        print(f"\nChecking first candidate for sequence...")
-        start = candidates[0]['offset']
-        for i in range(10):
-            offset = start + (i * 27)
-            if offset + 27 > len(rom):
-                break
-            record = rom[offset:offset + 27]
-            hp = struct.unpack_from('<H', record, 4)[0]
-            atk = record[6]
-            print(f"  Record {i}: 0x{offset:06X} - HP={hp:3d} ATK={atk:2d}")
+    schema = SCHEMAS[args.schema]
+    with NesRom.open(args.rom) as rom:
+        print(f"Scanning {rom.prg_size} bytes of PRG-ROM for {schema.name} tables "
+              f"({schema.record.size}-byte records)...")
+        start = time.perf_counter()
+        candidates = scan_rom(rom, schema, args.min_run)
+        elapsed = time.perf_counter() - start
+        
+        print(f"\nFound {len(candidates)} candidate tables in {elapsed:.3f}s:")
+        for c in candidates[:args.top]:
+            print(f"  0x{c.offset:06X} (Bank {c.bank} ${c.cpu_addr:04X}): "
+                  f"{c.count:4d} records, {c.distinct:4d} distinct")
+        
+        # Show the head of the best candidate
+        if candidates:
+            best = candidates[0]
+            print(f"\nFirst records of best candidate:")
+            fields = schema.fields
+            for i in range(min(10, best.count)):
+                offset = best.offset + i * schema.record.size
+                values = dict(zip(fields, schema.record.unpack_from(rom.data, offset)))
+                shown = " ".join(f"{name}={values[name]}" for name in schema.ranges)
+                print(f"  Record {i}: 0x{offset:06X} - {shown}")
 
 if __name__ == "__main__":
     main()
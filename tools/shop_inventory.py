@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Interned shop inventories.
+
+Many shops stock a suffix of another shop's list (shop_01 = shop_00 minus
+its first item). Every distinct $ff-terminated list is stored once, and a
+list that is a suffix of an already stored one just points into it. Next
+to the lists each shop gets an item bitset so "does this shop stock item
+X" is one indexed bit test:
+
+    SHOP_BITSETS[shop * SHOP_BITSET_SIZE + (X >> 3)] & (1 << (X & 7))
+"""
+
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+from instrumentation import traced
+
+LIST_END = 0xFF
+BITSET_BYTES = 16  # 128 items; doubled when a shop stocks an ID >= $80
+
+
+class InternedInventories(NamedTuple):
+    data: bytes              # Terminated item lists, suffixes shared
+    offsets: List[int]       # Per shop: offset of its list in data
+    unique: int              # Distinct lists stored in full
+    raw_size: int            # Bytes of one terminated list per shop
+
+    @property
+    def saved(self) -> int:
+        return self.raw_size - len(self.data)
+
+
+@traced("shops.intern", records=lambda interned: len(interned.offsets))
+def intern_inventories(lists: Sequence[Sequence[int]]) -> InternedInventories:
+    """Store each distinct list once, reusing the tail of longer lists for suffixes."""
+    keys = [tuple(items) for items in lists]
+    if any(LIST_END in k for k in keys):
+        raise ValueError(f"Item ID ${LIST_END:02X} is reserved as the list terminator")
+
+    data = bytearray()
+    suffix_offset: Dict[Tuple[int, ...], int] = {}
+    unique = 0
+    for key in sorted(dict.fromkeys(keys), key=len, reverse=True):  # Ties keep first-seen order
+        if key in suffix_offset:
+            continue
+        start = len(data)
+        data += bytes(key) + bytes([LIST_END])
+        unique += 1
+        for i in range(len(key) + 1):
+            suffix_offset.setdefault(key[i:], start + i)
+
+    raw_size = sum(len(k) + 1 for k in keys)
+    return InternedInventories(bytes(data), [suffix_offset[k] for k in keys], unique, raw_size)
+
+
+def bitset_size(lists: Sequence[Sequence[int]]) -> int:
+    """Bytes per shop bitset: 16, or the next power of two that covers every ID."""
+    highest = max((max(items) for items in lists if items), default=0)
+    size = BITSET_BYTES
+    while highest >= size * 8:
+        size *= 2
+    return size
+
+
+def item_bitset(items: Sequence[int], size: int = BITSET_BYTES) -> bytes:
+    """Bit (id & 7) of byte (id >> 3) set for every item id."""
+    bits = 0
+    for item in items:
+        bits |= 1 << item
+    return bits.to_bytes(size, "little")
+
+
+def format_report(interned: InternedInventories, shops: int, bitset_bytes: int) -> str:
+    return (
+        f"Shop inventories: {shops} shops, {interned.unique} stored lists\n"
+        f"  One list per shop: {interned.raw_size} bytes\n"
+        f"  Interned lists:    {len(interned.data)} bytes (saved {interned.saved})\n"
+        f"  Bitsets:           {shops * bitset_bytes} bytes ({bitset_bytes} per shop)"
+    )
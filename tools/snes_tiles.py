@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+SNES tile packing, flip-aware deduplication and tilemap entries (NumPy).
+
+Tiles are handled as one (N, 8, 8) uint8 array of color indices, so packing
+a whole tileset into bitplanes is a handful of array operations instead of
+a loop per pixel. SNES planar tiles store two bitplanes per row pair:
+
+    2bpp  16 bytes   row 0 plane 0, row 0 plane 1, ... row 7 plane 1
+    4bpp  32 bytes   the 2bpp block for planes 0-1, then the same for planes 2-3
+
+Deduplication treats a tile and its H, V and HV mirrors as one tile, since
+the tilemap can flip it back for free. Tilemap words use the BG layout:
+
+    vhopppcc cccccccc   v/h flip, o priority, ppp palette, c tile number (0-1023)
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+TILE_SIZE = 8
+MAX_TILES = 0x400               # 10-bit tile number in a tilemap entry
+MAX_PALETTES = 8                # 3-bit palette field
+TILE_MASK = 0x03FF
+PALETTE_SHIFT = 10
+PRIORITY = 0x2000
+H_FLIP = 0x4000
+V_FLIP = 0x8000
+
+# Flip codes used by dedupe_tiles: bit 0 = horizontal, bit 1 = vertical
+FLIP_NONE, FLIP_H, FLIP_V, FLIP_HV = range(4)
+
+
+class TileSet(NamedTuple):
+    tiles: np.ndarray                         # (U, 8, 8) unique tiles, in first-use order
+    index: np.ndarray                         # Tile number per source tile
+    flips: np.ndarray                         # FLIP_* per source tile (source = stored tile flipped)
+
+    @property
+    def flipped(self) -> int:
+        """Source tiles that reuse a stored tile through a mirror."""
+        return int(np.count_nonzero(self.flips))
+
+
+def tile_bytes(bpp: int) -> int:
+    return TILE_SIZE * bpp
+
+
+def split_tiles(pixels: np.ndarray) -> np.ndarray:
+    """(H, W) index image -> (H/8 * W/8, 8, 8) tiles in row-major tilemap order."""
+    height, width = pixels.shape
+    if height % TILE_SIZE or width % TILE_SIZE:
+        raise ValueError(f"{width}x{height} is not a multiple of {TILE_SIZE} pixels")
+    rows, cols = height // TILE_SIZE, width // TILE_SIZE
+    return (pixels.reshape(rows, TILE_SIZE, cols, TILE_SIZE)
+            .swapaxes(1, 2)
+            .reshape(rows * cols, TILE_SIZE, TILE_SIZE))
+
+
+def pack_planar(tiles: np.ndarray, bpp: int = 4) -> bytes:
+    """SNES planar tile data for (N, 8, 8) color indices below 1 << bpp."""
+    if bpp not in (2, 4, 8):
+        raise ValueError(f"Unsupported depth {bpp}bpp")
+    tiles = np.asarray(tiles, dtype=np.uint8)
+    if tiles.size and int(tiles.max()) >> bpp:
+        raise ValueError(f"Color index {int(tiles.max())} does not fit in {bpp}bpp")
+    n = len(tiles)
+    # (N, 8 rows, bpp planes, 8 pixels) bits -> one byte per row and plane, leftmost pixel = bit 7
+    bits = (tiles[:, :, None, :] >> np.arange(bpp, dtype=np.uint8)[None, None, :, None]) & 1
+    planes = np.packbits(bits, axis=-1).reshape(n, TILE_SIZE, bpp // 2, 2)
+    # Group plane pairs first: (N, pair, row, plane in pair)
+    return planes.transpose(0, 2, 1, 3).tobytes()
+
+
+def unpack_planar(data: bytes, bpp: int = 4) -> np.ndarray:
+    """Inverse of pack_planar: (N, 8, 8) color indices."""
+    size = tile_bytes(bpp)
+    if len(data) % size:
+        raise ValueError(f"{len(data)} bytes is not a whole number of {bpp}bpp tiles")
+    planes = np.frombuffer(data, dtype=np.uint8).reshape(-1, bpp // 2, TILE_SIZE, 2)
+    bits = np.unpackbits(planes.transpose(0, 2, 1, 3).reshape(-1, TILE_SIZE, bpp, 1), axis=-1)
+    weights = (1 << np.arange(bpp, dtype=np.uint8))[None, None, :, None]
+    return (bits * weights).sum(axis=2, dtype=np.uint8)
+
+
+def flip_variants(tiles: np.ndarray) -> np.ndarray:
+    """(N, 4, 8, 8): each tile as stored, H-flipped, V-flipped and HV-flipped (FLIP_* order)."""
+    return np.stack([tiles, tiles[:, :, ::-1], tiles[:, ::-1, :], tiles[:, ::-1, ::-1]], axis=1)
+
+
+def dedupe_tiles(tiles: np.ndarray, flips: bool = True) -> TileSet:
+    """Unique tiles plus, per source tile, its tile number and the flip that reproduces it.
+
+    Every orientation gets an id from one np.unique over the raw 64-byte
+    rows; a tile's key is the smallest id among its orientations, so mirrored
+    copies share a key. The first tile with each key is stored as drawn.
+    """
+    tiles = np.ascontiguousarray(tiles, dtype=np.uint8)
+    n = len(tiles)
+    if not n:
+        empty = np.zeros(0, dtype=np.intp)
+        return TileSet(tiles.reshape(0, TILE_SIZE, TILE_SIZE), empty, empty.astype(np.uint8))
+
+    variants = flip_variants(tiles) if flips else tiles[:, None]
+    rows = np.ascontiguousarray(variants).reshape(-1, TILE_SIZE * TILE_SIZE)
+    _, ids = np.unique(rows.view(np.dtype((np.void, rows.shape[1]))).ravel(), return_inverse=True)
+    ids = ids.reshape(n, -1)
+    orientation = ids.argmin(axis=1)          # Flip that turns each tile into its key form
+    keys = ids[np.arange(n), orientation]
+
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    order = np.argsort(first)                 # Number unique tiles by first appearance
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    index = rank[inverse.ravel()]
+    stored = first[order]
+    # Flips commute and undo themselves, so source = stored flipped by the XOR of both orientations
+    tile_flips = (orientation ^ orientation[stored[index]]).astype(np.uint8)
+    return TileSet(tiles[stored], index, tile_flips)
+
+
+def tilemap_entries(index: np.ndarray, flips: np.ndarray, palettes=0, base: int = 0,
+                    priority: bool = False) -> np.ndarray:
+    """vhopppcc cccccccc words for tile numbers, FLIP_* codes and palette numbers."""
+    numbers = np.asarray(index, dtype=np.uint32) + base
+    if numbers.size and int(numbers.max()) >= MAX_TILES:
+        raise ValueError(f"Tile number ${int(numbers.max()):03x} does not fit in 10 bits (base ${base:03x})")
+    palettes = np.asarray(palettes, dtype=np.uint32)
+    if palettes.size and int(palettes.max()) >= MAX_PALETTES:
+        raise ValueError(f"Palette {int(palettes.max())} does not fit in 3 bits")
+    flips = np.asarray(flips, dtype=np.uint32)
+    words = (numbers
+             | palettes << PALETTE_SHIFT
+             | (flips & FLIP_H) * H_FLIP
+             | (flips >> 1) * V_FLIP)
+    if priority:
+        words |= PRIORITY
+    return words.astype("<u2")
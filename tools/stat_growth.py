@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Per-level character stats as structure-of-arrays (characters x levels).
+
+characters.json carries no stat data yet. A character may give either
+
+    "levels": [{"level": 1, "hp": 22, "strength": 7, ...}, ...]     explicit rows; gaps are interpolated
+    "growth": {"hp": [22, 480], "strength": [7, 210], ...}           value at level 1 and at MAX_LEVEL
+
+Both are this repo's authoring format, not DW4 data. No character gets stats
+it does not declare: characters with neither are left out of the table
+(GrowthTable.skipped), and a character that has data but lacks a stat the
+caller requires is an error. A growth span only fixes the end points; the
+levels between follow a curve shape chosen here, not taken from the game:
+
+    value(L) = first + (last - first) * t ** CURVE_POWER,   t = (L - 1) / (MAX_LEVEL - 1)
+
+rounded down, so stats rise quickly early and flatten out near the cap.
+Give "levels" rows where the real per-level values are known.
+
+"exp" is the cumulative EXP needed to reach a level (0 at level 1). As a
+growth span it gives the EXP for level 2 and for MAX_LEVEL, joined by a
+power curve (EXP(L) = level-2 EXP * (L - 1) ** p). Thresholds are forced to
+rise strictly and to stay below MAX_EXP, so the engine can search them.
+"""
+
+import math
+from typing import Any, Dict, List, NamedTuple, Sequence
+
+import numpy as np
+
+from record_schema import safe_int
+
+MAX_LEVEL = 99
+CURVE_POWER = 0.75               # Shape of "growth" spans (authoring convention, see above)
+STATS = ("hp", "mp", "strength", "agility", "resilience", "wisdom", "luck")
+MAX_EXP = 0xFFFFFF               # EXP is a 24-bit value
+COLUMNS = STATS + ("exp",)
+
+
+class GrowthTable(NamedTuple):
+    ids: np.ndarray                           # (C,) character IDs
+    names: List[str]
+    levels: np.ndarray                        # (L,) 1..max_level
+    stats: Dict[str, np.ndarray]              # column ("exp" = cumulative EXP to reach the level) -> (C, L) int32
+    source: np.ndarray                        # (C,) index of each row's character in the input list
+    skipped: List[str]                        # Characters without "levels" / "growth" data
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+def curve(first: int, last: int, levels: np.ndarray, max_level: int = MAX_LEVEL) -> np.ndarray:
+    """Growth curve from `first` at level 1 to `last` at max_level, for every entry of levels."""
+    t = (np.asarray(levels, dtype=np.float64) - 1) / max(max_level - 1, 1)
+    return (first + (last - first) * t ** CURVE_POWER).astype(np.int32)
+
+
+def exp_curve(second: int, last: int, levels: np.ndarray) -> np.ndarray:
+    """Power curve through 0 at level 1, `second` at level 2 and `last` at MAX_LEVEL."""
+    second = max(second, 1)
+    power = math.log(max(last, second) / second) / math.log(MAX_LEVEL - 1) if MAX_LEVEL > 2 else 1.0
+    return np.rint(second * (np.asarray(levels, dtype=np.float64) - 1) ** power).astype(np.int64)
+
+
+def exp_thresholds(exp: np.ndarray) -> np.ndarray:
+    """Cumulative EXP made strictly increasing (level 1 = 0) and capped below MAX_EXP."""
+    steps = np.arange(len(exp))
+    rising = np.maximum.accumulate(np.asarray(exp, dtype=np.int64) - steps) + steps
+    rising[0] = 0
+    if len(rising) and rising[-1] >= MAX_EXP:
+        raise ValueError(f"EXP threshold {int(rising[-1])} does not fit below ${MAX_EXP:X}")
+    return rising.astype(np.int32)
+
+
+def level_rows(rows: Sequence[Dict[str, Any]], stat: str, levels: np.ndarray) -> np.ndarray:
+    """Explicit per-level values of one stat, linearly interpolated between the listed levels."""
+    points = sorted((safe_int(r.get("level")), safe_int(r[stat])) for r in rows if stat in r)
+    known, values = zip(*points)
+    return np.interp(levels, known, values).astype(np.int32)
+
+
+def has_growth(char: Dict[str, Any]) -> bool:
+    return bool(char.get("levels") or char.get("growth"))
+
+
+def character_growth(char: Dict[str, Any], levels: np.ndarray,
+                     required: Sequence[str] = COLUMNS) -> Dict[str, np.ndarray]:
+    """The required columns of one character over levels; missing data is an error."""
+    rows = char.get("levels", [])
+    growth = char.get("growth", {})
+    columns = {}
+    missing = []
+    for column in required:
+        if column not in COLUMNS:
+            raise ValueError(f"Unknown stat {column!r} (expected one of {', '.join(COLUMNS)})")
+        if any(column in r for r in rows):
+            values = level_rows(rows, column, levels)
+        elif column in growth:
+            first, last = (safe_int(v) for v in growth[column])
+            values = exp_curve(first, last, levels) if column == "exp" else curve(first, last, levels)
+        else:
+            missing.append(column)
+            continue
+        columns[column] = exp_thresholds(values) if column == "exp" else values
+    if missing:
+        name = char.get("name", f"char_{safe_int(char.get('id')):02x}")
+        raise ValueError(f"Character {name}: no levels/growth data for {', '.join(missing)}")
+    return columns
+
+
+def growth_table(characters: Sequence[Dict[str, Any]], max_level: int = MAX_LEVEL,
+                 required: Sequence[str] = COLUMNS) -> GrowthTable:
+    """Required columns at levels 1..max_level for every character with growth data.
+
+    Growth spans still end at MAX_LEVEL when max_level is lower.
+    """
+    if max_level < 1:
+        raise ValueError(f"max_level must be at least 1, got {max_level}")
+    levels = np.arange(1, max_level + 1, dtype=np.int32)
+    source = [i for i, c in enumerate(characters) if has_growth(c)]
+    per_char = [character_growth(characters[i], levels, required) for i in source]
+    stats = {column: np.array([c[column] for c in per_char], dtype=np.int32).reshape(-1, len(levels))
+             for column in required}
+    ids = np.array([safe_int(characters[i].get("id"), i) for i in source], dtype=np.int32)
+    names = [str(characters[i].get("name", f"char_{i:02x}")) for i in source]
+    skipped = [str(c.get("name", f"char_{i:02x}")) for i, c in enumerate(characters) if not has_growth(c)]
+    return GrowthTable(ids, names, levels, stats, np.array(source, dtype=np.int32), skipped)
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Indexed loader for assembler symbol files (build/dq4r.sym).
+
+The file is parsed once into an address-sorted uint32 array, a parallel
+name list and a name -> slot dict. Label -> address is one dict lookup and
+address -> nearest preceding label is one bisect. When several labels share
+an address the one defined last wins (MONSTER_TABLE and monster_00 both sit
+at the table start; monster_00 is the more specific one).
+
+The parsed index is cached next to the other build caches as a small binary
+file and reused while the symbol file's size and mtime (or, if those
+changed, its SHA-256) still match:
+
+    header   4s magic, H version, H reserved, I count, Q sym size, q sym mtime_ns, 32s sha256
+    addrs    count x uint32, ascending
+    names    uint32 offsets[count + 1], UTF-8 blob
+
+LoROM address helpers live here too, since every symbol consumer needs them.
+
+Usage:
+    python tools/symbol_index.py --lookup MONSTER_TABLE 01A2B4
+    python tools/symbol_index.py --dump MONSTER_TABLE --length 64
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from build_cache import REPO_ROOT
+
+SYM_PATH = REPO_ROOT / "build" / "dq4r.sym"
+ROM_PATH = REPO_ROOT / "build" / "dq4r.sfc"
+INDEX_DIR = REPO_ROOT / "build" / "symbols"
+
+INDEX_MAGIC = b"DQ4Y"
+INDEX_VERSION = 1
+HEADER = struct.Struct("<4sHHIQq32s")
+
+LOROM_BANK_SIZE = 0x8000
+COPIER_HEADER_SIZE = 0x200
+BYTES_PER_LINE = 16
+
+# Symbol file line formats: "00:8000 name" (WLA-DX / bsnes / Mesen), "008000 name" (no$sns),
+# "al 008000 .name" (ca65 VICE labels) and "name = $008000" (equates)
+SYMBOL_LINE = re.compile(
+    r"^\s*(?:al\s+)?(?:(?P<bank>[0-9A-Fa-f]{2}):?(?P<addr>[0-9A-Fa-f]{4})|(?P<long>[0-9A-Fa-f]{6,8}))"
+    r"\s+\.?(?P<name>[A-Za-z_][\w.@]*)\s*$"
+)
+SYMBOL_EQUATE = re.compile(r"^\s*\.?(?P<name>[A-Za-z_][\w.@]*)\s*=\s*\$(?P<value>[0-9A-Fa-f]{1,6})\s*$")
+
+
+# ----------------------------------------------------------------------
+# LoROM mapping
+# ----------------------------------------------------------------------
+
+def lorom_offset(address: int) -> int:
+    """File offset of a LoROM address: (bank & $7F) * $8000 + (addr & $7FFF)."""
+    bank, addr = address >> 16 & 0xFF, address & 0xFFFF
+    if addr < 0x8000 or bank & 0x7F > 0x7D:
+        raise ValueError(f"${address:06X} is not in LoROM ROM space")
+    return (bank & 0x7F) * LOROM_BANK_SIZE + (addr & 0x7FFF)
+
+
+def lorom_address(offset: int, fast: bool = False) -> int:
+    """LoROM address of a file offset (banks $00-$7D, or the $80+ FastROM mirror)."""
+    bank = offset // LOROM_BANK_SIZE
+    if not 0 <= bank <= 0x7D:
+        raise ValueError(f"File offset ${offset:06X} is outside LoROM space")
+    return (bank | (0x80 if fast else 0)) << 16 | 0x8000 | offset % LOROM_BANK_SIZE
+
+
+def load_rom(path: Path) -> bytes:
+    """ROM image without a 512-byte copier header."""
+    data = Path(path).read_bytes()
+    if len(data) % LOROM_BANK_SIZE == COPIER_HEADER_SIZE:
+        data = data[COPIER_HEADER_SIZE:]
+    return data
+
+
+# ----------------------------------------------------------------------
+# Parsing
+# ----------------------------------------------------------------------
+
+def parse_symbol_line(line: str) -> Optional[Tuple[str, int]]:
+    """(name, 24-bit address) for a symbol line, None for headers, comments and blanks."""
+    line = line.split(";", 1)[0].strip()
+    if not line or line.startswith("["):
+        return None
+    m = SYMBOL_LINE.match(line)
+    if m:
+        if m.group("long"):
+            return m.group("name"), int(m.group("long"), 16) & 0xFFFFFF
+        return m.group("name"), int(m.group("bank"), 16) << 16 | int(m.group("addr"), 16)
+    m = SYMBOL_EQUATE.match(line)
+    if m:
+        return m.group("name"), int(m.group("value"), 16)
+    return None
+
+
+def parse_symbols(text: str) -> List[Tuple[str, int]]:
+    """(name, address) pairs in file order; the first definition of a name wins."""
+    seen = set()
+    out = []
+    for line in text.splitlines():
+        parsed = parse_symbol_line(line)
+        if parsed is not None and parsed[0] not in seen:
+            seen.add(parsed[0])
+            out.append(parsed)
+    return out
+
+
+# ----------------------------------------------------------------------
+# Index
+# ----------------------------------------------------------------------
+
+class SymbolIndex:
+    """Sorted address array + parallel names + name dict."""
+
+    def __init__(self, addresses: array, names: List[str]):
+        if len(addresses) != len(names):
+            raise ValueError("address and name counts differ")
+        self.addresses = addresses
+        self.names = names
+        self._slot: Dict[str, int] = {name: i for i, name in enumerate(names)}
+
+    @classmethod
+    def from_pairs(cls, pairs: List[Tuple[str, int]]) -> "SymbolIndex":
+        order = sorted(range(len(pairs)), key=lambda i: pairs[i][1])  # Stable: file order within an address
+        return cls(array("I", (pairs[i][1] for i in order)), [pairs[i][0] for i in order])
+
+    @classmethod
+    def parse(cls, text: str) -> "SymbolIndex":
+        return cls.from_pairs(parse_symbols(text))
+
+    @classmethod
+    def load(cls, path: Union[str, Path] = SYM_PATH, cache_dir: Optional[Path] = INDEX_DIR) -> "SymbolIndex":
+        """Index of a symbol file, through the binary cache when it is still fresh."""
+        path = Path(path)
+        st = path.stat()
+        cache = index_path(path, cache_dir) if cache_dir else None
+        if cache is not None and cache.exists():
+            try:
+                index, size, mtime_ns, digest = cls._read_cache(cache)
+                if size == st.st_size and (mtime_ns == st.st_mtime_ns
+                                           or hashlib.sha256(path.read_bytes()).digest() == digest):
+                    return index
+            except (ValueError, struct.error, OSError):
+                pass  # Rebuild below
+
+        data = path.read_bytes()
+        index = cls.parse(data.decode("utf-8", errors="replace"))
+        if cache is not None:
+            index._write_cache(cache, st.st_size, st.st_mtime_ns, hashlib.sha256(data).digest())
+        return index
+
+    # ------------------------------------------------------------------
+    # Binary cache
+    # ------------------------------------------------------------------
+
+    def _write_cache(self, cache: Path, size: int, mtime_ns: int, digest: bytes):
+        blobs = [name.encode("utf-8") for name in self.names]
+        offsets = array("I", [0])
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        out = bytearray(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, 0, len(self.names), size, mtime_ns, digest))
+        addresses = array("I", self.addresses)
+        if sys.byteorder != "little":
+            addresses.byteswap()
+            offsets.byteswap()
+        out += addresses.tobytes() + offsets.tobytes() + b"".join(blobs)
+
+        cache.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache.with_suffix(".tmp")
+        tmp.write_bytes(out)
+        os.replace(tmp, cache)
+
+    @classmethod
+    def _read_cache(cls, cache: Path) -> Tuple["SymbolIndex", int, int, bytes]:
+        data = memoryview(cache.read_bytes())
+        magic, version, _, count, size, mtime_ns, digest = HEADER.unpack_from(data, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError(f"Not a version {INDEX_VERSION} symbol index: {cache}")
+        pos = HEADER.size
+        addresses = array("I")
+        addresses.frombytes(data[pos:pos + 4 * count])
+        pos += 4 * count
+        offsets = array("I")
+        offsets.frombytes(data[pos:pos + 4 * (count + 1)])
+        pos += 4 * (count + 1)
+        if sys.byteorder != "little":
+            addresses.byteswap()
+            offsets.byteswap()
+        blob = bytes(data[pos:pos + offsets[-1]])
+        names = [blob[a:b].decode("utf-8") for a, b in zip(offsets, offsets[1:])]
+        return cls(addresses, names), size, mtime_ns, digest
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._slot
+
+    def __getitem__(self, name: str) -> int:
+        return self.addresses[self._slot[name]]
+
+    def get(self, name: str, default: Optional[int] = None) -> Optional[int]:
+        slot = self._slot.get(name)
+        return default if slot is None else self.addresses[slot]
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        """(name, address) in address order."""
+        return zip(self.names, self.addresses)
+
+    def nearest(self, address: int) -> Optional[Tuple[str, int]]:
+        """(label, address - label address) of the closest label at or before address."""
+        i = bisect_right(self.addresses, address) - 1
+        if i < 0:
+            return None
+        return self.names[i], address - self.addresses[i]
+
+    def labels_at(self, address: int) -> List[str]:
+        i = bisect_right(self.addresses, address)
+        j = i
+        while j > 0 and self.addresses[j - 1] == address:
+            j -= 1
+        return self.names[j:i]
+
+    def describe(self, address: int) -> str:
+        """`monster_1A+3` style name for an address (`$01A2B4` when no label precedes it)."""
+        found = self.nearest(address)
+        if found is None:
+            return f"${address:06X}"
+        name, delta = found
+        return f"{name}+{delta}" if delta else name
+
+    def annotate(self, start: int, length: int, per_line: int = BYTES_PER_LINE) -> Iterator[Tuple[int, str]]:
+        """(address, label) for each dump line in [start, start + length): one bisect, then a merge walk."""
+        i = bisect_right(self.addresses, start) - 1
+        n = len(self.addresses)
+        for address in range(start, start + length, per_line):
+            while i + 1 < n and self.addresses[i + 1] <= address:
+                i += 1
+            if i < 0:
+                yield address, ""
+            else:
+                delta = address - self.addresses[i]
+                yield address, f"{self.names[i]}+{delta}" if delta else self.names[i]
+
+
+def index_path(sym_path: Path, cache_dir: Path = INDEX_DIR) -> Path:
+    key = hashlib.sha1(str(Path(sym_path).resolve()).encode()).hexdigest()[:12]
+    return cache_dir / f"{Path(sym_path).stem}-{key}.symidx"
+
+
+def dump(index: SymbolIndex, rom: bytes, start: int, length: int) -> Iterator[str]:
+    """Hex dump lines of the ROM at a LoROM address, each tagged with its nearest label."""
+    for address, label in index.annotate(start, length):
+        offset = lorom_offset(address)
+        line = rom[offset:offset + min(BYTES_PER_LINE, start + length - address)]
+        yield f"${address:06X}  {line.hex(' '):<{BYTES_PER_LINE * 3 - 1}}  {label}"
+
+
+def _address(index: SymbolIndex, text: str) -> int:
+    if text in index:
+        return index[text]
+    return int(text.lstrip("$"), 16)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Query an assembler symbol file")
+    parser.add_argument("--sym", type=Path, default=SYM_PATH, help="Symbol file")
+    parser.add_argument("--rom", type=Path, default=ROM_PATH, help="ROM for --dump")
+    parser.add_argument("--lookup", nargs="+", metavar="LABEL|ADDR", help="Label -> address / address -> label")
+    parser.add_argument("--dump", metavar="LABEL|ADDR", help="Annotated hex dump starting here")
+    parser.add_argument("--length", type=lambda s: int(s, 0), default=0x100, help="Bytes to dump")
+    parser.add_argument("--no-cache", action="store_true", help="Parse the symbol file without the binary cache")
+    args = parser.parse_args(argv)
+
+    try:
+        index = SymbolIndex.load(args.sym, None if args.no_cache else INDEX_DIR)
+        print(f"{args.sym}: {len(index)} labels")
+        for query in args.lookup or []:
+            if query in index:
+                print(f"  {query} = ${index[query]:06X}")
+            else:
+                print(f"  ${_address(index, query):06X} = {index.describe(_address(index, query))}")
+        if args.dump:
+            rom = load_rom(args.rom)
+            for line in dump(index, rom, _address(index, args.dump), args.length):
+                print(line)
+        return 0
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Sequence-scoring scanner for fixed-size record tables in a ROM image.
+
+Instead of unpacking a record at every byte offset, each constrained field
+is checked for the whole buffer at once: bytes.translate() turns every byte
+into a 0/1 flag, and flags for multi-byte fields and for all fields of a
+record are combined as big integers. Taking every size-th flag (one slice
+per phase = offset mod record size) gives per-record plausibility, and runs
+of >= min_run consecutive plausible records are found with one regex pass.
+"""
+
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from nes_rom import NesRom
+from record_schema import DW4_MONSTER, SPELL, Field, RecordSchema
+from instrumentation import traced
+
+
+class ScanSchema:
+    """Record layout plus per-field plausibility ranges."""
+
+    def __init__(self, name: str, record: RecordSchema, ranges: Dict[str, range], min_run: int = 8):
+        self.name = name
+        self.record = record.struct
+        self.fields = record.names
+        self.ranges = ranges
+        self.min_run = min_run
+        # (byte offset in record, struct code, range) for every constrained field
+        self.checks = []
+        for field in record.value_fields:
+            if field.name in ranges:
+                if field.code not in ("B", "H"):
+                    raise ValueError(f"{name}.{field.name}: only B/H fields can be range-checked")
+                self.checks.append((record.offsets[field.name], field.code, ranges[field.name]))
+
+
+class TableCandidate(NamedTuple):
+    offset: int       # File offset of first record
+    bank: int         # PRG bank (-1 if not inside PRG-ROM)
+    cpu_addr: int     # CPU address in the $8000 window (-1 if not inside PRG-ROM)
+    count: int        # Consecutive plausible records
+    distinct: int     # Distinct records within the run (filters padding/fill)
+
+    @property
+    def score(self) -> int:
+        return self.distinct
+
+
+# Heuristic schemas. Monster ranges follow the DW4 table (HP 1-999);
+# the others are starting points for hunting unknown tables.
+MONSTER_SCAN = ScanSchema(
+    "monster", DW4_MONSTER,
+    {"exp": range(0, 10000), "gold": range(0, 10000), "hp": range(1, 1000)},
+    min_run=8,
+)
+ITEM_SCAN = ScanSchema(
+    "item", RecordSchema("dw4_item_guess", [
+        Field("price", "H"), Field("type", "B"), Field("power", "B"), Field("equip", "B"), Field("flags", "B"),
+    ]),
+    {"price": range(0, 65001), "type": range(0, 16)},
+    min_run=16,
+)
+SPELL_SCAN = ScanSchema(
+    "spell", SPELL,
+    {"mp_cost": range(0, 100), "target_type": range(0, 8), "element": range(0, 16)},
+    min_run=16,
+)
+SHOP_SCAN = ScanSchema(
+    "shop", RecordSchema("dw4_shop_guess", [Field(f"item{i}", "B") for i in range(6)]),
+    {f"item{i}": range(0, 0x80) for i in range(6)},
+    min_run=8,
+)
+SCHEMAS = {s.name: s for s in (MONSTER_SCAN, ITEM_SCAN, SPELL_SCAN, SHOP_SCAN)}
+
+
+def _byte_flags(data: bytes, allowed) -> bytes:
+    """Map every byte of data to 1 if it is in `allowed`, else 0."""
+    allowed = set(allowed)
+    return data.translate(bytes(v in allowed for v in range(256)))
+
+
+def _field_flags(data: bytes, offset: int, code: str, rng: range, starts: int) -> int:
+    """0/1-per-byte big integer: field at record start o (+offset) is within rng."""
+    if code == "B":
+        return int.from_bytes(_byte_flags(data, rng)[offset:offset + starts], "big")
+
+    # Little-endian word: group high bytes by the low-byte interval they allow
+    groups: Dict[Tuple[int, int], List[int]] = {}
+    for hi in range(256):
+        lo_min = max(0, rng.start - hi * 256)
+        lo_max = min(255, rng.stop - 1 - hi * 256)
+        if lo_min <= lo_max:
+            groups.setdefault((lo_min, lo_max), []).append(hi)
+
+    flags = 0
+    for (lo_min, lo_max), his in groups.items():
+        hi_ok = int.from_bytes(_byte_flags(data, his)[offset + 1:offset + 1 + starts], "big")
+        if (lo_min, lo_max) == (0, 255):
+            flags |= hi_ok
+        else:
+            lo_ok = int.from_bytes(_byte_flags(data, range(lo_min, lo_max + 1))[offset:offset + starts], "big")
+            flags |= hi_ok & lo_ok
+    return flags
+
+
+def scan_table(data, schema: ScanSchema, min_run: Optional[int] = None, base_offset: int = 0) -> List[TableCandidate]:
+    """Find runs of >= min_run plausible records at every offset of `data`."""
+    size = schema.record.size
+    min_run = min_run or schema.min_run
+    data = bytes(data)
+    starts = len(data) - size + 1
+    if starts < min_run * size:
+        return []
+
+    ok = (1 << (8 * starts)) - 1
+    for offset, code, rng in schema.checks:
+        ok &= _field_flags(data, offset, code, rng, starts)
+    flags = ok.to_bytes(starts, "big")
+
+    run_pattern = re.compile(b"\x01{%d,}" % min_run)
+    found = []
+    for phase in range(size):
+        for match in run_pattern.finditer(flags[phase::size]):
+            start, stop = match.span()
+            first = phase + start * size
+            records = {data[o:o + size] for o in range(first, phase + stop * size, size)}
+            if len(records) < min_run:
+                continue
+            found.append((base_offset + first, stop - start, len(records)))
+
+    found.sort(key=lambda c: (-c[2], -c[1], c[0]))
+    return [TableCandidate(offset, -1, -1, count, distinct) for offset, count, distinct in found]
+
+
+@traced("rom.scan")
+def scan_rom(rom: NesRom, schema: ScanSchema, min_run: Optional[int] = None) -> List[TableCandidate]:
+    """Scan PRG-ROM and attach bank / CPU address to every candidate."""
+    with rom.prg as prg:
+        candidates = scan_table(prg, schema, min_run, base_offset=rom.prg_offset)
+    
+    located = []
+    for c in candidates:
+        bank, cpu_addr = rom.bank_address(c.offset)
+        located.append(c._replace(bank=bank, cpu_addr=cpu_addr))
+    return located
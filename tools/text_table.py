@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Dictionary-compressed name tables (monster, item, spell and character names).
+
+Every name is encoded as one byte per token, terminated by TEXT_END:
+
+    $00                   end of string
+    $01 .. DICT_BASE-1    single characters (TEXT_CHARSET gives each one's ASCII code)
+    DICT_BASE .. $FF      dictionary entries (TEXT_DICT_PTRS -> $00-terminated characters)
+
+The dictionary is picked greedily, byte-pair-encoding style: repeatedly merge
+the adjacent token pair that saves the most bytes (occurrences minus what the
+entry itself costs in TEXT_DICT and its pointer), so common pairs become DTE
+codes and merges of merges become longer substrings. Pair counts are updated
+only for the strings that contain the merged pair, which keeps thousands of
+names fast. Entries are stored flattened to plain characters, so decoding
+never recurses: one lookup, then a copy loop.
+
+Each name group gets a .word pointer table into TEXT_STRINGS; identical
+strings share one encoding.
+"""
+
+import argparse
+import json
+import sys
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from instrumentation import traced
+from pasm_writer import PasmWriter, write_pasm
+
+TEXT_END = 0x00
+MAX_CODE = 0xFF
+MAX_ENTRY = 12          # Longest dictionary expansion in characters
+ENTRY_OVERHEAD = 3      # $00 terminator + 2-byte pointer per dictionary entry
+MAX_BLOB = 0x10000      # Pointer tables hold 16-bit offsets
+
+
+class TextTable(NamedTuple):
+    charset: str                              # Code i + 1 -> charset[i]
+    dictionary: List[str]                     # Code dict_base + i -> dictionary[i]
+    groups: List[Tuple[str, List[int]]]       # (group, offset of each string in blob)
+    strings: List[Tuple[str, bytes]]          # Unique (text, encoding) in blob order
+    blob: bytes                               # Encoded strings, each TEXT_END-terminated
+    raw_size: int                             # Bytes as plain terminated strings
+
+    @property
+    def dict_base(self) -> int:
+        return len(self.charset) + 1
+
+    @property
+    def dict_size(self) -> int:
+        return sum(len(entry) + ENTRY_OVERHEAD for entry in self.dictionary)
+
+    @property
+    def size(self) -> int:
+        """Encoded strings + dictionary + charset (pointer tables excluded, as in raw_size)."""
+        return len(self.blob) + self.dict_size + len(self.charset)
+
+
+def names(records: Iterable[Dict[str, Any]]) -> List[str]:
+    return [str(r.get("name", "")) for r in records]
+
+
+def _pairs(tokens: Sequence[int]) -> Iterable[Tuple[int, int]]:
+    return zip(tokens, tokens[1:])
+
+
+def _merge(tokens: List[int], pair: Tuple[int, int], code: int) -> List[int]:
+    a, b = pair
+    out = []
+    i, n = 0, len(tokens)
+    while i < n:
+        if i + 1 < n and tokens[i] == a and tokens[i + 1] == b:
+            out.append(code)
+            i += 2
+        else:
+            out.append(tokens[i])
+            i += 1
+    return out
+
+
+@traced("text.dictionary", records=lambda result: len(result[1]))
+def build_dictionary(strings: Sequence[str],
+                     max_entries: Optional[int] = None) -> Tuple[str, List[str], Dict[str, List[int]]]:
+    """(charset, dictionary, tokens per unique string) chosen greedily by byte savings."""
+    weights = Counter(strings)
+    unique = list(weights)
+    charset = "".join(sorted({c for s in unique for c in s}))
+    if len(charset) >= MAX_CODE:
+        raise ValueError(f"{len(charset)} distinct characters leave no room for a dictionary")
+
+    expansion: Dict[int, str] = {i + 1: c for i, c in enumerate(charset)}
+    code_of = {c: i + 1 for i, c in enumerate(charset)}
+    tokens = [[code_of[c] for c in s] for s in unique]
+
+    counts: Counter = Counter()
+    where: Dict[Tuple[int, int], Set[int]] = defaultdict(set)
+    for idx, toks in enumerate(tokens):
+        w = weights[unique[idx]]
+        for pair in _pairs(toks):
+            counts[pair] += w
+            where[pair].add(idx)
+
+    limit = MAX_CODE - len(charset) if max_entries is None else min(max_entries, MAX_CODE - len(charset))
+    live: List[int] = []  # Dictionary codes in creation order
+    next_code = len(charset) + 1
+    free = list(range(next_code, MAX_CODE + 1))
+
+    while True:
+        if len(live) >= limit:
+            # Codes absorbed into longer entries no longer occur anywhere: reuse them
+            used = {t for toks in tokens for t in toks}
+            dead = [c for c in live if c not in used]
+            if not dead:
+                break
+            live = [c for c in live if c in used]
+            for c in dead:
+                del expansion[c]
+            free.extend(dead)
+            free.sort()
+
+        best, best_saving = None, 0
+        for pair, count in counts.items():
+            text_len = len(expansion[pair[0]]) + len(expansion[pair[1]])
+            saving = count - text_len - ENTRY_OVERHEAD
+            if saving > best_saving and text_len <= MAX_ENTRY:
+                best, best_saving = pair, saving
+        if best is None:
+            break
+
+        code = free.pop(0)
+        expansion[code] = expansion[best[0]] + expansion[best[1]]
+        live.append(code)
+        for idx in list(where[best]):
+            w = weights[unique[idx]]
+            old = tokens[idx]
+            for pair in _pairs(old):
+                counts[pair] -= w
+                if counts[pair] <= 0:
+                    del counts[pair]
+                where[pair].discard(idx)
+            new = tokens[idx] = _merge(old, best, code)
+            for pair in _pairs(new):
+                counts[pair] += w
+                where[pair].add(idx)
+        del where[best]
+
+    # Renumber: characters keep 1..N, surviving entries follow in creation order
+    used = {t for toks in tokens for t in toks}
+    entries = [c for c in live if c in used]
+    remap = {c: c for c in range(1, len(charset) + 1)}
+    remap.update({c: len(charset) + 1 + i for i, c in enumerate(entries)})
+    encoded = {s: [remap[t] for t in toks] for s, toks in zip(unique, tokens)}
+    return charset, [expansion[c] for c in entries], encoded
+
+
+@traced("text.encode", records=lambda table: len(table.strings))
+def build_text_table(groups: Sequence[Tuple[str, Sequence[str]]], max_entries: Optional[int] = None) -> TextTable:
+    """Dictionary, encoded strings and per-group offsets for named string groups."""
+    for group, group_strings in groups:
+        for s in group_strings:
+            _check_chars(group, s)
+    all_strings = [s for _, strings in groups for s in strings]
+    charset, dictionary, encoded = build_dictionary(all_strings, max_entries)
+
+    blob = bytearray()
+    offsets: Dict[str, int] = {}
+    strings: List[Tuple[str, bytes]] = []
+    out_groups = []
+    for group, group_strings in groups:
+        group_offsets = []
+        for s in group_strings:
+            if s not in offsets:
+                data = bytes(encoded[s]) + bytes([TEXT_END])
+                offsets[s] = len(blob)
+                strings.append((s, data))
+                blob += data
+            group_offsets.append(offsets[s])
+        out_groups.append((group, group_offsets))
+    if len(blob) > MAX_BLOB:
+        raise ValueError(f"Encoded text is {len(blob)} bytes; TEXT_STRINGS pointers are 16-bit")
+
+    raw_size = sum(len(s.encode("latin-1")) + 1 for s in offsets)
+    table = TextTable(charset, dictionary, out_groups, strings, bytes(blob), raw_size)
+    verify(table)
+    return table
+
+
+def decode(data: bytes, table: TextTable, offset: int = 0) -> str:
+    """String starting at offset in an encoded buffer (reference for the 65816 side)."""
+    out = []
+    base = table.dict_base
+    for code in data[offset:]:
+        if code == TEXT_END:
+            break
+        out.append(table.charset[code - 1] if code < base else table.dictionary[code - base])
+    return "".join(out)
+
+
+def verify(table: TextTable):
+    """Every string decodes back to its source text."""
+    for text, data in table.strings:
+        if decode(data, table) != text:
+            raise AssertionError(f"Text table round trip failed for {text!r}")
+
+
+def _check_chars(group: str, s: str):
+    """TEXT_CHARSET stores 8-bit (Latin-1) codes; anything above $FF cannot be emitted."""
+    for c in s:
+        if ord(c) > 0xFF:
+            raise ValueError(f"{group} name {s!r}: character {c!r} (U+{ord(c):04X}) has no 8-bit code "
+                             f"for TEXT_CHARSET")
+
+
+@traced("text.emit")
+def write_text_pasm(w: PasmWriter, table: TextTable) -> int:
+    """Stream .pasm for the charset, dictionary, pointer tables and encoded strings."""
+    w.banner(
+        "DW4 Text - Dictionary-Compressed Names",
+        "Auto-generated from DW4 JSON",
+        f"Codes: $00 end, $01-${table.dict_base - 1:02x} characters (TEXT_CHARSET), "
+        f"${table.dict_base:02x}-$ff dictionary (TEXT_DICT_PTRS)",
+        f"{len(table.strings)} unique strings: {table.raw_size} bytes plain, {table.size} encoded "
+        f"({len(table.blob)} strings + {table.dict_size} dictionary + {len(table.charset)} charset)",
+    )
+    w.blank()
+    w.const("TEXT_END", f"${TEXT_END:02x}")
+    w.const("TEXT_DICT_BASE", f"${table.dict_base:02x}")
+    w.const("TEXT_DICT_COUNT", f"${len(table.dictionary):02x}")
+    for group, offsets in table.groups:
+        w.const(f"{group}_NAME_COUNT", f"${len(offsets):04x}")
+    w.blank()
+
+    w.label("TEXT_CHARSET")
+    w.data("B", (ord(c) for c in table.charset))    # 8-bit, checked by build_text_table
+    w.blank()
+
+    w.label("TEXT_DICT_PTRS")
+    entry_offsets, pos = [], 0
+    for entry in table.dictionary:
+        entry_offsets.append(pos)
+        pos += len(entry) + 1
+    w.data("H", entry_offsets)
+    w.blank()
+
+    w.label("TEXT_DICT")
+    code_of = {c: i + 1 for i, c in enumerate(table.charset)}
+    for i, entry in enumerate(table.dictionary):
+        w.directive("B", [code_of[c] for c in entry] + [TEXT_END], f"${table.dict_base + i:02x} {entry!r}")
+
+    for group, offsets in table.groups:
+        w.blank()
+        w.label(f"{group}_NAME_PTRS")
+        w.data("H", offsets)
+
+    w.blank()
+    w.label("TEXT_STRINGS")
+    for text, data in table.strings:
+        w.directive("B", list(data), repr(text))
+    w.label("TEXT_STRINGS_END")
+    return len(table.strings)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build a dictionary-compressed text table from JSON names")
+    parser.add_argument("files", nargs="+", type=Path, help="JSON files (lists of records, or objects of lists)")
+    parser.add_argument("--max-entries", type=int, help="Cap the dictionary size")
+    parser.add_argument("--output", type=Path, help="Write the .pasm here (default: report only)")
+    args = parser.parse_args(argv)
+
+    try:
+        groups = []
+        for path in args.files:
+            with open(path) as f:
+                data = json.load(f)
+            records = data if isinstance(data, list) else [r for v in data.values() if isinstance(v, list) for r in v]
+            groups.append((path.stem.upper(), names(r for r in records if isinstance(r, dict))))
+        table = build_text_table(groups, args.max_entries)
+        print(f"{len(table.strings)} unique strings, {len(table.charset)} characters, "
+              f"{len(table.dictionary)} dictionary entries")
+        print(f"Plain {table.raw_size} bytes -> encoded {table.size} bytes ({table.size / max(table.raw_size, 1):.1%})")
+        if args.output:
+            write_pasm(args.output, write_text_pasm, table)
+            print(f"Wrote {args.output}")
+        return 0
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,79 +1,306 @@
 #!/usr/bin/env python3
 """
-Verify and dump DW4 monster data from compiled SNES ROM.
-This tool reads the compiled dq4r.sfc ROM and verifies that monster data
-was assembled correctly.
+Verify the DW4 data tables in a compiled dq4r.sfc against the source JSON.
+
+Table and row addresses come from the assembler's symbol file
+(build/dq4r.sym, loaded through symbol_index.py) and are mapped to file
+offsets with LoROM rules. The
+expected side is produced by running every converter's emitter (the same
+stages as dq4r_pipeline.py) into a CaptureWriter, which yields each row's
+label, schema and values. Rows are then hash-joined with the symbols by
+label, the ROM is decoded in bulk (one iter_unpack per contiguous run of
+same-schema rows) and every field that differs is reported.
+
+Usage:
+	python tools/verify_rom_data.py
+	python tools/verify_rom_data.py --rom build/dq4r.sfc --sym build/dq4r.sym --max-diffs 50
+	python tools/verify_rom_data.py --items-format full --json build/verify_report.json
 """
 
+import argparse
+import json
 import struct
+import sys
 from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from build_cache import REPO_ROOT
+from dq4r_pipeline import ITEMS_FORMATS, Sources, build_stages
+from pasm_writer import CapturedRow, CaptureWriter
+from symbol_index import INDEX_DIR, SymbolIndex, load_rom, lorom_address, lorom_offset
+
+ROM_PATH = REPO_ROOT / "build" / "dq4r.sfc"
+SYM_PATH = REPO_ROOT / "build" / "dq4r.sym"
+
+LOROM_HEADER_OFFSET = 0x7FC0
+MAX_DIFFS = 20
+
+
+# ----------------------------------------------------------------------
+# ROM header
+# ----------------------------------------------------------------------
+
+def describe_header(rom: bytes) -> List[str]:
+	"""LoROM internal header: title, map mode and checksum/complement check."""
+	if len(rom) < LOROM_HEADER_OFFSET + 0x20:
+		return ["Header: ROM too small for a LoROM header"]
+	header = rom[LOROM_HEADER_OFFSET:LOROM_HEADER_OFFSET + 0x20]
+	title = header[:21].decode("ascii", errors="replace").rstrip()
+	complement = int.from_bytes(header[0x1C:0x1E], "little")
+	checksum = int.from_bytes(header[0x1E:0x20], "little")
+	lines = [f"Title: {title!r}  Map mode: ${header[0x15]:02X}"]
+	pair = "ok" if checksum ^ complement == 0xFFFF else "mismatch"
+	lines.append(f"Checksum: ${checksum:04X} / complement ${complement:04X} ({pair})")
+	if len(rom) & (len(rom) - 1) == 0:
+		actual = sum(rom) & 0xFFFF
+		lines.append(f"Computed checksum: ${actual:04X} ({'ok' if actual == checksum else 'differs'})")
+	return lines
+
+
+# ----------------------------------------------------------------------
+# Expected tables
+# ----------------------------------------------------------------------
+
+class FieldDiff(NamedTuple):
+	table: str
+	label: str
+	field: str
+	expected: object
+	actual: object
+
+
+class TableReport(NamedTuple):
+	stage: str
+	anchor: str                 # First table label (offset 0 of the captured data)
+	address: int                # SNES address of the anchor (-1 if unresolved)
+	rows: int
+	size: int
+	matched: int                # Rows whose fields all match
+	diffs: List[FieldDiff]
+	notes: List[str]
 
-def read_rom_monsters(rom_path: str, start_offset: int, count: int):
-	"""Read monster data from compiled ROM."""
-	with open(rom_path, 'rb') as f:
-		f.seek(start_offset)
-		monsters = []
-		for i in range(count):
-			data = f.read(8)
-			if len(data) < 8:
-				break
-			
-			hp = struct.unpack('<H', data[0:2])[0]
-			exp = struct.unpack('<H', data[2:4])[0]
-			gold = struct.unpack('<H', data[4:6])[0]
-			atk = data[6]
-			def_ = data[7]
-			agi = data[8] if len(data) > 8 else 0
-			drop_id = data[9] if len(data) > 9 else 0
-			drop_rate = data[10] if len(data) > 10 else 0
-			
-			monsters.append({
-				'id': i,
-				'hp': hp,
-				'exp': exp,
-				'gold': gold,
-				'atk': atk,
-				'def': def_,
-				'agi': agi,
-				'drop_id': drop_id,
-				'drop_rate': drop_rate
-			})
-		return monsters
-
-rom_path = Path("build/dq4r.sfc")
-
-if not rom_path.exists():
-	print(f"Error: ROM file not found at {rom_path}")
-	exit(1)
-
-rom_size = rom_path.stat().st_size
-print(f"ROM Size: {rom_size} bytes")
-print(f"ROM Format: SNES LoROM")
-print()
-
-# Dump first few bytes to verify header
-with open(rom_path, 'rb') as f:
-	header = f.read(16)
-	print(f"Header (first 16 bytes): {header.hex()}")
-	print()
-
-# Look for known SNES signature
-with open(rom_path, 'rb') as f:
-	f.seek(0)
-	rom_data = f.read()
-	
-	# Search for CPU reset vector area (typically at $8000 - $BFFF in LoROM)
-	print("ROM Contains:")
-	if b'reset' in rom_data.lower() or len(rom_data) >= 0x8000:
-		print("✓ Appears to contain SNES code")
+	@property
+	def ok(self) -> bool:
+		return not self.diffs and self.address >= 0 and not any(n.startswith("error") for n in self.notes)
+
+
+def capture_tables(items_format: str = "simple", packed_encounters: bool = False,
+				   interned_shops: bool = False, text: bool = False) -> Dict[str, CaptureWriter]:
+	"""Run every pipeline stage's emitter into a CaptureWriter (stage name -> capture)."""
+	sources = Sources()
+	captures = {}
+	for stage in build_stages(items_format, packed_encounters, interned_shops, text):
+		w = CaptureWriter()
+		stage.build(sources, w)
+		captures[stage.name] = w
+	return captures
+
+
+def detect_layout(symbols: SymbolIndex) -> Dict[str, bool]:
+	"""Packed encounters / interned shops / the text table leave labels only those layouts emit."""
+	return {
+		"packed_encounters": "ENCOUNTER_INDEX" in symbols,
+		"interned_shops": "SHOP_INVENTORY" in symbols,
+		"text": "TEXT_STRINGS" in symbols,
+	}
+
+
+# ----------------------------------------------------------------------
+# Join and diff
+# ----------------------------------------------------------------------
+
+def _runs(rows: List[CapturedRow]) -> Iterator[List[CapturedRow]]:
+	"""Maximal runs of contiguous rows sharing one schema (decoded with one iter_unpack)."""
+	run: List[CapturedRow] = []
+	for row in rows:
+		if run and (row.schema is None or row.schema is not run[-1].schema
+					or row.offset != run[-1].offset + run[-1].size):
+			yield run
+			run = []
+		run.append(row)
+		if row.schema is None:
+			yield run
+			run = []
+	if run:
+		yield run
+
+
+def _decode(rom: bytes, offset: int, run: List[CapturedRow]) -> List[tuple]:
+	"""Decode a run from the ROM at offset; shorter if the ROM ends first."""
+	first = run[0]
+	if first.schema is None:
+		size = first.size
+		if offset + size > len(rom):
+			return []
+		return [struct.unpack_from(f"<{len(first.values)}{first.code}", rom, offset)]
+	size = first.schema.size
+	count = max(0, min(len(run), (len(rom) - offset) // size))
+	return list(first.schema.struct.iter_unpack(rom[offset:offset + count * size]))
+
+
+def _field_diffs(stage: str, row: CapturedRow, actual: tuple) -> List[FieldDiff]:
+	if row.schema is not None:
+		names = row.schema.names
 	else:
-		print("? ROM structure unclear")
-
-print()
-print("Note: Detailed monster data extraction from SNES ROM requires:")
-print("  1. Accurate monster data offset (varies by build)")
-print("  2. Proper HiROM/LoROM address mapping")
-print("  3. Symbol file to identify data sections")
-print()
-print("Use build/dq4r.sym for debugging with Mesen2:")
-print("  Tools → Debugger → Load Symbol File → build/dq4r.sym")
+		names = [f"{row.code.lower()}[{i}]" for i in range(len(row.values))]
+	return [FieldDiff(stage, row.label, name, exp, act)
+			for name, exp, act in zip(names, row.values, actual) if exp != act]
+
+
+def verify_table(stage: str, capture: CaptureWriter, rom: bytes, symbols: SymbolIndex) -> TableReport:
+	anchor = min(capture.labels, key=capture.labels.get) if capture.labels else ""
+	notes: List[str] = []
+	if anchor not in symbols:
+		notes.append(f"error: {anchor or 'table label'} not in the symbol file")
+		return TableReport(stage, anchor, -1, len(capture.rows), len(capture.blob), 0, [], notes)
+	address = symbols[anchor]
+	try:
+		base = lorom_offset(address) - capture.labels[anchor]
+	except ValueError as e:
+		notes.append(f"error: {e}")
+		return TableReport(stage, anchor, address, len(capture.rows), len(capture.blob), 0, [], notes)
+
+	# Table labels must sit where the emitter put them
+	for name, offset in capture.labels.items():
+		if name in symbols and name != anchor and lorom_offset(symbols[name]) != base + offset:
+			expected = lorom_address(base + offset, fast=bool(address & 0x800000))
+			notes.append(f"{name} at ${symbols[name]:06X} is not at table offset ${offset:04X}"
+						 f" (${expected:06X}, {symbols.describe(expected)})")
+
+	# Hash join on row labels: a label in the symbol file locates its rows (a label can start
+	# several rows, e.g. a shop header and its item list); unlabelled rows use the emitted layout
+	label_start: Dict[str, int] = {}
+	for row in capture.rows:
+		label_start.setdefault(row.label, row.offset)
+	shift: Dict[str, int] = {}
+	for label, offset in label_start.items():
+		if label in symbols and not label.isupper():
+			shift[label] = lorom_offset(symbols[label]) - (base + offset)
+	moved = [row for row in capture.rows if shift.get(row.label)]
+	moved_ids = {id(row) for row in moved}
+
+	diffs: List[FieldDiff] = []
+	matched = 0
+	missing = 0
+	for run in _runs([row for row in capture.rows if id(row) not in moved_ids]):
+		actual_rows = _decode(rom, base + run[0].offset, run)
+		missing += len(run) - len(actual_rows)
+		for row, actual in zip(run, actual_rows):
+			row_diffs = _field_diffs(stage, row, actual)
+			diffs.extend(row_diffs)
+			matched += not row_diffs
+	for row in moved:
+		actual_rows = _decode(rom, base + row.offset + shift[row.label], [row])
+		if not actual_rows:
+			missing += 1
+			continue
+		row_diffs = _field_diffs(stage, row, actual_rows[0])
+		diffs.extend(row_diffs)
+		matched += not row_diffs
+
+	if moved:
+		notes.append(f"{len(moved)} rows found by label away from the emitted layout")
+	if missing:
+		notes.append(f"error: {missing} rows past the end of the ROM")
+	if shift:
+		located = sum(1 for row in capture.rows if row.label in shift)
+		notes.append(f"{located}/{len(capture.rows)} rows located by symbol")
+	return TableReport(stage, anchor, address, len(capture.rows), len(capture.blob), matched, diffs, notes)
+
+
+def verify_rom(rom: bytes, symbols: SymbolIndex, captures: Dict[str, CaptureWriter]) -> List[TableReport]:
+	return [verify_table(stage, capture, rom, symbols) for stage, capture in captures.items()]
+
+
+# ----------------------------------------------------------------------
+# Report
+# ----------------------------------------------------------------------
+
+def _fmt(value) -> str:
+	if isinstance(value, (bytes, bytearray)):
+		return value.hex(" ")
+	return f"${value:02X}" if isinstance(value, int) else repr(value)
+
+
+def print_report(reports: List[TableReport], max_diffs: int = MAX_DIFFS):
+	print(f"\n{'Table':<12} {'Label':<18} {'Address':>8} {'Rows':>6} {'Bytes':>7} {'Match':>6} {'Diffs':>6}")
+	print("-" * 69)
+	for r in reports:
+		address = f"${r.address:06X}" if r.address >= 0 else "-"
+		print(f"{r.stage:<12} {r.anchor:<18} {address:>8} {r.rows:>6} {r.size:>7} {r.matched:>6} {len(r.diffs):>6}")
+		for note in r.notes:
+			print(f"    {note}")
+	print("-" * 69)
+
+	all_diffs = [d for r in reports for d in r.diffs]
+	for d in all_diffs[:max_diffs]:
+		print(f"  {d.table}.{d.label}.{d.field}: expected {_fmt(d.expected)}, ROM has {_fmt(d.actual)}")
+	if len(all_diffs) > max_diffs:
+		print(f"  ... {len(all_diffs) - max_diffs} more (--max-diffs)")
+
+
+def report_json(reports: List[TableReport]) -> dict:
+	def value(v):
+		return v.hex() if isinstance(v, (bytes, bytearray)) else v
+	return {
+		"ok": all(r.ok for r in reports),
+		"tables": [{
+			"stage": r.stage, "label": r.anchor, "address": r.address, "rows": r.rows, "bytes": r.size,
+			"matched": r.matched, "notes": r.notes,
+			"diffs": [{"label": d.label, "field": d.field, "expected": value(d.expected), "actual": value(d.actual)}
+					  for d in r.diffs],
+		} for r in reports],
+	}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+	parser = argparse.ArgumentParser(description="Verify DW4 data tables in the compiled SNES ROM")
+	parser.add_argument("--rom", type=Path, default=ROM_PATH, help="Compiled ROM (LoROM)")
+	parser.add_argument("--sym", type=Path, default=SYM_PATH, help="Symbol file from the assembler")
+	parser.add_argument("--items-format", choices=sorted(ITEMS_FORMATS), default="simple",
+						help="Layout items_dw4.pasm / shops_dw4.pasm were generated with")
+	parser.add_argument("--max-diffs", type=int, default=MAX_DIFFS, help="Field differences to print")
+	parser.add_argument("--json", type=Path, help="Also write the full report as JSON")
+	args = parser.parse_args(argv)
+
+	print("=" * 69)
+	print("DQ4r ROM Data Verifier")
+	print("=" * 69)
+
+	try:
+		for path in (args.rom, args.sym):
+			if not path.exists():
+				print(f"Error: {path} not found (run build.ps1 first)")
+				return 1
+
+		rom = load_rom(args.rom)
+		symbols = SymbolIndex.load(args.sym, INDEX_DIR)
+		print(f"ROM: {args.rom} ({len(rom)} bytes, LoROM)")
+		for line in describe_header(rom):
+			print(f"  {line}")
+		print(f"Symbols: {args.sym} ({len(symbols)} labels)")
+
+		layout = detect_layout(symbols)
+		captures = capture_tables(args.items_format, **layout)
+		reports = verify_rom(rom, symbols, captures)
+		print_report(reports, args.max_diffs)
+
+		if args.json:
+			args.json.parent.mkdir(parents=True, exist_ok=True)
+			with open(args.json, "w", newline="\n") as f:
+				json.dump(report_json(reports), f, indent=2)
+				f.write("\n")
+			print(f"Report: {args.json}")
+
+		ok = all(r.ok for r in reports)
+		print("\n✓ All tables match the source data" if ok else "\n✗ ROM data differs from the source data")
+		return 0 if ok else 1
+	except Exception as e:
+		print(f"Error: {e}")
+		import traceback
+		traceback.print_exc()
+		return 1
+
+
+if __name__ == "__main__":
+	sys.exit(main())